@@ -2,10 +2,20 @@ from django.contrib import admin
 from django.shortcuts import render, redirect
 from django.urls import path
 from django.contrib import messages
-import csv
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 import io
-from .models import WordGroup, Word, Game, Player, Hint, Vote
+from .models import WordGroup, Word, Game, GameArchive, Player, PlayerStats, Hint, Vote, WordGroupStats
 from .admin_forms import CSVImportForm
+from .admin_pagination import EstimatedCountPaginator
+from .wordimport import import_csv, import_csv_file
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist para tabelas que crescem sem limite (sem COUNT(*) exato a cada página)."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ['-pk']  # usa a chave primária; também ordena o autocomplete
 
 
 class WordInline(admin.TabularInline):
@@ -14,15 +24,27 @@ class WordInline(admin.TabularInline):
 
 
 @admin.register(WordGroup)
-class WordGroupAdmin(admin.ModelAdmin):
+class WordGroupAdmin(LargeTableAdmin):
     list_display = ['id', 'name', 'word_count', 'created_at']
     search_fields = ['name']
+    date_hierarchy = 'created_at'
     inlines = [WordInline]
     change_list_template = 'admin/game/wordgroup/change_list.html'
+
+    def get_queryset(self, request):
+        # Subconsulta correlacionada: só conta as palavras dos grupos da página
+        words = (
+            Word.objects.filter(group=OuterRef('pk')).order_by()
+            .values('group').annotate(total=Count('id')).values('total')
+        )
+        return super().get_queryset(request).annotate(
+            word_count=Coalesce(Subquery(words, output_field=IntegerField()), 0)
+        )
     
     def word_count(self, obj):
-        return obj.words.count()
+        return obj.word_count
     word_count.short_description = 'Número de Palavras'
+    word_count.admin_order_field = 'word_count'
     
     def get_urls(self):
         urls = super().get_urls()
@@ -32,90 +54,39 @@ class WordGroupAdmin(admin.ModelAdmin):
         return custom_urls + urls
     
     def import_csv(self, request):
-        """View para importar palavras via CSV"""
+        """View para importar palavras via CSV (lida em pedaços e gravada em lotes)"""
         if request.method == 'POST':
             form = CSVImportForm(request.POST, request.FILES)
             if form.is_valid():
                 csv_file = form.cleaned_data.get('csv_file')
                 csv_text = form.cleaned_data.get('csv_text', '').strip()
-                
-                # Determinar fonte dos dados
-                if csv_file:
-                    # Ler do arquivo
-                    try:
-                        file_data = csv_file.read().decode('utf-8')
-                        data_source = file_data
-                    except Exception as e:
-                        messages.error(request, f'Erro ao ler arquivo: {str(e)}')
-                        form = CSVImportForm()
-                        context = {
-                            'form': form,
-                            'opts': self.model._meta,
-                            'has_view_permission': self.has_view_permission(request),
-                        }
-                        return render(request, 'admin/game/wordgroup/import_csv.html', context)
-                else:
-                    # Usar texto colado
-                    data_source = csv_text
-                
-                # Processar dados
+
                 try:
-                    # Criar um StringIO para o csv.reader
-                    csv_reader = csv.reader(io.StringIO(data_source))
-                    
-                    groups_created = 0
-                    words_created = 0
-                    errors = []
-                    
-                    for row_num, row in enumerate(csv_reader, start=1):
-                        # Pular linhas vazias
-                        if not row or all(not cell.strip() for cell in row):
-                            continue
-                        
-                        # Remover espaços em branco e filtrar células vazias
-                        words_in_row = [word.strip() for word in row if word.strip()]
-                        
-                        if len(words_in_row) < 2:
-                            errors.append(f'Linha {row_num}: Precisa de pelo menos 2 palavras (encontradas: {len(words_in_row)})')
-                            continue
-                        
-                        # Criar grupo (usar primeira palavra como nome se não houver nome)
-                        group_name = words_in_row[0] if len(words_in_row) > 0 else None
-                        group, created = WordGroup.objects.get_or_create(
-                            name=group_name,
-                            defaults={'name': group_name}
-                        )
-                        
-                        if created:
-                            groups_created += 1
-                        
-                        # Criar palavras do grupo
-                        for word_text in words_in_row:
-                            word_text = word_text.strip()
-                            if word_text:
-                                word, word_created = Word.objects.get_or_create(
-                                    group=group,
-                                    text=word_text,
-                                    defaults={'text': word_text}
-                                )
-                                if word_created:
-                                    words_created += 1
-                    
-                    # Mensagens de sucesso
-                    if groups_created > 0 or words_created > 0:
+                    if csv_file:
+                        stats = import_csv_file(csv_file)
+                    else:
+                        stats = import_csv(io.StringIO(csv_text))
+                except UnicodeDecodeError:
+                    messages.error(request, 'Erro ao ler arquivo: o CSV precisa estar em UTF-8.')
+                except Exception as e:
+                    messages.error(request, f'Erro ao processar dados: {str(e)}')
+                else:
+                    if stats.groups_created > 0 or stats.words_created > 0:
                         messages.success(
                             request,
-                            f'Importação concluída! {groups_created} grupo(s) criado(s), {words_created} palavra(s) adicionada(s).'
+                            f'Importação concluída! {stats.rows} linha(s) lida(s), {stats.groups_created} grupo(s) '
+                            f'criado(s), {stats.words_created} palavra(s) adicionada(s).'
                         )
-                    
-                    if errors:
-                        for error in errors:
-                            messages.warning(request, error)
-                    
+                    else:
+                        messages.info(request, f'{stats.rows} linha(s) lida(s); nenhuma palavra nova.')
+
+                    for error in stats.errors:
+                        messages.warning(request, error)
+                    hidden = stats.skipped_rows - len(stats.errors)
+                    if hidden > 0:
+                        messages.warning(request, f'... e mais {hidden} linha(s) ignorada(s).')
+
                     return redirect('admin:game_wordgroup_changelist')
-                    
-                except Exception as e:
-                    messages.error(request, f'Erro ao processar dados: {str(e)}')
         else:
             form = CSVImportForm()
         
@@ -128,37 +99,89 @@ class WordGroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Word)
-class WordAdmin(admin.ModelAdmin):
+class WordAdmin(LargeTableAdmin):
     list_display = ['text', 'group']
-    list_filter = ['group']
+    list_select_related = ['group']
     search_fields = ['text']
+    autocomplete_fields = ['group']
 
 
 @admin.register(Game)
-class GameAdmin(admin.ModelAdmin):
+class GameAdmin(LargeTableAdmin):
     list_display = ['code', 'status', 'creator', 'num_impostors', 'num_whitemen', 'current_round', 'created_at']
-    list_filter = ['status', 'created_at']
+    list_filter = ['status']
     search_fields = ['code', 'creator']
-    readonly_fields = ['code', 'created_at', 'started_at', 'finished_at']
+    date_hierarchy = 'created_at'
+    readonly_fields = ['code', 'created_at', 'started_at', 'finished_at', 'last_activity_at', *Game.COUNTER_FIELDS]
+    autocomplete_fields = ['word_group', 'whiteman_word_group', 'citizen_word', 'impostor_word']
 
 
 @admin.register(Player)
-class PlayerAdmin(admin.ModelAdmin):
+class PlayerAdmin(LargeTableAdmin):
     list_display = ['name', 'game', 'role', 'is_eliminated', 'is_creator']
     list_filter = ['role', 'is_eliminated', 'is_creator']
+    list_select_related = ['game']
     search_fields = ['name', 'game__code']
+    date_hierarchy = 'joined_at'
+    autocomplete_fields = ['game', 'word']
 
 
 @admin.register(Hint)
-class HintAdmin(admin.ModelAdmin):
+class HintAdmin(LargeTableAdmin):
     list_display = ['player', 'game', 'round_number', 'word', 'created_at']
-    list_filter = ['round_number', 'created_at']
+    list_select_related = ['player__game', 'game']
     search_fields = ['player__name', 'word']
+    date_hierarchy = 'created_at'
+    autocomplete_fields = ['game', 'player']
 
 
 @admin.register(Vote)
-class VoteAdmin(admin.ModelAdmin):
+class VoteAdmin(LargeTableAdmin):
     list_display = ['voter', 'target', 'game', 'round_number', 'created_at']
-    list_filter = ['round_number', 'created_at']
+    list_select_related = ['voter__game', 'target__game', 'game']
     search_fields = ['voter__name', 'target__name']
+    date_hierarchy = 'created_at'
+    autocomplete_fields = ['game', 'voter', 'target']
+
+
+@admin.register(GameArchive)
+class GameArchiveAdmin(LargeTableAdmin):
+    """Somente leitura: as linhas são gravadas por game/archive.py"""
+    list_display = ['code', 'winning_team', 'num_players', 'rounds', 'started_at', 'finished_at']
+    search_fields = ['code']
+    date_hierarchy = 'finished_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PlayerStats)
+class PlayerStatsAdmin(LargeTableAdmin):
+    """Somente leitura: os totais são somados por game/stats.py"""
+    list_display = ['name', 'games_played', 'games_won', 'times_eliminated', 'clown_wins', 'last_played_at']
+    search_fields = ['name']
+    ordering = ['-games_won', 'games_played']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WordGroupStats)
+class WordGroupStatsAdmin(LargeTableAdmin):
+    """Somente leitura: os totais são somados por game/stats.py"""
+    list_display = ['word_group', 'games_played', 'citizens_wins', 'impostors_wins', 'clown_wins', 'last_played_at']
+    list_select_related = ['word_group']
+    search_fields = ['word_group__name']
+    ordering = ['-games_played']
+
+    def has_add_permission(self, request):
+        return False
 
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,198 @@
+"""Roteamento com afinidade de sala: cada código de sala pertence a um worker.
+
+O roteador fica na frente de N processos ASGI independentes e encaminha toda
+requisição HTTP e WebSocket de uma sala para o mesmo processo, escolhido por
+um hash estável do código. Assim caches, locks e timers em memória daquela
+sala (como a contagem regressiva de auto-delete do consumer) são a fonte da
+verdade sem coordenação entre processos.
+
+O roteamento é feito na camada TCP: lemos só o cabeçalho da requisição (e o
+corpo pequeno do POST /join/, que traz o código no JSON), escolhemos o worker
+e depois apenas copiamos bytes nos dois sentidos. Requisições HTTP comuns são
+encaminhadas com `Connection: close` para que uma conexão keep-alive não leve
+requisições de outra sala ao worker errado.
+"""
+import asyncio
+import json
+import logging
+import re
+import zlib
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ROOM_PATH_RE = re.compile(r'^/(?:api/game|game|ws/game)/(?P<code>[A-Za-z0-9]+)/')
+JOIN_PATH = '/join/'
+MAX_HEAD_BYTES = 64 * 1024
+MAX_JOIN_BODY_BYTES = 16 * 1024
+HOP_HEADERS = {b'connection', b'keep-alive', b'proxy-connection'}
+
+
+def worker_for_code(code, workers):
+    """Índice do worker dono da sala (estável entre processos e reinícios)."""
+    if not code or workers <= 1:
+        return 0
+    return zlib.crc32(code.strip().upper().encode('utf-8')) % workers
+
+
+def affinity_enabled():
+    return getattr(settings, 'ROOM_AFFINITY_WORKERS', 0) > 0
+
+
+def owns_room(code):
+    """True se este processo é o dono da sala (sempre True sem afinidade).
+
+    Caches e timers por sala só podem ser tratados como fonte da verdade
+    quando isto é True e a afinidade está ligada.
+    """
+    if not affinity_enabled():
+        return True
+    return worker_for_code(code, settings.ROOM_AFFINITY_WORKERS) == settings.ROOM_AFFINITY_WORKER
+
+
+def room_code_from_path(path):
+    match = ROOM_PATH_RE.match(path)
+    return match.group('code').upper() if match else None
+
+
+def room_code_from_join_body(body):
+    try:
+        return (json.loads(body or b'{}').get('code') or '').strip().upper() or None
+    except (ValueError, AttributeError):
+        return None
+
+
+def _parse_head(head):
+    lines = head.split(b'\r\n')
+    method, target, _ = (lines[0].split(b' ', 2) + [b'', b''])[:3]
+    headers = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, _, value = line.partition(b':')
+        headers.append((name.strip(), value.strip()))
+    return method.decode('latin-1'), target.decode('latin-1'), headers
+
+
+def _header(headers, name):
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _rewrite_head(head, peer_ip):
+    """Força `Connection: close` e acrescenta o IP de quem conectou ao X-Forwarded-For.
+
+    O IP vai sempre no fim, como faz um proxy: o último item é confiável
+    mesmo quando o cliente manda o próprio X-Forwarded-For.
+    """
+    lines = head.split(b'\r\n')
+    kept = [lines[0]]
+    forwarded_for = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, _, value = line.partition(b':')
+        name = name.strip().lower()
+        if name in HOP_HEADERS:
+            continue
+        if name == b'x-forwarded-for':
+            forwarded_for.append(value.strip())
+            continue
+        kept.append(line)
+    if peer_ip:
+        forwarded_for.append(peer_ip.encode('latin-1'))
+    if forwarded_for:
+        kept.append(b'X-Forwarded-For: ' + b', '.join(forwarded_for))
+    kept.append(b'Connection: close')
+    return b'\r\n'.join(kept) + b'\r\n\r\n'
+
+
+class AffinityRouter:
+    def __init__(self, backends, connect_timeout=5.0):
+        self.backends = backends  # [(host, port), ...] na ordem dos workers
+        self.connect_timeout = connect_timeout
+        self._next_backend = 0
+
+    def backend_for_code(self, code):
+        if code is None:
+            # Páginas sem sala (home, criação, estáticos) são distribuídas em rodízio
+            self._next_backend = (self._next_backend + 1) % len(self.backends)
+            return self.backends[self._next_backend]
+        return self.backends[worker_for_code(code, len(self.backends))]
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_client(self, client_reader, client_writer):
+        peer = client_writer.get_extra_info('peername')
+        peer_ip = peer[0] if peer else None
+        try:
+            head = await client_reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+        if len(head) > MAX_HEAD_BYTES:
+            client_writer.close()
+            return
+
+        method, target, headers = _parse_head(head)
+        path = target.split('?', 1)[0]
+        code = room_code_from_path(path)
+        body = b''
+        if code is None and method == 'POST' and path == JOIN_PATH:
+            length = int(_header(headers, b'content-length') or 0)
+            if 0 < length <= MAX_JOIN_BODY_BYTES:
+                try:
+                    body = await client_reader.readexactly(length)
+                except asyncio.IncompleteReadError:
+                    client_writer.close()
+                    return
+                code = room_code_from_join_body(body)
+
+        is_upgrade = (_header(headers, b'upgrade') or b'').lower() == b'websocket'
+        if not is_upgrade:
+            head = _rewrite_head(head, peer_ip)
+
+        host, port = self.backend_for_code(code)
+        try:
+            backend_reader, backend_writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), self.connect_timeout
+            )
+        except (OSError, asyncio.TimeoutError):
+            logger.warning('Worker %s:%s indisponível para a sala %s', host, port, code)
+            client_writer.write(b'HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            await self._close(client_writer)
+            return
+
+        backend_writer.write(head + body)
+        upstream = asyncio.ensure_future(self._pipe(client_reader, backend_writer))
+        # A resposta do worker define o fim da conexão: quando ele fecha, fechamos o cliente
+        await self._pipe(backend_reader, client_writer)
+        upstream.cancel()
+        for writer in (backend_writer, client_writer):
+            writer.close()
+
+    async def _pipe(self, reader, writer):
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (ConnectionError, OSError, RuntimeError):
+            pass
+
+    async def _close(self, writer):
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
@@ -5,5 +5,8 @@ class GameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'game'
 
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .dbpool import on_connection_created
 
-
+        connection_created.connect(on_connection_created, dispatch_uid='game_dbpool_stats')
@@ -0,0 +1,178 @@
+"""Arquivo de partidas finalizadas.
+
+Quando uma sala finalizada é apagada (timer de 1 minuto, criador fechando a
+sala ou `manage.py sweep_games`), a partida vira uma linha de `GameArchive`
+com um JSON compacto: jogadores com papel e palavra, e dicas, votos e nudges
+que apontam para o jogador pela posição na lista `players`. Em seguida as
+linhas quentes (Player, Hint, Vote, Nudge) são apagadas em massa, sem passar
+pelo coletor de cascata do Django, para que essas tabelas e seus índices
+continuem pequenos.
+
+Reiniciar uma sala finalizada também arquiva a partida antes de limpar as
+dicas e os votos; `(game_id, started_at)` identifica cada partida da sala.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import metrics, presence
+from .models import Game, GameArchive, Hint, Nudge, Player, Vote
+
+FORMAT_VERSION = 1
+DEFAULT_BATCH_SIZE = 200
+
+
+def _rows_by_game(queryset, *fields):
+    grouped = defaultdict(list)
+    for game_id, *row in queryset.order_by('game_id', 'id').values_list('game_id', *fields):
+        grouped[game_id].append(row)
+    return grouped
+
+
+def build_archive_records(games):
+    """Monta (sem gravar) um GameArchive por partida, com 5 consultas no total."""
+    ids = [game.id for game in games]
+    names = {
+        game_id: rest for game_id, *rest in Game.objects.filter(id__in=ids).values_list(
+            'id', 'word_group__name', 'whiteman_word_group__name', 'citizen_word__text', 'impostor_word__text',
+        )
+    }
+    players = _rows_by_game(
+        Player.objects.filter(game_id__in=ids), 'id', 'name', 'role', 'word__text', 'is_eliminated', 'is_creator',
+    )
+    hints = _rows_by_game(Hint.objects.filter(game_id__in=ids), 'player_id', 'round_number', 'word')
+    votes = _rows_by_game(
+        Vote.objects.filter(game_id__in=ids), 'voter_id', 'target_id', 'round_number', 'is_palhaco_guess',
+    )
+    nudges = _rows_by_game(Nudge.objects.filter(game_id__in=ids), 'from_player_id', 'to_player_id', 'round_number')
+
+    records = []
+    for game in games:
+        roster = players[game.id]
+        seat = {row[0]: index for index, row in enumerate(roster)}
+        group, whiteman_group, citizen_word, impostor_word = names.get(game.id, (None,) * 4)
+        data = {
+            'v': FORMAT_VERSION,
+            'config': {
+                'impostors': game.num_impostors,
+                'whitemen': game.num_whitemen,
+                'clowns': game.num_clowns,
+                'min_players': game.min_players,
+                'max_players': game.max_players,
+                'hint_timeout': game.hint_timeout_seconds,
+            },
+            'actual': [game.actual_num_impostors, game.actual_num_whitemen, game.actual_num_clowns],
+            'groups': [group, whiteman_group],
+            'words': [citizen_word, impostor_word],
+            # [nome, papel, palavra, eliminado, criador]
+            'players': [[name, role, word, int(eliminated), int(creator)]
+                        for _, name, role, word, eliminated, creator in roster],
+            # [jogador, rodada, dica]
+            'hints': [[seat[player_id], round_number, word] for player_id, round_number, word in hints[game.id]],
+            # [eleitor, alvo, rodada, palpite do Palhaço]
+            'votes': [[seat[voter_id], seat[target_id], round_number, int(guess)]
+                      for voter_id, target_id, round_number, guess in votes[game.id]],
+            # [de, para, rodada]
+            'nudges': [[seat[from_id], seat[to_id], round_number] for from_id, to_id, round_number in nudges[game.id]],
+        }
+        records.append(GameArchive(
+            game_id=game.id,
+            code=game.code,
+            winning_team=game.winning_team,
+            num_players=len(roster),
+            rounds=game.current_round,
+            created_at=game.created_at,
+            started_at=game.started_at,
+            finished_at=game.finished_at,
+            data=data,
+        ))
+    return records
+
+
+def archive_games(games):
+    """Grava o arquivo das partidas finalizadas da lista; devolve quantas."""
+    finished = [game for game in games if game.status == 'finished']
+    if not finished or not settings.ARCHIVE_FINISHED_GAMES:
+        return 0
+    GameArchive.objects.bulk_create(build_archive_records(finished), ignore_conflicts=True)
+    metrics.GAMES_ARCHIVED.inc(len(finished))
+    return len(finished)
+
+
+def purge_games(ids):
+    """Apaga as salas e todas as linhas ligadas a elas com um DELETE por tabela.
+
+    `_raw_delete` pula o coletor do Django, que buscaria os jogadores só para
+    apagar em cascata o que já vai ser apagado aqui. É seguro porque quem chama
+    já travou as salas com select_for_update na mesma transação, as tabelas
+    filhas (as únicas com FK para Game e Player) são apagadas antes, e nenhum
+    sinal de delete é usado nesses models. Devolve quantas salas foram apagadas.
+    """
+    ids = list(ids)
+    if not ids:
+        return 0
+    with transaction.atomic():
+        for model in (Hint, Vote, Nudge, Player):
+            queryset = model.objects.filter(game_id__in=ids)
+            queryset._raw_delete(queryset.db)
+        queryset = Game.objects.filter(id__in=ids)
+        return queryset._raw_delete(queryset.db)
+
+
+def archive_and_delete(game, if_unchanged=False):
+    """Arquiva a partida (se finalizada) e apaga a sala; devolve se apagou.
+
+    A sala é travada e relida antes, então o arquivo sai do estado atual. Com
+    `if_unchanged` (timer de auto-exclusão) ela só é apagada se continua
+    finalizada na versão de `game`: um restart gravado depois dessa leitura
+    mantém a sala nova, e nada é arquivado.
+    """
+    rows = Game.objects.select_for_update().filter(pk=game.pk)
+    if if_unchanged:
+        rows = rows.filter(status='finished', version=game.version)
+    with transaction.atomic():
+        locked = rows.first()
+        if locked is None:
+            return False
+        archive_games([locked])
+        purge_games([locked.id])
+    presence.registry.forget_room(game.code)
+    return True
+
+
+def sweep_games(grace_seconds=60, abandoned_hours=12, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """Arquiva e apaga salas finalizadas esquecidas e apaga salas abandonadas.
+
+    Finalizadas há mais de `grace_seconds` perderam o timer de auto-exclusão
+    (ninguém mais consultou a sala). Não finalizadas sem atividade
+    (`last_activity_at`) há mais de `abandoned_hours` são apagadas sem arquivo;
+    uma sala antiga, reiniciada e em jogo, continua. Devolve (arquivadas, apagadas).
+    """
+    now = timezone.now()
+    finished = Game.objects.filter(status='finished', finished_at__lt=now - timedelta(seconds=grace_seconds))
+    abandoned = Game.objects.exclude(status='finished').filter(
+        last_activity_at__lt=now - timedelta(hours=abandoned_hours),
+    )
+    if dry_run:
+        return finished.count(), finished.count() + abandoned.count()
+
+    archived = deleted = 0
+    for queryset, archive in ((finished, True), (abandoned, False)):
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                # skip_locked: salas sendo reiniciadas ou apagadas agora ficam para a próxima
+                games = list(
+                    queryset.filter(id__gt=last_id).order_by('id')
+                    .select_for_update(skip_locked=True)[:batch_size]
+                )
+                if not games:
+                    break
+                last_id = games[-1].id
+                if archive:
+                    archived += archive_games(games)
+                deleted += purge_games(game.id for game in games)
+    return archived, deleted
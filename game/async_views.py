@@ -0,0 +1,240 @@
+"""Versões assíncronas dos endpoints mais chamados (estado, dica, voto e nudge).
+
+Usadas quando ASYNC_API_VIEWS=True e o projeto roda sob um servidor ASGI
+(daphne/uvicorn): as leituras usam a interface assíncrona do ORM e só as
+transições de jogo, que precisam de várias escritas em sequência, passam por
+um único sync_to_async.
+"""
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+from django.utils import timezone
+
+from . import metrics, presence
+from .archive import archive_and_delete
+from .models import Game, Player, Vote, Nudge, VersionConflict
+from .state import aload_shared_snapshot, aload_viewer_extras, build_game_state
+from .notifications import notify_room_changed, notify_room_closed
+from .views import (
+    _json_error,
+    _conflict,
+    _stale_client_version,
+    _forget_session_player,
+    _remaining_auto_delete_seconds,
+    _spectator_presence_key,
+    _record_hint_and_progress,
+    _record_vote_and_progress,
+    _record_nudge_and_progress,
+)
+
+
+def _csrf_exempt(view):
+    # csrf_exempt do Django 4.2 não preserva views assíncronas
+    view.csrf_exempt = True
+    return view
+
+
+async def _aget_game(code):
+    game = await Game.objects.filter(code=code).afirst()
+    if game is None:
+        raise Http404('Jogo não encontrado')
+    return game
+
+
+async def _aload_payload(request):
+    try:
+        return json.loads(request.body or '{}'), None
+    except json.JSONDecodeError:
+        return None, _json_error('Dados inválidos')
+
+
+async def _avalidate_player_action(request, game, provided_name):
+    if not provided_name:
+        return None
+    session_name = await sync_to_async(request.session.get)(f'player_{game.code}')
+    if not session_name or session_name != provided_name:
+        return None
+    return await Player.objects.filter(game=game, name=session_name).afirst()
+
+
+async def _aget_current_player(game):
+    active_players = [player async for player in game.get_active_players()]
+    if active_players and 0 <= game.current_player_index < len(active_players):
+        return active_players[game.current_player_index]
+    return None
+
+
+@_csrf_exempt
+async def game_state_api(request, code):
+    if request.method != 'GET':
+        return _json_error('Método não permitido', status=405)
+
+    requested_at = time.monotonic()
+    game = await (
+        Game.objects.select_related('citizen_word', 'impostor_word', 'word_group')
+        .filter(code=code)
+        .afirst()
+    )
+    if not game:
+        return JsonResponse({'room_closed': True, 'message': 'A sala não existe mais.', 'redirect': '/'}, status=404)
+
+    remaining = _remaining_auto_delete_seconds(game)
+    if remaining is not None and remaining <= 0:
+        if await sync_to_async(archive_and_delete)(game, if_unchanged=True):
+            await sync_to_async(notify_room_closed)(code, 'A sala foi fechada automaticamente após 1 minuto.')
+            return JsonResponse({'room_closed': True, 'message': 'A sala foi fechada automaticamente após 1 minuto.', 'redirect': '/'})
+        # Reiniciada (ou fechada) depois da leitura: responde com o estado atual
+        game = await (
+            Game.objects.select_related('citizen_word', 'impostor_word', 'word_group')
+            .filter(code=code)
+            .afirst()
+        )
+        if not game:
+            return JsonResponse({'room_closed': True, 'message': 'A sala não existe mais.', 'redirect': '/'}, status=404)
+
+    spectator_flag = request.GET.get('spectator') == '1'
+    session_name = await sync_to_async(request.session.get)(f'player_{game.code}')
+    snapshot = await aload_shared_snapshot(game, requested_at)
+    viewer = snapshot.player_named(session_name) if session_name else None
+    if session_name and viewer is None:
+        await sync_to_async(_forget_session_player)(request, game.code)
+    is_spectator = spectator_flag or viewer is None
+
+    extras = await aload_viewer_extras(snapshot, None if is_spectator else viewer)
+    presence.registry.heartbeat(game.code, viewer.name if viewer else _spectator_presence_key(request))
+    data = build_game_state(snapshot, is_spectator, viewer, extras, presence.registry.room(game.code))
+    data['auto_delete_seconds'] = remaining
+    return JsonResponse(data)
+
+
+@_csrf_exempt
+async def submit_hint_api(request, code):
+    if request.method != 'POST':
+        return _json_error('Método não permitido', status=405)
+    game = await _aget_game(code)
+    if game.status != 'hints':
+        return _json_error('Não é possível enviar dicas agora', status=400)
+    payload, error = await _aload_payload(request)
+    if error:
+        return error
+
+    player = await _avalidate_player_action(request, game, payload.get('player_name'))
+    if not player:
+        return _json_error('Não autorizado', status=403)
+    if player.is_eliminated:
+        return _json_error('Jogador eliminado não pode dar dicas')
+    stale = _stale_client_version(game, payload)
+    if stale:
+        return stale
+
+    hint_word = (payload.get('word') or '').strip()
+    if not hint_word:
+        return _json_error('Dica não pode estar vazia')
+
+    current_player = await _aget_current_player(game)
+    if current_player != player:
+        return _json_error('Não é sua vez', status=403)
+
+    try:
+        await sync_to_async(_record_hint_and_progress)(game, player, hint_word)
+    except VersionConflict:
+        return _conflict()
+    await sync_to_async(notify_room_changed)(game.code)
+    return JsonResponse({'success': True})
+
+
+@_csrf_exempt
+async def submit_vote_api(request, code):
+    if request.method != 'POST':
+        return _json_error('Método não permitido', status=405)
+    game = await _aget_game(code)
+    if game.status != 'voting':
+        return _json_error('Votação não está ativa', status=400)
+    payload, error = await _aload_payload(request)
+    if error:
+        return error
+
+    player = await _avalidate_player_action(request, game, payload.get('player_name'))
+    if not player:
+        return _json_error('Não autorizado', status=403)
+    ghost_whiteman = player.role == 'whiteman' and player.is_eliminated
+    if player.is_eliminated and not ghost_whiteman:
+        return _json_error('Jogador eliminado não vota')
+    stale = _stale_client_version(game, payload)
+    if stale:
+        return stale
+
+    target_name = payload.get('target_name')
+    if not target_name:
+        return _json_error('Jogador alvo é obrigatório')
+
+    target = await Player.objects.filter(game=game, name=target_name).afirst()
+    if not target:
+        return _json_error('Jogador alvo não encontrado')
+
+    if await Vote.objects.filter(game=game, voter=player, round_number=game.current_round, is_palhaco_guess=False).aexists():
+        return _json_error('Você já votou nesta rodada')
+
+    # Voto, contador e apuração numa transação só (uma ida à thread)
+    try:
+        vote_result = await sync_to_async(_record_vote_and_progress)(game, player, target)
+    except VersionConflict:
+        return _conflict()
+    metrics.VOTES.inc(kind='elimination')
+
+    await sync_to_async(notify_room_changed)(game.code)
+    return JsonResponse({'success': True, 'vote_result': vote_result})
+
+
+@_csrf_exempt
+async def nudge_player_api(request, code):
+    if request.method != 'POST':
+        return _json_error('Método não permitido', status=405)
+    game = await _aget_game(code)
+    payload, error = await _aload_payload(request)
+    if error:
+        return error
+
+    player = await _avalidate_player_action(request, game, payload.get('player_name'))
+    if not player:
+        return _json_error('Não autorizado', status=403)
+
+    if game.status != 'hints':
+        return _json_error('Nudges só podem ser enviados durante a rodada de dicas', status=400)
+
+    target_name = payload.get('target_player_name')
+    if not target_name:
+        return _json_error('Jogador alvo não especificado')
+
+    target = await Player.objects.filter(game=game, name=target_name).afirst()
+    if not target:
+        return _json_error('Jogador alvo não encontrado', status=404)
+
+    if target.name == player.name:
+        return _json_error('Você não pode enviar nudge para si mesmo')
+
+    one_second_ago = timezone.now() - timedelta(seconds=1)
+    recent_nudge = await (
+        Nudge.objects.filter(game=game, from_player=player, to_player=target, created_at__gte=one_second_ago)
+        .order_by('-created_at')
+        .afirst()
+    )
+    if recent_nudge:
+        return _json_error('Espere 1 segundo para enviar outro nudge para este jogador', status=429)
+
+    # Nudge, HP e a vez passada numa transação só (uma ida à thread)
+    try:
+        skip_triggered = await sync_to_async(_record_nudge_and_progress)(game, player, target)
+    except VersionConflict:
+        return _conflict()
+    metrics.NUDGES.inc()
+
+    await sync_to_async(notify_room_changed)(game.code)
+    return JsonResponse({
+        'success': True,
+        'nudge_meter': target.nudge_meter,
+        'skip_triggered': skip_triggered
+    })
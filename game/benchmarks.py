@@ -0,0 +1,282 @@
+"""Micro-benchmarks dos caminhos quentes (`manage.py benchmark`).
+
+Cada caso prepara seus dados uma vez e devolve uma função sem argumentos que
+é cronometrada várias vezes, no estilo do `timeit`: o número de chamadas por
+rodada é calibrado para durar pelo menos `min_time` e vale a mediana das
+rodadas. Casos que tocam o banco rodam dentro de uma transação descartada, e
+cada chamada é desfeita com um savepoint para que todas partam do mesmo
+estado.
+
+O resultado é um dicionário serializável em JSON; `compare` confronta dois
+resultados (por exemplo, um baseline salvo com `--save`).
+"""
+import copy
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+import django
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+
+from . import rules
+from .dbpool import track_queries
+from .models import Game, sort_players_for_display
+from .state import build_game_state, load_room_snapshot, load_viewer_extras, serialize_game_state
+from .synthetic import build_playing_room
+
+ROOM_SIZES = (4, 8, 12)
+ROUND_COUNTS = (3, 9, 21)
+MAX_CALLS = 100_000
+
+
+@dataclass
+class Benchmark:
+    name: str
+    group: str
+    prepare: object  # função que monta os dados e devolve a função cronometrada
+    db: bool = False
+
+
+def _rolled_back(fn):
+    def run():
+        savepoint = transaction.savepoint()
+        try:
+            fn()
+        finally:
+            transaction.savepoint_rollback(savepoint)
+    return run
+
+
+# Casos puros -------------------------------------------------------------
+
+def _sort_players(size):
+    def prepare():
+        players = [SimpleNamespace(id=index + 1) for index in range(size)]
+        return lambda: sort_players_for_display('ABC234', players)
+    return prepare
+
+
+def _deal_roles(size):
+    def prepare():
+        rng = random.Random(0)
+
+        def run():
+            counts = rules.draw_role_counts(size, 2, 2, 1, rng)
+            rules.deal_roles(range(size), counts, rng)
+        return run
+    return prepare
+
+
+def _simulate_game(size):
+    def prepare():
+        rng = random.Random(0)
+        return lambda: rules.simulate_game(size, 2, 1, 1, rng=rng)
+    return prepare
+
+
+# Casos com banco ---------------------------------------------------------
+
+def _build_state(size, rounds):
+    def prepare():
+        game = build_playing_room(num_players=size, rounds=rounds, status='hints')
+        snapshot = load_room_snapshot(game)
+        viewer = snapshot.player_named('p0')
+        extras = load_viewer_extras(snapshot, viewer)
+        return lambda: build_game_state(snapshot, False, viewer, extras)
+    return prepare
+
+
+def _serialize_state(size, rounds):
+    def prepare():
+        game = build_playing_room(num_players=size, rounds=rounds, status='hints')
+        return lambda: serialize_game_state(game, False, 'p0')
+    return prepare
+
+
+def _assign_roles():
+    game = build_playing_room(status='waiting')
+    game.assign_words()
+    return _rolled_back(lambda: copy.copy(game).assign_roles())
+
+
+def _assign_words():
+    game = build_playing_room(status='waiting')
+
+    def run():
+        fresh = copy.copy(game)
+        fresh.word_group = None
+        fresh.assign_words()
+    return _rolled_back(run)
+
+
+def _process_voting():
+    from .views import _process_voting as process_voting
+
+    game = build_playing_room(status='voting')
+    alive = list(game.get_active_players())
+    target = next(player for player in alive if player.role == 'citizen' and not player.is_creator)
+    game.votes.bulk_create([
+        game.votes.model(game=game, voter=voter, target=target, round_number=game.current_round)
+        for voter in alive
+    ])
+    return _rolled_back(lambda: process_voting(copy.copy(game)))
+
+
+def _nudge():
+    game = build_playing_room(status='hints')
+    alive = list(game.get_active_players())
+    sender, target = alive[3], alive[0]
+    client = Client()
+    session = client.session
+    session[f'player_{game.code}'] = sender.name
+    session.save()
+    path = reverse('nudge_player_api', kwargs={'code': game.code})
+    body = json.dumps({'player_name': sender.name, 'target_player_name': target.name})
+
+    def run():
+        response = client.post(path, data=body, content_type='application/json')
+        if response.status_code != 200:
+            raise RuntimeError(f'nudge respondeu {response.status_code}: {response.content[:200]!r}')
+    return _rolled_back(run)
+
+
+def all_benchmarks():
+    cases = []
+    for size in (4, 12, 100):
+        cases.append(Benchmark(f'sort_players_for_display[{size}j]', 'ordenação', _sort_players(size)))
+    for size in ROOM_SIZES:
+        cases.append(Benchmark(f'rules.draw_and_deal[{size}j]', 'regras', _deal_roles(size)))
+        cases.append(Benchmark(f'rules.simulate_game[{size}j]', 'regras', _simulate_game(size)))
+    for size in ROOM_SIZES:
+        for rounds in ROUND_COUNTS:
+            label = f'{size}j-{rounds}r'
+            cases.append(Benchmark(f'build_game_state[{label}]', 'estado', _build_state(size, rounds), db=True))
+            cases.append(Benchmark(f'serialize_game_state[{label}]', 'estado', _serialize_state(size, rounds), db=True))
+    cases += [
+        Benchmark('Game.assign_roles[12j]', 'regras', _assign_roles, db=True),
+        Benchmark('Game.assign_words', 'regras', _assign_words, db=True),
+        Benchmark('_process_voting[12j]', 'regras', _process_voting, db=True),
+        Benchmark('nudge_player_api', 'nudge', _nudge, db=True),
+    ]
+    return cases
+
+
+# Execução ----------------------------------------------------------------
+
+def _calibrate(fn, min_time):
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or calls >= MAX_CALLS:
+            return calls
+        calls = min(MAX_CALLS, calls * 10 if elapsed < min_time / 10 else calls * 2)
+
+
+def measure(fn, repeat=5, min_time=0.05):
+    """Cronometra `fn` e devolve estatísticas por chamada, em microssegundos."""
+    random.seed(0)
+    with track_queries() as counter:
+        fn()
+    calls = _calibrate(fn, min_time)
+    samples = []
+    for _ in range(repeat):
+        random.seed(0)
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        samples.append((time.perf_counter() - started) / calls * 1e6)
+    return {
+        'calls': calls,
+        'repeat': repeat,
+        'queries': counter.queries,
+        'min_us': min(samples),
+        'median_us': statistics.median(samples),
+        'mean_us': statistics.fmean(samples),
+        'stdev_us': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def metadata():
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': _git_commit(),
+        'python': sys.version.split()[0],
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'database': connection.vendor,
+    }
+
+
+def run(benchmarks, repeat=5, min_time=0.05, use_db=True, progress=None):
+    """Roda os casos e devolve {'meta': ..., 'results': {nome: estatísticas}}.
+
+    Os casos com banco precisam de grupos de palavras cadastrados; tudo o que
+    eles criam é desfeito no fim.
+    """
+    results = {}
+
+    def record(benchmark):
+        stats = measure(benchmark.prepare(), repeat, min_time)
+        stats['group'] = benchmark.group
+        results[benchmark.name] = stats
+        if progress:
+            progress(benchmark.name, stats)
+
+    for benchmark in benchmarks:
+        if not benchmark.db:
+            record(benchmark)
+    db_cases = [benchmark for benchmark in benchmarks if benchmark.db]
+    if use_db and db_cases:
+        with transaction.atomic():
+            for benchmark in db_cases:
+                record(benchmark)
+            transaction.set_rollback(True)
+    return {'meta': metadata(), 'results': results}
+
+
+def compare(current, baseline, threshold=0.10):
+    """Compara medianas: devolve linhas (nome, base, atual, razão, veredito)."""
+    rows = []
+    for name, stats in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            rows.append((name, None, stats['median_us'], None, 'novo'))
+            continue
+        ratio = stats['median_us'] / before['median_us'] if before['median_us'] else float('inf')
+        if ratio > 1 + threshold:
+            verdict = 'mais lento'
+        elif ratio < 1 - threshold:
+            verdict = 'mais rápido'
+        else:
+            verdict = 'igual'
+        rows.append((name, before['median_us'], stats['median_us'], ratio, verdict))
+    return rows
+
+
+def format_us(value):
+    if value is None:
+        return '-'
+    if value >= 1000:
+        return f'{value / 1000:.2f} ms'
+    return f'{value:.1f} µs'
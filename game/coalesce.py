@@ -0,0 +1,57 @@
+"""Junta rajadas de avisos de mudança de uma sala num envio só.
+
+Uma sequência de votos, nudges ou a virada de rodada gera vários avisos em
+poucos milissegundos. Em vez de montar e publicar o estado a cada um,
+`schedule(chave, fn)` espera `STATE_BROADCAST_COALESCE_MS` a partir do
+primeiro aviso e chama só a última `fn` registrada, que monta o estado mais
+recente. Vale por processo (por event loop); com afinidade de sala
+(`runaffinity`) todos os avisos de uma sala caem no mesmo processo.
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Coalescer:
+    def __init__(self, window_ms=None):
+        self.window_ms = window_ms
+        self._pending = {}  # chave -> [fn mais recente, pedidos juntados]
+
+    @property
+    def window(self):
+        window_ms = settings.STATE_BROADCAST_COALESCE_MS if self.window_ms is None else self.window_ms
+        return max(0, window_ms) / 1000
+
+    def schedule(self, key, fn):
+        """Agenda `fn(juntados)` (corrotina) para o fim da janela da chave.
+
+        Se já há um envio pendente para a chave, `fn` substitui a anterior.
+        Sem janela (0 ms) o envio sai na próxima volta do event loop. Devolve
+        a task do envio.
+        """
+        entry = self._pending.get(key)
+        if entry is not None:
+            entry[0] = fn
+            entry[1] += 1
+            return entry[2]
+        entry = [fn, 1, None]
+        self._pending[key] = entry
+        entry[2] = asyncio.ensure_future(self._flush(key))
+        return entry[2]
+
+    async def _flush(self, key):
+        if self.window:
+            await asyncio.sleep(self.window)
+        fn, merged, _ = self._pending.pop(key)
+        try:
+            await fn(merged)
+        except Exception:
+            # Um envio que falha não pode derrubar os próximos da sala
+            logger.exception('Falha no envio agrupado de %s', key)
+
+
+# Estados publicados no grupo de cada sala e estados enviados a cada socket
+room_broadcasts = Coalescer()
@@ -1,43 +1,63 @@
 import json
-import random
 import asyncio
+import time
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.db import transaction
 from django.utils import timezone
-from .models import Game, Player, Hint, Vote, sort_players_for_display
+from . import lobby, metrics, presence, rules
+from .affinity import owns_room
+from .archive import archive_and_delete, archive_games
+from .coalesce import room_broadcasts
+from .models import Game, Player, Hint, Vote, VersionConflict
+from .state import aload_shared_snapshot, build_game_state, load_consistent_snapshot, load_viewer_extras
+from .views import _record_vote_and_progress
 
 
 class GameConsumer(AsyncWebsocketConsumer):
+    """WebSocket de uma sala.
+
+    A sala (`self.game`) e o jogador autenticado (`self.player`) ficam em
+    cache durante toda a conexão e só são relidos depois de uma mudança: as
+    ações deste socket chamam `invalidate()` quando alteram linhas que não
+    estão no cache, e mensagens de estado vindas do grupo (outros sockets ou
+    `notify_room_changed` das views) fazem o mesmo.
+
+    O grupo da sala só recebe avisos de mudança (`room_state_changed`), nunca
+    um estado pronto: cada socket monta a visão do próprio jogador, com os
+    papéis e palavras que ele pode ver, a partir de um snapshot dividido com
+    os outros sockets da sala. O aviso que este socket publica leva `origin`
+    para que ele não invalide o próprio cache ao recebê-lo de volta.
+    """
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.auto_delete_task = None
+        self.counted_connection = False
+        self.authenticated_player_name = None
+        self.game = None
+        self.player = None
+        self.cache_stale = True
     
     async def connect(self):
         self.game_code = self.scope['url_route']['kwargs']['game_code']
         self.room_group_name = f'game_{self.game_code}'
         
-        # Verificar se o jogo existe
+        # Timer de auto-delete, presença e avisos agrupados vivem no processo dono da sala
+        if not owns_room(self.game_code):
+            await self.close()
+            return
+        
+        # Verificar autenticação via sessão; sala e jogador vêm numa consulta só
+        self.authenticated_player_name = await self.get_authenticated_player_name()
         game = await self.get_game()
         if not game:
             await self.close()
             return
         
-        # Verificar autenticação via sessão
-        authenticated_player_name = await self.get_authenticated_player_name()
-        
         # Permitir conexão mesmo sem autenticação (modo espectador)
-        # Se não houver autenticação, será tratado como espectador
-        if authenticated_player_name:
-            # Verificar se o jogador existe no jogo
-            player = await self.get_player(game, authenticated_player_name)
-            if player:
-                # Armazenar player_name autenticado
-                self.authenticated_player_name = authenticated_player_name
-            else:
-                # Jogador não existe, tratar como espectador
-                self.authenticated_player_name = None
-        else:
-            # Sem autenticação, modo espectador
+        # Jogador que não existe na sala também é tratado como espectador
+        if self.player is None:
             self.authenticated_player_name = None
         
         # Entrar no grupo (jogadores e espectadores)
@@ -47,6 +67,10 @@ class GameConsumer(AsyncWebsocketConsumer):
         )
         
         await self.accept()
+        metrics.WEBSOCKET_CONNECTIONS.inc()
+        self.counted_connection = True
+        self.presence_key = self.authenticated_player_name or presence.spectator_key(self.channel_name)
+        presence.registry.connect(self.game_code, self.presence_key)
         
         # Enviar estado atual do jogo
         await self.send_game_state()
@@ -56,13 +80,17 @@ class GameConsumer(AsyncWebsocketConsumer):
             await self.start_auto_delete_timer()
 
     async def disconnect(self, close_code):
+        if self.counted_connection:
+            metrics.WEBSOCKET_CONNECTIONS.dec()
+            presence.registry.disconnect(self.game_code, self.presence_key)
+            self.counted_connection = False
         # Sair do grupo
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
 
-    async def receive(self, text_data):
+    async def dispatch_message(self, text_data):
         data = json.loads(text_data)
         message_type = data.get('type')
         
@@ -79,6 +107,19 @@ class GameConsumer(AsyncWebsocketConsumer):
         elif message_type == 'kick_player':
             await self.handle_kick_player(data)
         elif message_type == 'get_state':
+            room_broadcasts.schedule(self.channel_name, self.send_own_state)
+
+    async def receive(self, text_data):
+        try:
+            await self.dispatch_message(text_data)
+        except VersionConflict:
+            # Outra ação mudou a sala antes desta; tudo foi desfeito
+            self.invalidate()
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'A sala mudou enquanto sua ação era enviada. Confira o jogo e tente de novo.',
+                'conflict': True,
+            }))
             await self.send_game_state()
 
     async def handle_start_game(self, data):
@@ -112,21 +153,10 @@ class GameConsumer(AsyncWebsocketConsumer):
             }))
             return
         
-        # Atribuir palavras e papéis
-        if await self.assign_words(game):
-            await self.assign_roles(game)
-            
-            # Iniciar primeira rodada
-            game.status = 'hints'
-            game.current_round = 1
-            game.started_at = timezone.now()
-            
-            # Escolher primeiro jogador aleatório
-            active_players = await self.get_active_players(game)
-            if active_players:
-                game.current_player_index = random.randint(0, len(active_players) - 1)
-            
-            await database_sync_to_async(game.save)()
+        # Atribuir palavras e papéis e iniciar a primeira rodada
+        if await self.start_game_sync(game):
+            # Papéis e palavras dos jogadores mudaram
+            self.invalidate()
             
             await self.send_game_state()
 
@@ -167,42 +197,7 @@ class GameConsumer(AsyncWebsocketConsumer):
             }))
             return
         
-        # Criar dica
-        hint, created = await database_sync_to_async(Hint.objects.get_or_create)(
-            game=game,
-            player=player,
-            round_number=game.current_round,
-            defaults={'word': hint_word}
-        )
-        
-        if not created:
-            hint.word = hint_word
-            await database_sync_to_async(hint.save)()
-        
-        # Avançar para próximo jogador
-        await database_sync_to_async(game.next_player)()
-        
-        # Verificar se todos deram dica
-        active_players = await self.get_active_players(game)
-        hints_this_round = await database_sync_to_async(
-            Hint.objects.filter(game=game, round_number=game.current_round).count
-        )()
-        
-        if hints_this_round >= len(active_players):
-            # Todos deram dica, avançar rodada ou ir para votação
-            if game.current_round < 3:
-                # Nova rodada de dicas
-                game.current_round += 1
-                active_players = await self.get_active_players(game)
-                if active_players:
-                    game.current_player_index = random.randint(0, len(active_players) - 1)
-            else:
-                # Ir para votação
-                game.status = 'voting'
-                game.current_round += 1
-                game.current_player_index = 0
-        
-        await database_sync_to_async(game.save)()
+        await self.record_hint_sync(game, player, hint_word)
         await self.send_game_state()
 
     async def handle_submit_vote(self, data):
@@ -230,7 +225,7 @@ class GameConsumer(AsyncWebsocketConsumer):
         
         # Verificar se já votou nesta rodada
         existing_vote = await database_sync_to_async(
-            Vote.objects.filter(game=game, voter=voter, round_number=game.current_round).exists
+            Vote.objects.filter(game=game, voter=voter, round_number=game.current_round, is_palhaco_guess=False).exists
         )()
         
         if existing_vote:
@@ -240,94 +235,19 @@ class GameConsumer(AsyncWebsocketConsumer):
             }))
             return
         
-        # Criar voto
-        await database_sync_to_async(Vote.objects.create)(
-            game=game,
-            voter=voter,
-            target=target,
-            round_number=game.current_round
-        )
-        
-        # Verificar se todos votaram
-        def check_all_voted():
-            game_obj = Game.objects.get(id=game.id)
-            active_players_list = list(game_obj.get_active_players())
-            votes_count = Vote.objects.filter(game=game_obj, round_number=game_obj.current_round).count()
-            return votes_count >= len(active_players_list), game_obj
-        
-        all_voted, game_obj = await database_sync_to_async(check_all_voted)()
+        # Voto, contador e apuração na mesma transação (a mesma apuração das views)
+        vote_result = await database_sync_to_async(_record_vote_and_progress)(game, voter, target)
+        metrics.VOTES.inc(kind='elimination')
         
-        if all_voted:
-            # Todos votaram, processar eliminação
-            await self.process_voting(game_obj)
-            # Recarregar game após processamento
-            game = await self.get_game()
-        
-        await self.send_game_state()
-
-    async def process_voting(self, game):
-        """Processar votação e eliminar jogador"""
-        def process_votes_sync():
-            # Recarregar game para ter dados atualizados
-            game_obj = Game.objects.get(id=game.id)
-            
-            # Contar votos
-            votes = list(
-                Vote.objects.filter(game=game_obj, round_number=game_obj.current_round)
-                .select_related('target')
-            )
-            
-            vote_count = {}
-            for vote in votes:
-                target_id = vote.target.id
-                vote_count[target_id] = vote_count.get(target_id, 0) + 1
-            
-            # Encontrar jogador mais votado
-            eliminated = False
-            if vote_count:
-                max_votes = max(vote_count.values())
-                most_voted_ids = [pid for pid, vote_count_val in vote_count.items() if vote_count_val == max_votes]
-                
-                if len(most_voted_ids) == 1:
-                    # Eliminar jogador mais votado
-                    eliminated_player = Player.objects.get(id=most_voted_ids[0])
-                    if not eliminated_player.is_eliminated:  # Só eliminar se ainda não foi eliminado
-                        eliminated_player.is_eliminated = True
-                        eliminated_player.save()
-                        eliminated = True
-                # Se houver empate, ninguém é eliminado mas o jogo continua
-            
-            # Recarregar game novamente após eliminação
-            game_obj.refresh_from_db()
-            
-            # Verificar condições de vitória
-            winner = game_obj.check_win_conditions()
+        if vote_result is not None:
+            # Um jogador pode ter sido eliminado
+            self.invalidate()
             
-            if winner:
-                game_obj.status = 'finished'
-                game_obj.finished_at = timezone.now()
-                game_obj.save()
-            else:
-                # Continuar jogo com nova rodada de dicas
-                game_obj.status = 'hints'
-                game_obj.current_round += 1
-                active_players_list = list(game_obj.get_active_players())
-                if active_players_list:
-                    game_obj.current_player_index = random.randint(0, len(active_players_list) - 1)
-                else:
-                    # Se não há mais jogadores ativos, finalizar
-                    game_obj.status = 'finished'
-                    game_obj.finished_at = timezone.now()
-                game_obj.save()
-            
-            return game_obj
-        
-        await database_sync_to_async(process_votes_sync)()
+            # Se o jogo terminou, iniciar timer de auto-delete
+            if game.status == 'finished':
+                await self.start_auto_delete_timer()
         
-        # Se o jogo terminou, iniciar timer de auto-delete
-        updated_game = await self.get_game()
-        if updated_game and updated_game.status == 'finished':
-            await self.start_auto_delete_timer()
+        await self.send_game_state()
 
     async def handle_restart_game(self, data):
         """Reiniciar o jogo com os mesmos jogadores"""
@@ -354,10 +274,10 @@ class GameConsumer(AsyncWebsocketConsumer):
             return
         
         def restart_game_sync():
-            from django.db import transaction
-            
+            # Sem trava na sala: o save() confere a versão e desfaz tudo se ela mudou
             with transaction.atomic():
-                game_obj = Game.objects.select_for_update().get(id=game.id)
+                game_obj = game
+                archive_games([game_obj])
                 
                 # Resetar todos os jogadores (remover eliminação)
                 for player in game_obj.players.all():
@@ -385,19 +305,13 @@ class GameConsumer(AsyncWebsocketConsumer):
                 return game_obj
         
         await database_sync_to_async(restart_game_sync)()
+        self.invalidate()
         
         # Cancelar timer de auto-delete se estiver rodando
         await self.cancel_auto_delete_timer()
         
-        # Recarregar o game após reset para garantir dados atualizados
-        game = await self.get_game()
-        
         # Verificar se há jogadores suficientes após reset
-        def check_players_count():
-            game_obj = Game.objects.get(id=game.id)
-            return game_obj.players.count()
-        
-        players_count = await database_sync_to_async(check_players_count)()
+        players_count = await database_sync_to_async(Player.objects.filter(game_id=game.id).count)()
         
         await self.send_game_state()
         
@@ -461,25 +375,20 @@ class GameConsumer(AsyncWebsocketConsumer):
             return
         
         def kick_player_sync():
-            from django.db import transaction
-            
-            with transaction.atomic():
-                game_obj = Game.objects.select_for_update().get(id=game.id)
-                try:
-                    target = Player.objects.get(game=game_obj, name=target_player_name)
-                    target.delete()
-                    return True
-                except Player.DoesNotExist:
-                    return False
+            try:
+                target = Player.objects.get(game=game, name=target_player_name)
+            except Player.DoesNotExist:
+                return 'Jogador não encontrado', 404
+            return lobby.remove_player(target)
         
-        success = await database_sync_to_async(kick_player_sync)()
+        refused = await database_sync_to_async(kick_player_sync)()
         
-        if success:
+        if not refused:
             await self.send_game_state()
         else:
             await self.send(text_data=json.dumps({
                 'type': 'error',
-                'message': 'Jogador não encontrado'
+                'message': refused[0]
             }))
 
     async def handle_close_room(self, data):
@@ -506,17 +415,15 @@ class GameConsumer(AsyncWebsocketConsumer):
             }))
             return
         
-        def close_room_sync():
-            game_obj = Game.objects.get(id=game.id)
-            game_code = game_obj.code
-            
-            # Deletar tudo relacionado ao jogo
-            # (Django CASCADE já deleta players, hints e votes automaticamente)
-            game_obj.delete()
-            
-            return game_code
+        # Status relido do banco: decide se a partida vai para o arquivo
+        self.invalidate()
+        game = await self.get_game()
+        if not game:
+            return
         
-        game_code = await database_sync_to_async(close_room_sync)()
+        # Arquivar (se finalizada) e apagar a sala com jogadores, dicas, votos e nudges
+        await database_sync_to_async(archive_and_delete)(game)
+        self.invalidate()
         
         # Cancelar timer de auto-delete se estiver rodando
         await self.cancel_auto_delete_timer()
@@ -544,145 +451,57 @@ class GameConsumer(AsyncWebsocketConsumer):
         )
 
     async def send_game_state(self):
-        """Enviar estado atual do jogo para todos"""
-        game = await self.get_game()
-        if not game:
-            return
-        
-        # Verificar se é espectador (sem autenticação)
-        is_spectator = not hasattr(self, 'authenticated_player_name') or not self.authenticated_player_name
-        
-        players_data = []
-        # Buscar players com select_related para evitar queries adicionais
-        def get_players_data():
-            players_qs = game.players.select_related('word').all()
-            players_list = sort_players_for_display(game.code, players_qs)
-            result = []
-            for player in players_list:
-                word_text = None
-                # Espectadores não veem palavras/papéis
-                if not is_spectator and hasattr(player, 'word') and player.word:
-                    word_text = player.word.text
-                
-                player_data = {
-                    'id': player.id,
-                    'name': player.name,
-                    'is_eliminated': player.is_eliminated,
-                    'is_creator': player.is_creator,
-                }
-                
-                # Apenas jogadores autenticados veem papéis e palavras
-                if not is_spectator:
-                    # WhiteMan NÃO sabe que é WhiteMan enquanto está ativo - vê como Cidadão
-                    # Mas quando é eliminado, TODOS (incluindo ele mesmo) descobrem que era WhiteMan
-                    if player.role == 'whiteman' and not player.is_eliminated:
-                        # WhiteMan ativo vê como citizen (não sabe que é WhiteMan)
-                        player_data['role'] = 'citizen'
-                    else:
-                        # Mostrar papel real (WhiteMan eliminado, cidadãos, impostores)
-                        player_data['role'] = player.role
-                    player_data['word'] = word_text
-                else:
-                    # Espectadores não veem informações sensíveis
-                    player_data['role'] = None
-                    player_data['word'] = None
-                
-                result.append(player_data)
-            return result
-        
-        players_data = await database_sync_to_async(get_players_data)()
-        
-        hints_data = []
-        def get_hints_data():
-            hints_list = list(
-                Hint.objects.filter(game=game)
-                .select_related('player')
-                .order_by('round_number', 'created_at')
-            )
-            result = []
-            for hint in hints_list:
-                result.append({
-                    'player_name': hint.player.name,
-                    'round_number': hint.round_number,
-                    'word': hint.word,
-                    'created_at': hint.created_at.isoformat(),
-                })
-            return result
-        
-        hints_data = await database_sync_to_async(get_hints_data)()
-        
-        votes_data = []
-        def get_votes_data():
-            votes_list = list(
-                Vote.objects.filter(game=game, round_number=game.current_round)
-                .select_related('voter', 'target')
-            )
-            result = []
-            for vote in votes_list:
-                result.append({
-                    'voter_name': vote.voter.name,
-                    'target_name': vote.target.name,
-                })
-            return result
-        
-        votes_data = await database_sync_to_async(get_votes_data)()
-        
-        # Obter dados do game e current_player de forma síncrona
-        def get_game_data():
-            # Recarregar game com select_related para trazer os relacionamentos
-            game_obj = Game.objects.select_related('citizen_word', 'impostor_word').get(id=game.id)
-            citizen_word_text = game_obj.citizen_word.text if game_obj.citizen_word else None
-            impostor_word_text = game_obj.impostor_word.text if game_obj.impostor_word else None
-            
-            # Obter current_player de forma síncrona
-            current_player_name = None
-            active_players_list = list(game_obj.get_active_players())
-            if active_players_list and 0 <= game_obj.current_player_index < len(active_players_list):
-                current_player_name = active_players_list[game_obj.current_player_index].name
-            
-            game_data = {
-                'code': game_obj.code,
-                'status': game_obj.status,
-                'current_round': game_obj.current_round,
-                'current_player': current_player_name,
-                'num_impostors': game_obj.num_impostors,
-                'num_whitemen': game_obj.num_whitemen,
-            }
-            
-            # Espectadores não veem as palavras do jogo
-            # Usar variável capturada do escopo externo
-            spectator_mode = is_spectator
-            if not spectator_mode:
-                game_data['citizen_word'] = citizen_word_text
-                game_data['impostor_word'] = impostor_word_text
-            else:
-                game_data['citizen_word'] = None
-                game_data['impostor_word'] = None
-            
-            return game_data
-        
-        game_data = await database_sync_to_async(get_game_data)()
-        
-        state = {
-            'type': 'game_state',
-            'game': game_data,
-            'players': players_data,
-            'hints': hints_data,
-            'votes': votes_data,
-        }
-        
-        # Enviar para o grupo
+        """Avisar todos os sockets da sala (este incluído) de que o estado mudou
+
+        O aviso é agrupado por sala (game/coalesce.py): ações que chegam dentro
+        da janela geram um único aviso, publicado no fim dela.
+        """
+        room_broadcasts.schedule(self.room_group_name, self.broadcast_room_changed)
+
+    async def broadcast_room_changed(self, merged):
+        # Com ações de outros sockets na janela, ninguém pode confiar no próprio cache
         await self.channel_layer.group_send(
             self.room_group_name,
             {
-                'type': 'game_state_message',
-                'state': state
+                'type': 'room_state_changed',
+                'origin': self.channel_name if merged == 1 else None,
             }
         )
 
+    async def get_game_state(self):
+        """Montar o estado atual do jogo para este socket (None se a sala não existe mais)
+
+        Sala, jogadores, dicas e votos vêm de um snapshot lido numa transação
+        de leitura (`read_snapshot`) e dividido entre os sockets da sala que
+        pedem o estado juntos (`aload_shared_snapshot`).
+        """
+        requested_at = time.monotonic()
+        game = await self.get_game()
+        if not game:
+            return None
+        snapshot = await aload_shared_snapshot(
+            game, requested_at, lambda: database_sync_to_async(load_consistent_snapshot)(game),
+        )
+        return await database_sync_to_async(self.build_game_state_sync)(snapshot)
+
+    def build_game_state_sync(self, snapshot):
+        game = snapshot.game
+        # Mesmas regras de visibilidade do estado HTTP: cada socket recebe a visão do próprio jogador
+        viewer = snapshot.player_named(self.authenticated_player_name) if self.authenticated_player_name else None
+        is_spectator = viewer is None
+        state = build_game_state(
+            snapshot, is_spectator, viewer, load_viewer_extras(snapshot, viewer),
+            presence.registry.room(game.code),
+        )
+        state['type'] = 'game_state'
+        return state
+
     async def game_state_message(self, event):
         """Enviar mensagem de estado do jogo"""
         state = event.get('state', {})
+        # Avisos (reinício, sala fechada) sem estado de jogadores; a contagem regressiva não muda a sala
+        if state.get('type') != 'auto_delete_countdown':
+            self.invalidate()
         if state.get('type') == 'room_closed':
             # Se a sala foi fechada, redirecionar após mostrar mensagem
             await self.send(text_data=json.dumps(state))
@@ -691,6 +510,20 @@ class GameConsumer(AsyncWebsocketConsumer):
         else:
             await self.send(text_data=json.dumps(state))
     
+    async def room_state_changed(self, event):
+        """Estado alterado por uma view ou outro socket (possivelmente em outro worker)"""
+        if event.get('origin') != self.channel_name:
+            self.invalidate()
+        # Uma rajada de avisos vira um estado só para este socket
+        room_broadcasts.schedule(self.channel_name, self.send_own_state)
+
+    async def send_own_state(self, merged):
+        if not self.counted_connection:
+            return  # o socket fechou durante a janela
+        state = await self.get_game_state()
+        if state is not None:
+            await self.send(text_data=json.dumps(state))
+
     async def close_connections(self, event):
         """Fechar todas as conexões"""
         await self.close()
@@ -738,15 +571,15 @@ class GameConsumer(AsyncWebsocketConsumer):
                     }
                 )
             
-            # Tempo acabou, deletar sala
+            # Tempo acabou, deletar sala (relida do banco: o cache pode estar um passo atrás)
+            self.invalidate()
             game = await self.get_game()
-            if game and game.status == 'finished':
-                def delete_game_sync():
-                    game_obj = Game.objects.get(id=game.id)
-                    game_obj.delete()
-                
-                await database_sync_to_async(delete_game_sync)()
-                
+            # Só apaga se ninguém reiniciou a sala depois dessa leitura
+            deleted = game and game.status == 'finished' and await database_sync_to_async(archive_and_delete)(
+                game, if_unchanged=True,
+            )
+            self.invalidate()
+            if deleted:
                 # Notificar todos
                 await self.channel_layer.group_send(
                     self.room_group_name,
@@ -772,16 +605,44 @@ class GameConsumer(AsyncWebsocketConsumer):
             # Timer foi cancelado, tudo bem
             pass
 
-    @database_sync_to_async
-    def get_game(self):
-        try:
-            # Usar select_related para trazer relacionamentos quando necessário
-            return Game.objects.select_related('citizen_word', 'impostor_word', 'word_group').get(code=self.game_code)
-        except Game.DoesNotExist:
-            return None
+    def invalidate(self):
+        """Marca sala e jogador em cache para serem relidos no próximo uso"""
+        self.cache_stale = True
+
+    async def get_game(self):
+        """Sala em cache (None se não existe mais), relida só depois de invalidate()"""
+        if self.cache_stale or self.game is None:
+            await database_sync_to_async(self.refresh_cache_sync)()
+        return self.game
+
+    def refresh_cache_sync(self):
+        if self.cache_stale or self.game is None:
+            self.game, self.player = self.load_game_and_player()
+            self.cache_stale = False
+        return self.game
+
+    def load_game_and_player(self):
+        """Sala e jogador autenticado numa consulta só (duas se ele não está na sala)"""
+        related = ('citizen_word', 'impostor_word', 'word_group')
+        if self.authenticated_player_name:
+            player = (
+                Player.objects.select_related(*(f'game__{name}' for name in related))
+                .filter(game__code=self.game_code, name=self.authenticated_player_name)
+                .first()
+            )
+            if player:
+                return player.game, player
+        return Game.objects.select_related(*related).filter(code=self.game_code).first(), None
+
+    async def get_player(self, game, name):
+        if name and name == self.authenticated_player_name:
+            await self.get_game()
+            if self.player is not None:
+                return self.player
+        return await self.fetch_player(game, name)
 
     @database_sync_to_async
-    def get_player(self, game, name):
+    def fetch_player(self, game, name):
         try:
             return Player.objects.get(game=game, name=name)
         except Player.DoesNotExist:
@@ -792,16 +653,43 @@ class GameConsumer(AsyncWebsocketConsumer):
         return game.can_start()
 
     @database_sync_to_async
-    def assign_words(self, game):
-        return game.assign_words()
-
-    @database_sync_to_async
-    def assign_roles(self, game):
+    @transaction.atomic
+    def start_game_sync(self, game):
+        """Sorteia palavras e papéis e abre a primeira rodada; False sem grupos de palavras"""
+        if not game.assign_words():
+            return False
         game.assign_roles()
+        game.status = 'hints'
+        game.current_round = 1
+        game.started_at = timezone.now()
+        # Escolher primeiro jogador aleatório
+        game.current_player_index = rules.first_player_index(game.alive_count)
+        game.save()
+        return True
 
     @database_sync_to_async
-    def get_active_players(self, game):
-        return list(game.get_active_players())
+    @transaction.atomic
+    def record_hint_sync(self, game, player, hint_word):
+        """Grava a dica e passa a vez; conflito de versão desfaz a dica também"""
+        hint, created = Hint.objects.get_or_create(
+            game=game,
+            player=player,
+            round_number=game.current_round,
+            defaults={'word': hint_word}
+        )
+        if created:
+            game.increment(round_hints=1)
+        else:
+            hint.word = hint_word
+            hint.save()
+        
+        # Avançar para próximo jogador; quando todos deram dica, avançar rodada ou ir para votação
+        next_index = rules.next_player_index(game.current_player_index, game.alive_count)
+        turn = rules.after_hint(game.current_round, next_index, game.round_hints, game.alive_count)
+        if turn.current_round != game.current_round:
+            game.set_counters(round_hints=0, round_votes=0)
+        game.status, game.current_round, game.current_player_index = turn.status, turn.current_round, turn.current_player_index
+        game.save()
 
     @database_sync_to_async
     def get_current_player(self, game):
@@ -835,6 +723,7 @@ class GameConsumer(AsyncWebsocketConsumer):
             authenticated_name = await self.get_authenticated_player_name()
             if authenticated_name:
                 self.authenticated_player_name = authenticated_name
+                self.invalidate()  # carregar o jogador junto com a sala
         
         # Verificar se o nome fornecido corresponde ao autenticado
         if provided_name == authenticated_name:
@@ -0,0 +1,126 @@
+"""Estatísticas das conexões com o banco mantidas por este processo.
+
+As conexões do Django são por thread; aqui registramos cada conexão criada
+para saber quantas estão abertas e quantas vezes o processo precisou pagar o
+handshake TCP/autenticação com o Postgres.
+
+Cada conexão também ganha um execute_wrapper que soma consultas e tempo nos
+totais do processo e no contador ativo (`track_queries`). O contador fica numa
+ContextVar, então acompanha a requisição inclusive dentro de sync_to_async.
+"""
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection as default_connection
+
+_lock = threading.Lock()
+_wrappers = weakref.WeakSet()
+_connections_opened = 0
+_active_counter = ContextVar('db_query_counter', default=None)
+
+
+class QueryCounter:
+    __slots__ = ('queries', 'time_ms', 'parent')
+
+    def __init__(self, parent=None):
+        self.queries = 0
+        self.time_ms = 0.0
+        self.parent = parent  # contador do bloco externo, quando aninhado
+
+
+# Totais do processo, somando todas as conexões e threads
+_totals = QueryCounter()
+
+# Latência recente das consultas: média móvel exponencial e quando foi a última
+LATENCY_SMOOTHING = 0.1
+_recent_ms = 0.0
+_recent_at = 0.0
+
+
+def _count_query(execute, sql, params, many, context):
+    global _recent_ms, _recent_at
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        finished = time.perf_counter()
+        elapsed_ms = (finished - started) * 1000
+        with _lock:
+            _totals.queries += 1
+            _totals.time_ms += elapsed_ms
+            _recent_ms += LATENCY_SMOOTHING * (elapsed_ms - _recent_ms)
+            _recent_at = finished
+        counter = _active_counter.get()
+        while counter is not None:
+            counter.queries += 1
+            counter.time_ms += elapsed_ms
+            counter = counter.parent
+
+
+def query_totals():
+    """(consultas, ms) acumulados por este processo desde que subiu."""
+    with _lock:
+        return _totals.queries, _totals.time_ms
+
+
+def recent_query_ms(max_age=5.0):
+    """Latência média recente das consultas deste processo, em ms.
+
+    Sem nenhuma consulta nos últimos `max_age` segundos devolve 0: uma medida
+    velha não diz nada sobre o banco agora.
+    """
+    with _lock:
+        if time.perf_counter() - _recent_at > max_age:
+            return 0.0
+        return _recent_ms
+
+
+@contextmanager
+def track_queries():
+    """Conta as consultas (e o tempo gasto nelas) feitas dentro do bloco.
+
+    Blocos aninhados também somam nos contadores externos.
+    """
+    counter = QueryCounter(_active_counter.get())
+    token = _active_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _active_counter.reset(token)
+
+
+def on_connection_created(sender, connection, **kwargs):
+    global _connections_opened
+    with _lock:
+        _connections_opened += 1
+        _wrappers.add(connection)
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def pool_stats():
+    """Retorna um dicionário com o estado das conexões deste processo."""
+    db_settings = settings.DATABASES['default']
+    with _lock:
+        wrappers = list(_wrappers)
+        opened = _connections_opened
+    return {
+        'mode': getattr(settings, 'DB_POOL_MODE', 'off'),
+        'conn_max_age': db_settings.get('CONN_MAX_AGE', 0),
+        'health_checks': db_settings.get('CONN_HEALTH_CHECKS', False),
+        'connections_opened': opened,
+        'connections_open': sum(1 for wrapper in wrappers if wrapper.connection is not None),
+    }
+
+
+def ping():
+    """Executa SELECT 1 na conexão da thread atual e retorna a latência em ms."""
+    started = time.perf_counter()
+    with default_connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    return (time.perf_counter() - started) * 1000
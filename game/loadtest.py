@@ -0,0 +1,320 @@
+"""Gerador de carga: N salas × M jogadores simulados contra um servidor rodando.
+
+Cada bot tem sua própria sessão (cookie jar) e faz exatamente o que o
+room.html faz: consulta o estado a cada POLL_INTERVAL_MS e, depois de cada
+ação, busca o estado de novo. Cada sala percorre o fluxo completo (criar,
+entrar, iniciar, dicas, nudges, palpites do Palhaço, votos, reiniciar) e no
+fim é fechada.
+
+Só usa a biblioteca padrão, então também roda fora do projeto:
+
+    python game/loadtest.py --url http://127.0.0.1:8000 --rooms 20 --players 8
+
+Para ver consultas ao banco por endpoint, suba o servidor com
+QUERY_COUNT_HEADERS=True.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from http.cookiejar import CookieJar
+
+ENDPOINTS = ('create', 'join', 'start', 'state', 'hint', 'nudge', 'vote', 'palhaco-guess', 'restart', 'close')
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Stats:
+    """Latência, status e consultas ao banco por endpoint (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.rejected = defaultdict(int)  # 4xx: regra do jogo ou corrida entre bots
+        self.errors = defaultdict(int)  # 5xx e falhas de rede
+        self.games_finished = 0
+        self.rooms_failed = 0
+
+    def record(self, label, elapsed_ms, status, db_queries):
+        with self._lock:
+            self.latencies[label].append(elapsed_ms)
+            if db_queries is not None:
+                self.queries[label].append(db_queries)
+            if status is None or status >= 500:
+                self.errors[label] += 1
+            elif status >= 400:
+                self.rejected[label] += 1
+
+    def add(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def rows(self):
+        labels = [label for label in ENDPOINTS if label in self.latencies]
+        labels += sorted(set(self.latencies) - set(labels))
+        for label in labels:
+            values = sorted(self.latencies[label])
+            queries = self.queries.get(label) or []
+            total = len(values)
+            yield {
+                'endpoint': label,
+                'requests': total,
+                'p50_ms': percentile(values, 0.50),
+                'p95_ms': percentile(values, 0.95),
+                'p99_ms': percentile(values, 0.99),
+                'error_rate': self.errors[label] / total,
+                'rejected_rate': self.rejected[label] / total,
+                'db_queries_avg': sum(queries) / len(queries) if queries else None,
+                'db_queries_max': max(queries) if queries else None,
+            }
+
+
+class Bot:
+    def __init__(self, base_url, name, stats, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.name = name
+        self.stats = stats
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def call(self, label, path, payload=None):
+        """Faz a requisição e devolve (status, json); status None em falha de rede."""
+        data = None
+        headers = {'Accept': 'application/json'}
+        if payload is not None:
+            data = json.dumps(payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers)
+        started = time.perf_counter()
+        status, body, db_queries = None, {}, None
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                status = response.status
+                db_queries = response.headers.get('X-DB-Queries')
+                body = response.read()
+        except urllib.error.HTTPError as exc:
+            status = exc.code
+            db_queries = exc.headers.get('X-DB-Queries')
+            body = exc.read()
+        except (urllib.error.URLError, OSError):
+            pass
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats.record(label, elapsed_ms, status, int(db_queries) if db_queries else None)
+        try:
+            return status, json.loads(body or b'{}')
+        except ValueError:
+            return status, {}
+
+    def state(self, code):
+        return self.call('state', f'/api/game/{code}/state/')
+
+    def act(self, code, action, payload):
+        status, data = self.call(action, f'/api/game/{code}/{action}/', dict(payload, player_name=self.name))
+        if status == 200:
+            # Como o postAction do room.html: depois de agir, atualiza o estado
+            self.state(code)
+        return status, data
+
+
+class RoomRun(threading.Thread):
+    def __init__(self, index, options, stats):
+        super().__init__(name=f'loadtest-room-{index}', daemon=True)
+        self.index = index
+        self.options = options
+        self.stats = stats
+        self.random = random.Random(options['seed'] + index)
+        self.stop_polling = threading.Event()
+        self.bots = [
+            Bot(options['url'], f'bot{index}_{number}', stats, options['timeout'])
+            for number in range(options['players'])
+        ]
+        self.bots_by_name = {bot.name: bot for bot in self.bots}
+        self.code = None
+
+    @property
+    def creator(self):
+        return self.bots[0]
+
+    def think(self):
+        pause = self.options['think_ms'] / 1000
+        if pause:
+            time.sleep(self.random.uniform(0.5 * pause, 1.5 * pause))
+
+    def run(self):
+        try:
+            self._run()
+        except Exception:
+            self.stats.add('rooms_failed')
+        finally:
+            self.stop_polling.set()
+
+    def _run(self):
+        status, data = self.creator.call('create', '/create/', {
+            'creator_name': self.creator.name,
+            'num_impostors': self.options['impostors'],
+            'num_whitemen': self.options['whitemen'],
+            'num_palhacos': self.options['clowns'],
+        })
+        if status != 200:
+            raise RuntimeError(f'create falhou: {status} {data}')
+        self.code = data['code']
+        for bot in self.bots[1:]:
+            bot.call('join', '/join/', {'code': self.code, 'player_name': bot.name})
+            self.think()
+
+        poller = threading.Thread(target=self._poll_loop, daemon=True)
+        poller.start()
+        for game_number in range(self.options['games']):
+            if game_number:
+                self.creator.act(self.code, 'restart', {})
+            self.creator.act(self.code, 'start', {})
+            if self._play_game():
+                self.stats.add('games_finished')
+        self.stop_polling.set()
+        poller.join()
+        self.creator.call('close', f'/api/game/{self.code}/close/', {'player_name': self.creator.name})
+
+    def _poll_loop(self):
+        # Cada bot consulta a cada poll_interval, com as consultas espalhadas no intervalo
+        step = self.options['poll_interval'] / len(self.bots)
+        position = 0
+        while not self.stop_polling.wait(step):
+            self.bots[position].state(self.code)
+            position = (position + 1) % len(self.bots)
+
+    def _play_game(self):
+        for _ in range(self.options['max_steps']):
+            status, data = self.creator.state(self.code)
+            if status != 200 or data.get('room_closed'):
+                return False
+            game = data['game']
+            if game['status'] == 'finished':
+                return True
+            if game['status'] == 'hints':
+                self._hint_turn(game['current_player'])
+            elif game['status'] == 'voting':
+                self._voting_round(data)
+            else:
+                self.think()
+        return False
+
+    def _hint_turn(self, current_name):
+        current = self.bots_by_name.get(current_name)
+        if current is None:
+            return
+        if self.random.random() < self.options['nudge_rate']:
+            other = self.random.choice([bot for bot in self.bots if bot is not current])
+            other.act(self.code, 'nudge', {'target_player_name': current.name})
+        self.think()
+        current.act(self.code, 'hint', {'word': f'dica{self.random.randint(1, 999)}'})
+
+    def _voting_round(self, data):
+        alive = [player['name'] for player in data['players'] if not player['is_eliminated']]
+        for name in alive:
+            bot = self.bots_by_name.get(name)
+            if bot is None:
+                continue
+            status, view = bot.state(self.code)
+            if status != 200 or view.get('game', {}).get('status') != 'voting':
+                return
+            palhaco = view.get('palhaco')
+            if palhaco and palhaco.get('can_guess'):
+                candidates = [other for other in alive if other != name]
+                for target in self.random.sample(candidates, min(palhaco['guesses_remaining'], len(candidates))):
+                    bot.act(self.code, 'palhaco-guess', {'target_name': target})
+            self.think()
+            target = self.random.choice([other for other in alive if other != name])
+            bot.act(self.code, 'vote', {'target_name': target})
+
+
+def run(url, rooms=10, players=8, games=2, poll_interval=10.0, think_ms=200, ramp_seconds=5.0,
+        impostors=2, whitemen=1, clowns=1, nudge_rate=0.3, timeout=30, max_steps=400, seed=1):
+    """Roda a carga e devolve (Stats, duração em segundos)."""
+    options = dict(
+        url=url, players=players, games=games, poll_interval=poll_interval, think_ms=think_ms,
+        impostors=impostors, whitemen=whitemen, clowns=clowns, nudge_rate=nudge_rate,
+        timeout=timeout, max_steps=max_steps, seed=seed,
+    )
+    stats = Stats()
+    threads = [RoomRun(index, options, stats) for index in range(rooms)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+        if rooms > 1:
+            time.sleep(ramp_seconds / rooms)
+    for thread in threads:
+        thread.join()
+    return stats, time.perf_counter() - started
+
+
+def format_report(stats, duration):
+    total = sum(len(values) for values in stats.latencies.values())
+    lines = [
+        f'{total} requisições em {duration:.1f}s ({total / duration if duration else 0:.1f} req/s); '
+        f'{stats.games_finished} partidas concluídas, {stats.rooms_failed} salas com falha',
+        f'{"endpoint":<14}{"reqs":>7}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"erros":>8}{"4xx":>8}{"db méd":>8}{"db máx":>8}',
+    ]
+    for row in stats.rows():
+        db_avg = '-' if row['db_queries_avg'] is None else f'{row["db_queries_avg"]:.1f}'
+        db_max = '-' if row['db_queries_max'] is None else str(row['db_queries_max'])
+        lines.append(
+            f'{row["endpoint"]:<14}{row["requests"]:>7}{row["p50_ms"]:>9.1f}{row["p95_ms"]:>9.1f}'
+            f'{row["p99_ms"]:>9.1f}{row["error_rate"]:>8.1%}{row["rejected_rate"]:>8.1%}{db_avg:>8}{db_max:>8}'
+        )
+    return '\n'.join(lines)
+
+
+def add_arguments(parser):
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='Servidor alvo')
+    parser.add_argument('--rooms', type=int, default=10, help='Salas simultâneas')
+    parser.add_argument('--players', type=int, default=8, help='Bots por sala (4 a 12)')
+    parser.add_argument('--games', type=int, default=2, help='Partidas por sala (reinicia entre elas)')
+    parser.add_argument('--poll-interval', type=float, default=10.0, help='Segundos entre consultas de estado de cada bot')
+    parser.add_argument('--think-ms', type=int, default=200, help='Pausa média entre ações')
+    parser.add_argument('--ramp', type=float, default=5.0, help='Segundos para abrir todas as salas')
+    parser.add_argument('--impostors', type=int, default=2)
+    parser.add_argument('--whitemen', type=int, default=1)
+    parser.add_argument('--clowns', type=int, default=1)
+    parser.add_argument('--nudge-rate', type=float, default=0.3, help='Chance de um nudge antes de cada dica')
+    parser.add_argument('--timeout', type=float, default=30, help='Timeout de cada requisição (s)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='Imprimir o relatório em JSON')
+
+
+def run_from_options(options):
+    stats, duration = run(
+        options['url'], rooms=options['rooms'], players=options['players'], games=options['games'],
+        poll_interval=options['poll_interval'], think_ms=options['think_ms'], ramp_seconds=options['ramp'],
+        impostors=options['impostors'], whitemen=options['whitemen'], clowns=options['clowns'],
+        nudge_rate=options['nudge_rate'], timeout=options['timeout'], seed=options['seed'],
+    )
+    if options['json']:
+        return stats, json.dumps({
+            'duration_s': round(duration, 3),
+            'games_finished': stats.games_finished,
+            'rooms_failed': stats.rooms_failed,
+            'endpoints': list(stats.rows()),
+        }, indent=2)
+    return stats, format_report(stats, duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    _, report = run_from_options(vars(parser.parse_args()))
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Entrada e saída de jogadores da sala de espera.
+
+Entrar é uma operação só: um UPDATE condicional reserva a vaga
+(`player_count < max_players` e sala ainda não iniciada) e devolve o id da
+sala, e o INSERT do jogador vem na mesma transação. Se o nome já existe, a
+restrição única (game, name) faz o INSERT falhar e a transação desfaz a
+reserva. Entradas simultâneas nunca passam de `max_players`: o UPDATE trava a
+linha da sala e a próxima entrada reavalia a condição com o contador novo.
+Sair segue o mesmo caminho ao contrário, e só enquanto a sala não começou.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Game, Player
+
+JOINABLE_STATUSES = ('waiting', 'configuring')
+
+
+def _claim_seat(code):
+    """Reserva uma vaga na sala; devolve o id da sala ou None."""
+    if connection.vendor == 'postgresql':
+        table = connection.ops.quote_name(Game._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET player_count = player_count + 1, last_activity_at = %s '
+                'WHERE code = %s AND status IN %s AND player_count < max_players RETURNING id',
+                [timezone.now(), code, JOINABLE_STATUSES],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    # Outros bancos: o UPDATE com F() trava a linha; o id vem numa consulta à parte
+    game_id = Game.objects.filter(code=code).values_list('id', flat=True).first()
+    claimed = Game.objects.filter(
+        id=game_id, status__in=JOINABLE_STATUSES, player_count__lt=F('max_players'),
+    ).update(player_count=F('player_count') + 1, last_activity_at=timezone.now())
+    return game_id if claimed else None
+
+
+def _refusal(code):
+    status = Game.objects.filter(code=code).values_list('status', flat=True).first()
+    if status is None:
+        return 'Código inválido', 404
+    if status not in JOINABLE_STATUSES:
+        return 'O jogo já começou', 400
+    return 'Sala cheia', 400
+
+
+def join_room(code, name):
+    """Coloca o jogador na sala; devolve (mensagem de erro, status) ou None.
+
+    Com sucesso são duas consultas (UPDATE e INSERT); recusas custam uma a mais.
+    """
+    try:
+        with transaction.atomic():
+            game_id = _claim_seat(code)
+            if game_id is None:
+                return _refusal(code)
+            Player.objects.create(game_id=game_id, name=name)
+    except IntegrityError:
+        return 'Nome já está em uso nesta sala', 400
+    return None
+
+
+def remove_player(player):
+    """Apaga o jogador e libera a vaga; devolve (mensagem de erro, status) ou None.
+
+    O UPDATE condicional na sala vem primeiro: trava a linha, desconta a vaga e
+    sobe a versão, então um início de jogo que já sorteou papéis com esse
+    jogador perde o compare-and-set e é desfeito. Se o jogo já começou, nada é
+    apagado. O DELETE também só vale com a sala aberta e, se não achar o
+    jogador (outro pedido o removeu antes), a transação devolve a vaga.
+    """
+    with transaction.atomic():
+        claimed = Game.objects.filter(id=player.game_id, status__in=JOINABLE_STATUSES).update(
+            player_count=F('player_count') - 1,
+            version=F('version') + 1,
+            last_activity_at=timezone.now(),
+        )
+        if not claimed:
+            return 'Não é possível remover jogadores após o início do jogo', 400
+        _, deleted = Player.objects.filter(pk=player.pk, game__status__in=JOINABLE_STATUSES).delete()
+        if not deleted.get(Player._meta.label):
+            transaction.set_rollback(True)
+            return 'Jogador não encontrado', 404
+    return None
@@ -0,0 +1,95 @@
+import io
+import json
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from game.benchmarks import all_benchmarks, compare, format_us, run
+
+
+class Command(BaseCommand):
+    help = (
+        'Micro-benchmarks de estado, ordenação, regras e nudge. Salva o resultado em JSON '
+        '(--save) e compara com um baseline (--compare). Os casos com banco usam um banco de teste.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filter', default='', help='Só os casos cujo nome contém este texto')
+        parser.add_argument('--repeat', type=int, default=5, help='Rodadas por caso (vale a mediana)')
+        parser.add_argument('--min-time', type=float, default=0.05, help='Duração mínima de cada rodada, em segundos')
+        parser.add_argument('--no-db', action='store_true', help='Rodar só os casos que não usam banco')
+        parser.add_argument('--keepdb', action='store_true', help='Reaproveitar o banco de teste')
+        parser.add_argument('--save', help='Gravar o resultado em JSON neste arquivo')
+        parser.add_argument('--compare', help='Baseline em JSON para comparar')
+        parser.add_argument('--threshold', type=float, default=0.10,
+                            help='Variação tolerada na comparação (0.10 = 10%%)')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Falhar se algum caso ficar mais lento que o baseline')
+        parser.add_argument('--json', action='store_true', help='Imprimir o resultado em JSON')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                baseline = json.loads(Path(options['compare']).read_text())
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Não foi possível ler o baseline: {exc}')
+
+        benchmarks = [b for b in all_benchmarks() if options['filter'] in b.name]
+        if not benchmarks:
+            raise CommandError('Nenhum caso corresponde ao filtro.')
+        use_db = not options['no_db'] and any(b.db for b in benchmarks)
+        progress = None if options['json'] else self._progress
+
+        if use_db:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+            try:
+                call_command('populate_words', stdout=io.StringIO())
+                with override_settings(
+                    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+                    QUERY_COUNT_HEADERS=False,
+                ):
+                    result = run(benchmarks, options['repeat'], options['min_time'], True, progress)
+            finally:
+                connections.close_all()
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+        else:
+            result = run(benchmarks, options['repeat'], options['min_time'], False, progress)
+
+        if options['save']:
+            Path(options['save']).write_text(json.dumps(result, indent=2, ensure_ascii=False) + '\n')
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2, ensure_ascii=False))
+
+        if baseline is not None:
+            self._compare(result, baseline, options)
+
+    def _progress(self, name, stats):
+        self.stdout.write(
+            f'{name:<38} {format_us(stats["median_us"]):>11}  '
+            f'(mín. {format_us(stats["min_us"])}, ±{format_us(stats["stdev_us"])}, '
+            f'{stats["queries"]} consultas, {stats["calls"]}×{stats["repeat"]})'
+        )
+
+    def _compare(self, result, baseline, options):
+        base_meta = baseline.get('meta', {})
+        self.stdout.write(
+            f'\nComparando com {options["compare"]} '
+            f'(commit {base_meta.get("commit") or "?"}, {base_meta.get("timestamp", "?")}):'
+        )
+        slower = []
+        for name, before, after, ratio, verdict in compare(result, baseline, options['threshold']):
+            ratio_text = f'{ratio:5.2f}x' if ratio is not None else '     -'
+            line = f'{name:<38} {format_us(before):>11} → {format_us(after):>11}  {ratio_text}  {verdict}'
+            if verdict == 'mais lento':
+                slower.append(name)
+                line = self.style.ERROR(line)
+            elif verdict == 'mais rápido':
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
+        if slower and options['fail_on_regression']:
+            raise CommandError(f'{len(slower)} caso(s) mais lentos que o baseline: {", ".join(slower)}')
@@ -0,0 +1,424 @@
+import asyncio
+import io
+import json
+import random
+import statistics
+import time
+from dataclasses import dataclass
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from game import urls as game_urls
+from game.dbpool import query_totals, track_queries
+from game.models import Hint, Vote
+from game.synthetic import build_playing_room
+
+try:
+    from game.consumers import GameConsumer
+except ImportError:  # channels é opcional
+    GameConsumer = None
+
+
+@dataclass
+class Budget:
+    label: str
+    url_name: str
+    max_queries: int
+    max_ms: float
+    setup: object  # função que monta a sala e devolve (client, method, path, payload, status)
+
+
+def _client_for(game, name=None):
+    client = Client()
+    if name:
+        session = client.session
+        session[f'player_{game.code}'] = name
+        session.save()
+    return client
+
+
+def _alive(game):
+    return list(game.get_active_players())
+
+
+def _url(name, game=None):
+    return reverse(name, kwargs={'code': game.code}) if game else reverse(name)
+
+
+def _home():
+    return Client(), 'get', _url('home'), None, 200
+
+
+def _create():
+    payload = {'creator_name': 'criador', 'num_impostors': 2, 'num_whitemen': 2, 'num_palhacos': 1}
+    return Client(), 'post', _url('create_game'), payload, 200
+
+
+def _join():
+    game = build_playing_room(num_players=11, status='waiting')
+    return Client(), 'post', _url('join_game'), {'code': game.code, 'player_name': 'novo'}, 200
+
+
+def _room_page():
+    game = build_playing_room(status='hints')
+    return _client_for(game, 'p0'), 'get', reverse('game_room', kwargs={'code': game.code}), None, 200
+
+
+def _create_admin():
+    if not User.objects.filter(is_superuser=True).exists():
+        User.objects.create_superuser('admin', 'admin@example.com', 'senha-de-teste')
+    return Client(), 'get', _url('create_admin_user'), None, 403
+
+
+def _state_player():
+    game = build_playing_room(status='hints')
+    return _client_for(game, 'p0'), 'get', _url('game_state_api', game), None, 200
+
+
+def _state_clown():
+    game = build_playing_room(status='voting')
+    clown = game.players.get(role='clown')
+    return _client_for(game, clown.name), 'get', _url('game_state_api', game), None, 200
+
+
+def _state_spectator():
+    game = build_playing_room(status='hints')
+    return Client(), 'get', _url('game_state_api', game) + '?spectator=1', None, 200
+
+
+def _start():
+    game = build_playing_room(status='waiting')
+    return _client_for(game, 'p0'), 'post', _url('start_game_api', game), {'player_name': 'p0'}, 200
+
+
+def _hint():
+    game = build_playing_room(status='hints')
+    current = _alive(game)[0]
+    return _client_for(game, current.name), 'post', _url('submit_hint_api', game), \
+        {'player_name': current.name, 'word': 'dica'}, 200
+
+
+def _last_hint():
+    game = build_playing_room(status='hints')
+    current, *others = _alive(game)
+    Hint.objects.bulk_create([
+        Hint(game=game, player=player, round_number=game.current_round, word='dica') for player in others
+    ])
+    game.increment(round_hints=len(others))
+    return _client_for(game, current.name), 'post', _url('submit_hint_api', game), \
+        {'player_name': current.name, 'word': 'dica'}, 200
+
+
+def _vote():
+    game = build_playing_room(status='voting')
+    voter, target = _alive(game)[:2]
+    return _client_for(game, voter.name), 'post', _url('submit_vote_api', game), \
+        {'player_name': voter.name, 'target_name': target.name}, 200
+
+
+def _last_vote():
+    game = build_playing_room(status='voting')
+    voter, target, *others = _alive(game)
+    Vote.objects.bulk_create([
+        Vote(game=game, voter=player, target=target, round_number=game.current_round) for player in others
+    ] + [Vote(game=game, voter=target, target=voter, round_number=game.current_round)])
+    game.increment(round_votes=len(others) + 1)
+    return _client_for(game, voter.name), 'post', _url('submit_vote_api', game), \
+        {'player_name': voter.name, 'target_name': target.name}, 200
+
+
+def _palhaco_guess():
+    game = build_playing_room(status='voting')
+    clown = game.players.get(role='clown')
+    target = next(player for player in _alive(game) if player.id != clown.id)
+    return _client_for(game, clown.name), 'post', _url('submit_palhaco_guess_api', game), \
+        {'player_name': clown.name, 'target_name': target.name}, 200
+
+
+def _chaos_power():
+    game = build_playing_room(status='hints')
+    clown = game.players.get(role='clown')
+    clown.palhaco_goal_state = 'eliminate'
+    clown.save(update_fields=['palhaco_goal_state'])
+    return _client_for(game, clown.name), 'post', _url('use_chaos_power_api', game), \
+        {'player_name': clown.name}, 200
+
+
+def _restart():
+    game = build_playing_room(status='finished')
+    return _client_for(game, 'p0'), 'post', _url('restart_game_api', game), {'player_name': 'p0'}, 200
+
+
+def _close():
+    game = build_playing_room(status='hints')
+    return _client_for(game, 'p0'), 'post', _url('close_room_api', game), {'player_name': 'p0'}, 200
+
+
+def _close_finished():
+    # Sala finalizada: arquiva a partida em GameArchive antes de apagar
+    game = build_playing_room(status='finished')
+    return _client_for(game, 'p0'), 'post', _url('close_room_api', game), {'player_name': 'p0'}, 200
+
+
+def _kick():
+    game = build_playing_room(status='waiting')
+    return _client_for(game, 'p0'), 'post', _url('kick_player_api', game), \
+        {'player_name': 'p0', 'target_player_name': 'p5'}, 200
+
+
+def _nudge():
+    game = build_playing_room(status='hints')
+    # Os jogadores 1 e 2 já mandaram nudges agora há pouco (ver build_playing_room)
+    alive = _alive(game)
+    current, sender = alive[0], alive[3]
+    return _client_for(game, sender.name), 'post', _url('nudge_player_api', game), \
+        {'player_name': sender.name, 'target_player_name': current.name}, 200
+
+
+def _db_health():
+    return Client(), 'get', _url('db_health_api'), None, 200
+
+
+def _leaderboard():
+    # Mede a leitura sem cache; as seguintes não vão ao banco
+    cache.delete('leaderboard:20')
+    return Client(), 'get', _url('leaderboard_api'), None, 200
+
+
+def _metrics():
+    build_playing_room(status='hints')
+    return Client(), 'get', _url('metrics'), None, 200
+
+
+# Orçamentos por endpoint numa sala de 12 jogadores com 6+ rodadas de histórico.
+# Ao otimizar um endpoint, abaixe o orçamento junto; nunca suba sem entender o porquê.
+# Fechar sala trava e relê a sala (SELECT ... FOR UPDATE) antes de arquivar e apagar.
+HTTP_BUDGETS = [
+    Budget('home', 'home', 0, 150, _home),
+    Budget('criar sala', 'create_game', 6, 150, _create),
+    Budget('entrar na sala', 'join_game', 4, 150, _join),
+    Budget('página da sala', 'game_room', 6, 300, _room_page),
+    Budget('criar admin', 'create_admin_user', 1, 150, _create_admin),
+    Budget('estado (jogador)', 'game_state_api', 7, 150, _state_player),
+    Budget('estado (palhaço)', 'game_state_api', 7, 150, _state_clown),
+    Budget('estado (espectador)', 'game_state_api', 4, 150, _state_spectator),
+    Budget('iniciar', 'start_game_api', 26, 300, _start),
+    # Dica: o get_or_create dentro da transação abre um SAVEPOINT (+2 consultas)
+    Budget('dica', 'submit_hint_api', 10, 150, _hint),
+    Budget('última dica da rodada', 'submit_hint_api', 11, 150, _last_hint),
+    Budget('voto', 'submit_vote_api', 7, 150, _vote),
+    Budget('último voto da rodada', 'submit_vote_api', 13, 200, _last_vote),
+    Budget('palpite do palhaço', 'submit_palhaco_guess_api', 8, 150, _palhaco_guess),
+    Budget('poder do caos', 'use_chaos_power_api', 18, 300, _chaos_power),
+    # Reiniciar uma sala finalizada arquiva a partida (5 leituras + 1 INSERT)
+    Budget('reiniciar', 'restart_game_api', 28, 300, _restart),
+    Budget('fechar sala', 'close_room_api', 11, 200, _close),
+    Budget('fechar sala finalizada', 'close_room_api', 17, 200, _close_finished),
+    Budget('remover jogador', 'kick_player_api', 10, 200, _kick),
+    Budget('nudge', 'nudge_player_api', 7, 150, _nudge),
+    Budget('placar', 'leaderboard_api', 2, 150, _leaderboard),
+    Budget('saúde do banco', 'db_health_api', 1, 150, _db_health),
+    Budget('métricas', 'metrics', 1, 150, _metrics),
+]
+
+# Mensagens do GameConsumer: (rótulo, status da sala, jogador, mensagem, consultas, ms).
+# `connect` mede a conexão com o envio do estado inicial. O close_room não tem
+# orçamento de tempo: o consumer espera 2s de propósito antes de responder.
+# O estado de cada socket inclui os nudges pendentes do jogador, como no HTTP
+# (mais uma consulta, e o UPDATE que os marca como vistos no connect).
+# Remover jogador apaga com filtro no status da sala (o collector faz um SELECT).
+CONSUMER_BUDGETS = [
+    ('connect', 'hints', 'p0', None, 7, 200),
+    ('get_state', 'hints', 'p0', {'type': 'get_state'}, 5, 200),
+    ('start_game', 'waiting', 'p0', {'type': 'start_game', 'player_name': 'p0'}, 27, 300),
+    ('submit_hint', 'hints', None, {'type': 'submit_hint', 'word': 'dica'}, 12, 300),
+    ('submit_vote', 'voting', None, {'type': 'submit_vote'}, 9, 300),
+    ('restart_game', 'finished', 'p0', {'type': 'restart_game', 'player_name': 'p0'}, 29, 300),
+    ('kick_player', 'waiting', 'p0', {'type': 'kick_player', 'player_name': 'p0', 'target_player_name': 'p5'}, 12, 300),
+    ('close_room', 'hints', 'p0', {'type': 'close_room', 'player_name': 'p0'}, 9, None),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria um banco de teste, monta salas realistas (12 jogadores, 6+ rodadas, palhaço e '
+        'whitemen) e falha se algum endpoint de game/urls.py ou mensagem do GameConsumer '
+        'passar do orçamento de consultas ou de tempo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='Execuções por caso (vale a mediana do tempo)')
+        parser.add_argument('--time-factor', type=float, default=1.0,
+                            help='Multiplica os orçamentos de tempo (máquinas de CI lentas)')
+        parser.add_argument('--skip-consumer', action='store_true', help='Não medir o GameConsumer')
+        parser.add_argument('--keepdb', action='store_true', help='Reaproveitar o banco de teste')
+
+    def handle(self, *args, **options):
+        self.repeat = max(1, options['repeat'])
+        self.time_factor = options['time_factor']
+        self._check_coverage()
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        failures = []
+        try:
+            call_command('populate_words', stdout=io.StringIO())
+            with override_settings(
+                STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+                QUERY_COUNT_HEADERS=False,
+                METRICS_ENABLED=True,
+                METRICS_TOKEN='',
+                RATE_LIMIT_ENABLED=False,
+                LOAD_SHED_DB_LATENCY_MS=0,
+            ):
+                failures += self._run_http_budgets()
+                if GameConsumer is None:
+                    self.stdout.write('channels não instalado; mensagens do GameConsumer não medidas.')
+                elif not options['skip_consumer']:
+                    failures += asyncio.run(self._run_consumer_budgets())
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        if failures:
+            raise CommandError('Orçamento estourado:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Todos os endpoints dentro do orçamento.'))
+
+    def _check_coverage(self):
+        covered = {budget.url_name for budget in HTTP_BUDGETS}
+        missing = [pattern.name for pattern in game_urls.urlpatterns if pattern.name not in covered]
+        if missing:
+            raise CommandError(f'Endpoints sem orçamento em game/urls.py: {", ".join(missing)}')
+
+    def _report(self, label, queries, elapsed_ms, max_queries, max_ms):
+        problems = []
+        if queries > max_queries:
+            problems.append(f'{queries} consultas (máx. {max_queries})')
+        if max_ms is None:
+            self.stdout.write(f'{"✗" if problems else "✓"} {label:<28} {queries:>3} consultas        - ms')
+            return [f'{label}: ' + ', '.join(problems)] if problems else []
+        max_ms *= self.time_factor
+        if elapsed_ms > max_ms:
+            problems.append(f'{elapsed_ms:.1f} ms (máx. {max_ms:.0f})')
+        mark = self.style.ERROR('✗') if problems else '✓'
+        self.stdout.write(f'{mark} {label:<28} {queries:>3} consultas  {elapsed_ms:7.1f} ms')
+        return [f'{label}: ' + ', '.join(problems)] if problems else []
+
+    def _run_http_budgets(self):
+        failures = []
+        for budget in HTTP_BUDGETS:
+            query_counts, timings = [], []
+            for _ in range(self.repeat):
+                client, method, path, payload, expected_status = budget.setup()
+                # Mesmos sorteios (papéis, jogador inicial) em toda execução
+                random.seed(0)
+                kwargs = {'data': json.dumps(payload), 'content_type': 'application/json'} if payload else {}
+                with track_queries() as counter:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(path, **kwargs)
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != expected_status:
+                    raise CommandError(
+                        f'{budget.label}: esperado HTTP {expected_status}, veio {response.status_code} '
+                        f'({response.content[:200]!r})'
+                    )
+                query_counts.append(counter.queries)
+            failures += self._report(
+                budget.label, max(query_counts), statistics.median(timings), budget.max_queries, budget.max_ms
+            )
+        return failures
+
+    async def _run_consumer_budgets(self):
+        failures = []
+        try:
+            for label, status, player_name, message, max_queries, max_ms in CONSUMER_BUDGETS:
+                query_counts, timings = [], []
+                for _ in range(self.repeat):
+                    queries, elapsed_ms = await self._measure_message(status, player_name, message)
+                    query_counts.append(queries)
+                    timings.append(elapsed_ms)
+                failures += self._report(
+                    f'ws {label}', max(query_counts), statistics.median(timings), max_queries, max_ms
+                )
+        finally:
+            # Conexões abertas pela thread do database_sync_to_async
+            await sync_to_async(connections.close_all)()
+        return failures
+
+    async def _measure_message(self, status, player_name, message):
+        game, player_name, message = await sync_to_async(self._consumer_setup)(status, player_name, message)
+        session = await sync_to_async(self._session_for)(game, player_name)
+        # channels.testing depende do daphne; o ApplicationCommunicator do asgiref basta
+        communicator = ApplicationCommunicator(GameConsumer.as_asgi(), {
+            'type': 'websocket',
+            'path': f'/ws/game/{game.code}/',
+            'headers': [],
+            'subprotocols': [],
+            'url_route': {'args': (), 'kwargs': {'game_code': game.code}},
+            'session': session,
+        })
+
+        random.seed(0)
+        before, _ = query_totals()
+        started = time.perf_counter()
+        await communicator.send_input({'type': 'websocket.connect'})
+        accepted = await communicator.receive_output(timeout=5)
+        if accepted['type'] != 'websocket.accept':
+            raise CommandError(f'GameConsumer recusou a conexão na sala {game.code}')
+        finished = await self._drain(communicator, started)
+        if message is not None:
+            before, _ = query_totals()
+            started = time.perf_counter()
+            await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(message)})
+            finished = await self._drain(communicator, started)
+        after, _ = query_totals()
+        if not communicator.future.done():
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(timeout=5)
+        return after - before, (finished - started) * 1000
+
+    async def _drain(self, communicator, started, idle=0.3):
+        """Lê todas as respostas e devolve o instante da última.
+
+        Não usa receive_output(timeout): no asgiref o timeout cancela o consumer.
+        """
+        last = started
+        while True:
+            deadline = time.perf_counter() + idle
+            while communicator.output_queue.empty() and time.perf_counter() < deadline:
+                if communicator.future.done():
+                    communicator.future.result()
+                    return last
+                await asyncio.sleep(0.005)
+            if communicator.output_queue.empty():
+                return last
+            await communicator.output_queue.get()
+            last = time.perf_counter()
+
+    def _consumer_setup(self, status, player_name, message):
+        game = build_playing_room(status=status)
+        if message is None or player_name is not None:
+            return game, player_name, message
+        alive = _alive(game)
+        if message['type'] == 'submit_hint':
+            actor = alive[game.current_player_index]
+            return game, actor.name, dict(message, player_name=actor.name)
+        voter, target = alive[:2]
+        return game, voter.name, dict(message, player_name=voter.name, target_name=target.name)
+
+    def _session_for(self, game, player_name):
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[f'player_{game.code}'] = player_name
+        session.save()
+        return session
@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from game.models import Hint, Vote, Nudge
+from game.synthetic import build_rooms
+
+
+def hot_queries(game, player, other):
+    """Consultas quentes das views, na mesma forma em que são executadas."""
+    round_number = game.current_round
+    return [
+        ('hints da rodada', Hint.objects.filter(game=game, round_number=round_number)),
+        ('votos da rodada', Vote.objects.filter(game=game, round_number=round_number, is_palhaco_guess=False)),
+        ('voto do jogador na rodada', Vote.objects.filter(
+            game=game, voter=player, round_number=round_number, is_palhaco_guess=False,
+        )),
+        ('palpites do palhaço', Vote.objects.filter(
+            game=game, voter=player, round_number=round_number, is_palhaco_guess=True,
+        )),
+        ('nudges pendentes', Nudge.objects.filter(
+            game=game, to_player=player, acknowledged=False, round_number=round_number,
+        )),
+        ('nudge recente entre o par', Nudge.objects.filter(
+            game=game, from_player=player, to_player=other,
+            created_at__gte=timezone.now() - timedelta(seconds=1),
+        ).order_by('-created_at')[:1]),
+        ('jogadores ativos', game.get_active_players()),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria salas sintéticas numa transação descartada, roda EXPLAIN nas consultas '
+        'quentes e falha se alguma cair em Seq Scan. Use apenas em bancos de desenvolvimento/CI.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=2000, help='Quantidade de salas sintéticas')
+        parser.add_argument('--players', type=int, default=10, help='Jogadores por sala')
+        parser.add_argument('--rounds', type=int, default=6, help='Rodadas por sala')
+        parser.add_argument('--verbose-plans', action='store_true', help='Mostrar o plano completo de cada consulta')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Verificação de planos disponível apenas para PostgreSQL.')
+
+        failures = []
+        with transaction.atomic():
+            games = build_rooms(options['rooms'], options['players'], options['rounds'], seed=42)
+            with connection.cursor() as cursor:
+                for table in ('game_game', 'game_player', 'game_hint', 'game_vote', 'game_nudge'):
+                    cursor.execute(f'ANALYZE {table}')
+
+            game = games[len(games) // 2]
+            player, other = list(game.players.order_by('id'))[:2]
+            for label, queryset in hot_queries(game, player, other):
+                plan = queryset.explain()
+                scans = [line.strip() for line in plan.splitlines() if 'Seq Scan on game_' in line]
+                if scans:
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(f'✗ {label}: {scans[0]}'))
+                else:
+                    indexes = sorted({
+                        line.split(' using ', 1)[1].split(' on ', 1)[0]
+                        for line in plan.splitlines() if ' using ' in line
+                    })
+                    self.stdout.write(self.style.SUCCESS(f'✓ {label} ({", ".join(indexes)})'))
+                if options['verbose_plans'] or scans:
+                    self.stdout.write(plan + '\n')
+            # Nada do que foi gerado aqui deve permanecer no banco
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f'{len(failures)} consulta(s) regrediram para Seq Scan: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('\nTodas as consultas quentes usam índices.'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from game.models import WordGroup
+from game.wordpacks import DEFAULT_CHUNK_SIZE, MODES, export_pack, open_pack
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta os grupos de palavras em JSONL (um grupo por linha; gzip se o arquivo terminar '
+        'em .gz). Usa cursores do lado do servidor e memória constante.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo de saída (.jsonl, .jsonl.gz ou - para stdout)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Linhas buscadas por vez no cursor')
+        parser.add_argument('--group', action='append', default=[],
+                            help='Exportar só este grupo (pode repetir)')
+        parser.add_argument('--mode', choices=MODES, help='Gravar este modo em cada linha do pacote')
+
+    def handle(self, *args, **options):
+        queryset = WordGroup.objects.filter(name__in=options['group']) if options['group'] else None
+        to_stdout = options['path'] == '-'
+
+        def progress(groups, words):
+            if not to_stdout:
+                self.stdout.write(f'{groups} grupos, {words} palavras')
+
+        try:
+            with open_pack(options['path'], 'w') as stream:
+                groups, words = export_pack(
+                    stream, max(1, options['chunk_size']), queryset, options['mode'], progress,
+                )
+        except OSError as exc:
+            raise CommandError(f'Não foi possível gravar {options["path"]}: {exc}')
+        message = f'Exportados {groups} grupos e {words} palavras.'
+        if to_stdout:
+            self.stderr.write(message)
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from game.wordimport import DEFAULT_BATCH_SIZE
+from game.wordpacks import MODES, import_pack, open_pack
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa um pacote JSONL de palavras (gzip detectado automaticamente) em lotes. '
+        'upsert só acrescenta; replace deixa cada grupo do pacote exatamente com as palavras listadas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Pacote .jsonl ou .jsonl.gz (- para stdin)')
+        parser.add_argument('--mode', choices=MODES, default='upsert',
+                            help='Modo das linhas que não trazem "mode" (padrão: upsert)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Grupos por lote')
+
+    def handle(self, *args, **options):
+        def progress(stats):
+            self.stdout.write(
+                f'{stats.rows} grupos lidos, {stats.groups_created} criados, '
+                f'{stats.words_created} palavras novas, {stats.words_deleted} removidas'
+            )
+
+        try:
+            with open_pack(options['path'], 'r') as lines:
+                stats = import_pack(lines, options['mode'], max(1, options['batch_size']), progress)
+        except (OSError, EOFError) as exc:
+            raise CommandError(f'Não foi possível ler {options["path"]}: {exc}')
+        except UnicodeDecodeError as exc:
+            raise CommandError(f'O pacote precisa estar em UTF-8: {exc}')
+
+        for error in stats.errors:
+            self.stdout.write(self.style.WARNING(error))
+        hidden = stats.skipped_rows - len(stats.errors)
+        if hidden > 0:
+            self.stdout.write(self.style.WARNING(f'... e mais {hidden} linha(s) ignorada(s).'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Importação concluída: {stats.rows} grupos, {stats.groups_created} criados, '
+            f'{stats.words_created} palavras adicionadas, {stats.words_deleted} removidas, '
+            f'{stats.skipped_rows} linhas ignoradas.'
+        ))
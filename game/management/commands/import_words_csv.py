@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from game.wordimport import DEFAULT_BATCH_SIZE, import_csv_file
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa grupos de palavras de um CSV (uma linha por grupo, a primeira palavra é o nome). '
+        'Lê o arquivo em pedaços e grava em lotes; pode ser rodado de novo sem duplicar nada.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo CSV')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Grupos por lote')
+        parser.add_argument('--encoding', default='utf-8-sig', help='Codificação do arquivo')
+
+    def handle(self, *args, **options):
+        def progress(stats):
+            self.stdout.write(
+                f'{stats.rows} linhas, {stats.groups_created} grupos e {stats.words_created} palavras novas'
+            )
+
+        try:
+            with open(options['path'], 'rb') as csv_file:
+                stats = import_csv_file(csv_file, max(1, options['batch_size']), options['encoding'], progress)
+        except OSError as exc:
+            raise CommandError(f'Não foi possível abrir {options["path"]}: {exc}')
+        except UnicodeDecodeError as exc:
+            raise CommandError(f'Codificação inválida ({options["encoding"]}): {exc}')
+
+        for error in stats.errors:
+            self.stdout.write(self.style.WARNING(error))
+        hidden = stats.skipped_rows - len(stats.errors)
+        if hidden > 0:
+            self.stdout.write(self.style.WARNING(f'... e mais {hidden} linha(s) ignorada(s).'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Importação concluída: {stats.rows} linhas, {stats.groups_created} grupos criados, '
+            f'{stats.words_created} palavras adicionadas, {stats.skipped_rows} linhas ignoradas.'
+        ))
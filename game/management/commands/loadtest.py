@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from game.loadtest import add_arguments, run_from_options
+
+
+class Command(BaseCommand):
+    help = (
+        'Simula N salas × M jogadores contra um servidor rodando e mostra p50/p95/p99, '
+        'taxa de erros e consultas ao banco por endpoint (servidor com QUERY_COUNT_HEADERS=True).'
+    )
+
+    def add_arguments(self, parser):
+        add_arguments(parser)
+
+    def handle(self, *args, **options):
+        if not 4 <= options['players'] <= 12:
+            raise CommandError('--players deve estar entre 4 e 12.')
+        stats, report = run_from_options(options)
+        self.stdout.write(report)
+        if stats.rooms_failed:
+            raise CommandError(f'{stats.rooms_failed} salas falharam.')
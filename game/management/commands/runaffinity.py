@@ -0,0 +1,92 @@
+import asyncio
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.affinity import AffinityRouter
+
+DEFAULT_SERVER = 'daphne --proxy-headers -b {host} -p {port} vatimposter.asgi:application'
+
+
+class Command(BaseCommand):
+    help = (
+        'Sobe N workers ASGI independentes e um roteador na porta pública que envia '
+        'todo o tráfego de cada sala (HTTP e WebSocket) sempre para o mesmo worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', '2')),
+                            help='Quantidade de workers (padrão: $WEB_CONCURRENCY ou 2)')
+        parser.add_argument('--host', default='0.0.0.0', help='Endereço público do roteador')
+        parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', '8000')),
+                            help='Porta pública do roteador (padrão: $PORT ou 8000)')
+        parser.add_argument('--base-port', type=int, default=9100,
+                            help='Primeira porta interna; o worker i escuta em base-port + i')
+        parser.add_argument('--server', default=DEFAULT_SERVER,
+                            help='Comando de cada worker, com {host} e {port} (padrão: daphne)')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError('--workers deve ser pelo menos 1.')
+
+        backends = [('127.0.0.1', options['base_port'] + index) for index in range(workers)]
+        self.server_template = options['server']
+        self.processes = [self._spawn(index, workers, host, port) for index, (host, port) in enumerate(backends)]
+        self.backends = backends
+        self.stopping = False
+
+        self.stdout.write(
+            f'Roteador em {options["host"]}:{options["port"]} -> {workers} workers '
+            f'(portas {backends[0][1]}-{backends[-1][1]})'
+        )
+        try:
+            asyncio.run(self._run(AffinityRouter(backends), options['host'], options['port']))
+        finally:
+            self._stop_workers()
+
+    def _spawn(self, index, workers, host, port):
+        env = dict(os.environ, ROOM_AFFINITY_WORKERS=str(workers), ROOM_AFFINITY_WORKER=str(index))
+        command = shlex.split(self.server_template.format(host=host, port=port))
+        return subprocess.Popen(command, env=env, stdout=sys.stdout, stderr=sys.stderr)
+
+    async def _run(self, router, host, port):
+        loop = asyncio.get_running_loop()
+        serving = asyncio.ensure_future(router.serve(host, port))
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, serving.cancel)
+        try:
+            while not serving.done():
+                self._restart_dead_workers()
+                await asyncio.wait([serving], timeout=1)
+            serving.result()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.stopping = True
+            serving.cancel()
+
+    def _restart_dead_workers(self):
+        # Um worker que cai é recriado no mesmo índice e porta: as salas dele não mudam de dono
+        for index, process in enumerate(self.processes):
+            if process.poll() is None or self.stopping:
+                continue
+            self.stderr.write(f'Worker {index} saiu com código {process.returncode}; reiniciando')
+            host, port = self.backends[index]
+            self.processes[index] = self._spawn(index, len(self.processes), host, port)
+
+    def _stop_workers(self):
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        deadline = time.monotonic() + 10
+        for process in self.processes:
+            try:
+                process.wait(timeout=max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.rules import ROLE_ORDER, simulate_many
+
+
+class Command(BaseCommand):
+    help = (
+        'Simula milhares de partidas em memória com as regras de game/rules.py (sem banco) '
+        'e mostra taxas de vitória, quantidade de papéis sorteados e a justiça do sorteio por assento.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=10000, help='Partidas simuladas')
+        parser.add_argument('--players', type=int, default=8, help='Jogadores por partida')
+        parser.add_argument('--impostors', type=int, default=2, help='Máximo de impostores escolhido pelo criador')
+        parser.add_argument('--whitemen', type=int, default=1, help='Máximo de whitemen escolhido pelo criador')
+        parser.add_argument('--clowns', type=int, default=1, help='Palhaço (0 ou 1)')
+        parser.add_argument('--accuracy', type=float, default=0.3,
+                            help='Chance de um não impostor votar num impostor')
+        parser.add_argument('--clown-accuracy', type=float, default=0.2,
+                            help='Chance do Palhaço acertar todos os impostores numa votação')
+        parser.add_argument('--seed', type=int, default=None, help='Semente do sorteio (reproduzível)')
+        parser.add_argument('--json', action='store_true', help='Saída em JSON')
+
+    def handle(self, *args, **options):
+        if not 4 <= options['players'] <= 12:
+            raise CommandError('--players deve estar entre 4 e 12.')
+        if options['games'] < 1:
+            raise CommandError('--games deve ser positivo.')
+
+        report = simulate_many(
+            options['games'],
+            options['players'],
+            seed=options['seed'],
+            num_impostors=options['impostors'],
+            num_whitemen=options['whitemen'],
+            num_clowns=options['clowns'],
+            accuracy=options['accuracy'],
+            clown_accuracy=options['clown_accuracy'],
+        )
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{report['games']} partidas com {report['players']} jogadores em "
+            f"{report['elapsed_seconds']:.2f}s ({report['games_per_second']:.0f} partidas/s), "
+            f"{report['average_rounds']:.1f} rodadas em média"
+        )
+        self.stdout.write('\nVitórias:')
+        for team, share in report['wins'].items():
+            self.stdout.write(f'  {team:<12} {share:7.1%}')
+        self.stdout.write('\nPapéis sorteados (impostores/whitemen/palhaço):')
+        for label, share in report['role_counts'].items():
+            self.stdout.write(f'  {label:<12} {share:7.1%}')
+        self.stdout.write('\nJustiça por assento (fração esperada e maior desvio):')
+        for role in ROLE_ORDER:
+            fairness = report['seat_fairness'][role]
+            self.stdout.write(f"  {role:<12} {fairness['expected']:7.1%}  ±{fairness['max_deviation']:.1%}")
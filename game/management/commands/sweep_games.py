@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from game.archive import DEFAULT_BATCH_SIZE, sweep_games
+
+
+class Command(BaseCommand):
+    help = (
+        'Arquiva e apaga salas finalizadas que perderam o timer de auto-exclusão e apaga salas '
+        'abandonadas (não finalizadas) antigas. Pensado para rodar periodicamente (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-seconds', type=int, default=60,
+                            help='Idade mínima, desde o fim da partida, das salas finalizadas')
+        parser.add_argument('--abandoned-hours', type=float, default=12,
+                            help='Horas sem atividade das salas não finalizadas')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Salas por transação')
+        parser.add_argument('--dry-run', action='store_true', help='Só contar, sem arquivar nem apagar')
+
+    def handle(self, *args, **options):
+        archived, deleted = sweep_games(
+            options['grace_seconds'], options['abandoned_hours'], max(1, options['batch_size']), options['dry_run'],
+        )
+        prefix = 'Simulação: seriam' if options['dry_run'] else 'Concluído:'
+        self.stdout.write(self.style.SUCCESS(f'{prefix} {archived} partidas arquivadas e {deleted} salas apagadas.'))
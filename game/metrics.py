@@ -0,0 +1,257 @@
+"""Métricas do processo no formato texto do Prometheus, servidas em /metrics.
+
+Sem dependências: contadores, gauges e histogramas simples guardados em
+memória e protegidos por lock. Os valores são por processo; com vários
+workers cada um expõe os seus (o label `worker` do `vatimposter_process_info`
+identifica qual respondeu). Salas e jogadores vêm do banco na hora da coleta.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db.models import Count
+
+from .dbpool import pool_stats, query_totals, recent_query_ms
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+PLAYER_BUCKETS = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def collect(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        lines = self.header()
+        for key, value in items:
+            lines.append(f'{self.name}{_labels(self.labelnames, key)} {_number(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def collect(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            lines += _histogram_lines(self.name, self.labelnames, key, self.buckets, counts, total, count)
+        return lines
+
+
+def _histogram_lines(name, labelnames, key, buckets, counts, total, count):
+    lines = []
+    cumulative = 0
+    for bound, bucket_count in zip(buckets, counts):
+        cumulative += bucket_count
+        le = 'le="' + _number(float(bound)) + '"'
+        lines.append(f'{name}_bucket{_labels(labelnames, key, le)} {cumulative}')
+    lines.append(f'{name}_sum{_labels(labelnames, key)} {_number(total)}')
+    lines.append(f'{name}_count{_labels(labelnames, key)} {count}')
+    return lines
+
+
+HTTP_REQUESTS = Counter(
+    'vatimposter_http_requests_total', 'Requisições HTTP por rota, método e status.',
+    ('route', 'method', 'status'),
+)
+HTTP_LATENCY = Histogram(
+    'vatimposter_http_request_duration_seconds', 'Latência das requisições HTTP por rota.',
+    LATENCY_BUCKETS, ('route',),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    'vatimposter_db_queries_per_request', 'Consultas ao banco por requisição HTTP.',
+    QUERY_BUCKETS, ('route',),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    'vatimposter_db_time_per_request_seconds', 'Tempo gasto no banco por requisição HTTP.',
+    LATENCY_BUCKETS, ('route',),
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    'vatimposter_websocket_connections', 'Conexões WebSocket abertas no GameConsumer deste processo.',
+)
+NUDGES = Counter('vatimposter_nudges_total', 'Nudges enviados.')
+VOTES = Counter('vatimposter_votes_total', 'Votos registrados (eliminação ou palpite do Palhaço).', ('kind',))
+STATE_SNAPSHOTS = Counter(
+    'vatimposter_state_snapshots_total',
+    'Snapshots de sala do endpoint de estado: carregados do banco ou compartilhados (single-flight).',
+    ('result',),
+)
+GAMES_ARCHIVED = Counter('vatimposter_games_archived_total', 'Partidas finalizadas gravadas em GameArchive.')
+THROTTLED = Counter(
+    'vatimposter_throttled_total',
+    'Requisições recusadas pelo limite (429) ou pelo controle de admissão (503), por motivo.',
+    ('reason',),
+)
+
+REGISTRY = [
+    HTTP_REQUESTS, HTTP_LATENCY, DB_QUERIES_PER_REQUEST, DB_TIME_PER_REQUEST,
+    WEBSOCKET_CONNECTIONS, NUDGES, VOTES, GAMES_ARCHIVED, STATE_SNAPSHOTS, THROTTLED,
+]
+
+
+def observe_request(route, method, status, seconds, queries, db_ms):
+    HTTP_REQUESTS.inc(route=route, method=method, status=status)
+    HTTP_LATENCY.observe(seconds, route=route)
+    DB_QUERIES_PER_REQUEST.observe(queries, route=route)
+    DB_TIME_PER_REQUEST.observe(db_ms / 1000, route=route)
+
+
+def _room_lines():
+    from .models import Game
+
+    lines = [
+        '# HELP vatimposter_rooms Salas existentes por status.',
+        '# TYPE vatimposter_rooms gauge',
+    ]
+    # Uma consulta só: salas por (status, player_count), sem juntar Player
+    by_status = {}
+    by_size = {}
+    for status, size, total in Game.objects.values_list('status', 'player_count').annotate(total=Count('id')):
+        by_status[status] = by_status.get(status, 0) + total
+        if size > 0:
+            by_size[size] = by_size.get(size, 0) + total
+    for status, _ in Game.STATUS_CHOICES:
+        lines.append(f'vatimposter_rooms{_labels(("status",), (status,))} {by_status.get(status, 0)}')
+
+    buckets = PLAYER_BUCKETS + (float('inf'),)
+    counts = [0] * len(buckets)
+    for size, rooms in by_size.items():
+        for index, bound in enumerate(buckets):
+            if size <= bound:
+                counts[index] += rooms
+                break
+    lines += [
+        '# HELP vatimposter_room_players Jogadores por sala (distribuição atual).',
+        '# TYPE vatimposter_room_players histogram',
+    ]
+    players = sum(size * rooms for size, rooms in by_size.items())
+    lines += _histogram_lines('vatimposter_room_players', (), (), buckets, counts, float(players), sum(by_size.values()))
+    return lines
+
+
+def _presence_lines():
+    from .presence import registry
+
+    rooms, players, spectators = registry.totals()
+    return [
+        '# HELP vatimposter_presence_rooms Salas com alguém online neste processo.',
+        '# TYPE vatimposter_presence_rooms gauge',
+        f'vatimposter_presence_rooms {rooms}',
+        '# HELP vatimposter_presence_online Jogadores e espectadores online neste processo (poll recente ou WebSocket aberto).',
+        '# TYPE vatimposter_presence_online gauge',
+        f'vatimposter_presence_online{_labels(("kind",), ("player",))} {players}',
+        f'vatimposter_presence_online{_labels(("kind",), ("spectator",))} {spectators}',
+    ]
+
+
+def _process_lines():
+    queries, query_ms = query_totals()
+    pool = pool_stats()
+    worker = settings.ROOM_AFFINITY_WORKER if settings.ROOM_AFFINITY_WORKERS else ''
+    return [
+        '# HELP vatimposter_process_info Processo que respondeu a coleta.',
+        '# TYPE vatimposter_process_info gauge',
+        f'vatimposter_process_info{_labels(("pid", "worker"), (os.getpid(), worker))} 1',
+        '# HELP vatimposter_db_queries_total Consultas ao banco feitas pelo processo.',
+        '# TYPE vatimposter_db_queries_total counter',
+        f'vatimposter_db_queries_total {queries}',
+        '# HELP vatimposter_db_query_seconds_total Tempo total gasto em consultas ao banco.',
+        '# TYPE vatimposter_db_query_seconds_total counter',
+        f'vatimposter_db_query_seconds_total {_number(query_ms / 1000)}',
+        '# HELP vatimposter_db_connections_opened_total Conexões com o banco abertas pelo processo.',
+        '# TYPE vatimposter_db_connections_opened_total counter',
+        f'vatimposter_db_connections_opened_total {pool["connections_opened"]}',
+        '# HELP vatimposter_db_connections_open Conexões com o banco abertas agora.',
+        '# TYPE vatimposter_db_connections_open gauge',
+        f'vatimposter_db_connections_open {pool["connections_open"]}',
+        '# HELP vatimposter_db_recent_query_ms Latência média recente das consultas (usada no corte de carga).',
+        '# TYPE vatimposter_db_recent_query_ms gauge',
+        f'vatimposter_db_recent_query_ms {_number(recent_query_ms())}',
+    ]
+
+
+def render():
+    """Texto completo da coleta (formato de exposição 0.0.4 do Prometheus)."""
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.collect()
+    lines += _room_lines()
+    lines += _presence_lines()
+    lines += _process_lines()
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,149 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import affinity, throttle
+from .dbpool import track_queries
+from .metrics import observe_request
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise que também roda no modo assíncrono do Django.
+
+    O WhiteNoiseMiddleware original é apenas síncrono, o que obriga o Django a
+    executar toda a pilha (inclusive as views assíncronas) em uma thread. Sem
+    autorefresh a busca do arquivo estático é feita em memória, então pode
+    rodar direto no loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class InstrumentationMiddleware:
+    """Mede cada requisição: métricas por rota (METRICS_ENABLED) e os cabeçalhos
+    X-DB-Queries/X-DB-Time-Ms (QUERY_COUNT_HEADERS), usados pelo `manage.py loadtest`.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.metrics_enabled = settings.METRICS_ENABLED
+        self.query_headers = settings.QUERY_COUNT_HEADERS
+        if not (self.metrics_enabled or self.query_headers):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with track_queries() as counter:
+            response = self.get_response(request)
+        return self._finish(request, response, counter, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with track_queries() as counter:
+            response = await self.get_response(request)
+        return self._finish(request, response, counter, started)
+
+    def _finish(self, request, response, counter, started):
+        if self.metrics_enabled:
+            match = request.resolver_match
+            # O padrão da rota (não o path) mantém a cardinalidade baixa
+            route = '/' + match.route if match else 'unmatched'
+            observe_request(
+                route, request.method, response.status_code,
+                time.perf_counter() - started, counter.queries, counter.time_ms,
+            )
+        if self.query_headers:
+            response['X-DB-Queries'] = str(counter.queries)
+            response['X-DB-Time-Ms'] = f'{counter.time_ms:.2f}'
+        return response
+
+
+class RateLimitMiddleware:
+    """Limite por cliente e por sala e corte de carga pela latência do banco
+    (game/throttle.py). Fica depois do SessionMiddleware, que fornece a chave
+    da sessão usada para identificar o cliente.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not (settings.RATE_LIMIT_ENABLED or settings.LOAD_SHED_DB_LATENCY_MS > 0):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return throttle.check(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        # Baldes no cache local em memória: a checagem não bloqueia o loop
+        return throttle.check(request) or await self.get_response(request)
+
+
+class RoomAffinityMiddleware:
+    """Com afinidade de sala (`runaffinity`), recusa com 421 as requisições de
+    salas que pertencem a outro worker.
+
+    Presença, snapshots compartilhados e avisos agrupados ficam na memória do
+    processo dono da sala; uma requisição que chegasse ao worker errado
+    trabalharia com esse estado incompleto sem perceber.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not affinity.affinity_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _misrouted(self, request):
+        code = affinity.room_code_from_path(request.path_info)
+        if code is None or affinity.owns_room(code):
+            return None
+        logger.warning('Sala %s chegou ao worker %s, que não é o dono', code, settings.ROOM_AFFINITY_WORKER)
+        return JsonResponse({'error': 'Sala atendida por outro servidor. Tente de novo.'}, status=421)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._misrouted(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self._misrouted(request) or await self.get_response(request)
@@ -0,0 +1,49 @@
+# Generated manually: índices compostos para as consultas quentes do jogo
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de transação, mas evita
+    # travar as tabelas enquanto os índices são construídos em produção.
+    atomic = False
+
+    dependencies = [
+        ('game', '0009_fix_vote_unique_constraint'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='hint',
+            index=models.Index(fields=['game', 'round_number'], name='game_hint_game_round_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='vote',
+            index=models.Index(fields=['game', 'round_number', 'is_palhaco_guess'], name='game_vote_round_kind_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='vote',
+            index=models.Index(fields=['game', 'voter', 'round_number'], name='game_vote_voter_round_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='nudge',
+            index=models.Index(
+                condition=models.Q(acknowledged=False),
+                fields=['game', 'to_player', 'round_number'],
+                name='game_nudge_pending_idx',
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name='nudge',
+            index=models.Index(fields=['game', 'from_player', 'to_player', 'created_at'], name='game_nudge_pair_recent_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='player',
+            index=models.Index(
+                condition=models.Q(is_eliminated=False),
+                fields=['game', 'id'],
+                name='game_player_active_idx',
+            ),
+        ),
+    ]
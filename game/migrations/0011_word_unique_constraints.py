@@ -0,0 +1,65 @@
+# Generated manually: remove grupos e palavras duplicados e cria as restrições
+# únicas usadas pela importação em massa (bulk_create com ignore_conflicts)
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    WordGroup = apps.get_model('game', 'WordGroup')
+    Word = apps.get_model('game', 'Word')
+    Game = apps.get_model('game', 'Game')
+    Player = apps.get_model('game', 'Player')
+
+    # Grupos com o mesmo nome: fica o mais antigo, que herda as palavras e os jogos
+    duplicated_names = (
+        WordGroup.objects.exclude(name=None).values('name')
+        .annotate(total=Count('id'), keep=Min('id')).filter(total__gt=1)
+    )
+    for row in duplicated_names:
+        others = list(
+            WordGroup.objects.filter(name=row['name']).exclude(id=row['keep']).values_list('id', flat=True)
+        )
+        Word.objects.filter(group_id__in=others).update(group_id=row['keep'])
+        Game.objects.filter(word_group_id__in=others).update(word_group_id=row['keep'])
+        Game.objects.filter(whiteman_word_group_id__in=others).update(whiteman_word_group_id=row['keep'])
+        WordGroup.objects.filter(id__in=others).delete()
+
+    # Palavras repetidas no mesmo grupo: fica a mais antiga, referências apontam para ela
+    duplicated_words = (
+        Word.objects.values('group_id', 'text')
+        .annotate(total=Count('id'), keep=Min('id')).filter(total__gt=1)
+    )
+    for row in duplicated_words:
+        others = list(
+            Word.objects.filter(group_id=row['group_id'], text=row['text'])
+            .exclude(id=row['keep']).values_list('id', flat=True)
+        )
+        Game.objects.filter(citizen_word_id__in=others).update(citizen_word_id=row['keep'])
+        Game.objects.filter(impostor_word_id__in=others).update(impostor_word_id=row['keep'])
+        Player.objects.filter(word_id__in=others).update(word_id=row['keep'])
+        Word.objects.filter(id__in=others).delete()
+
+    if schema_editor.connection.vendor == 'postgresql':
+        # As FKs são DEFERRABLE; checá-las agora evita "pending trigger events"
+        # no ALTER TABLE das restrições logo abaixo
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0010_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='wordgroup',
+            constraint=models.UniqueConstraint(fields=['name'], name='game_wordgroup_unique_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='word',
+            constraint=models.UniqueConstraint(fields=['group', 'text'], name='game_word_unique_group_text'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated manually: índices de data para date_hierarchy e ordenação no admin
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Mesmo motivo da 0010: CONCURRENTLY não roda em transação e não trava as tabelas
+    atomic = False
+
+    dependencies = [
+        ('game', '0011_word_unique_constraints'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='wordgroup',
+            index=models.Index(fields=['created_at'], name='game_wordgroup_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='game',
+            index=models.Index(fields=['created_at'], name='game_game_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='player',
+            index=models.Index(fields=['joined_at'], name='game_player_joined_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='hint',
+            index=models.Index(fields=['created_at'], name='game_hint_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='vote',
+            index=models.Index(fields=['created_at'], name='game_vote_created_idx'),
+        ),
+    ]
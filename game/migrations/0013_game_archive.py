@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0012_admin_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_id', models.BigIntegerField()),
+                ('code', models.CharField(max_length=6)),
+                ('winning_team', models.CharField(blank=True, max_length=20, null=True)),
+                ('num_players', models.IntegerField()),
+                ('rounds', models.IntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('data', models.JSONField()),
+            ],
+            options={
+                'verbose_name': 'Partida Arquivada',
+                'verbose_name_plural': 'Partidas Arquivadas',
+                'indexes': [models.Index(fields=['finished_at'], name='game_archive_finished_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='gamearchive',
+            constraint=models.UniqueConstraint(fields=('game_id', 'started_at'), name='game_archive_unique_match'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0013_game_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WordGroupStats',
+            fields=[
+                ('word_group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='game.wordgroup')),
+                ('games_played', models.IntegerField(default=0)),
+                ('citizens_wins', models.IntegerField(default=0)),
+                ('impostors_wins', models.IntegerField(default=0)),
+                ('clown_wins', models.IntegerField(default=0)),
+                ('rounds_total', models.IntegerField(default=0)),
+                ('players_total', models.IntegerField(default=0)),
+                ('last_played_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Estatística de Grupo',
+                'verbose_name_plural': 'Estatísticas de Grupos',
+                'indexes': [models.Index(fields=['-games_played'], name='game_groupstats_played_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PlayerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('games_played', models.IntegerField(default=0)),
+                ('games_won', models.IntegerField(default=0)),
+                ('times_eliminated', models.IntegerField(default=0)),
+                ('citizen_games', models.IntegerField(default=0)),
+                ('citizen_wins', models.IntegerField(default=0)),
+                ('impostor_games', models.IntegerField(default=0)),
+                ('impostor_wins', models.IntegerField(default=0)),
+                ('whiteman_games', models.IntegerField(default=0)),
+                ('whiteman_wins', models.IntegerField(default=0)),
+                ('clown_games', models.IntegerField(default=0)),
+                ('clown_wins', models.IntegerField(default=0)),
+                ('last_played_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Estatística de Jogador',
+                'verbose_name_plural': 'Estatísticas de Jogadores',
+                'indexes': [models.Index(fields=['-games_won', 'games_played'], name='game_playerstats_rank_idx')],
+            },
+        ),
+    ]
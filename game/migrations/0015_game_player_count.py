@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:34
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_players(apps, schema_editor):
+    Game = apps.get_model('game', 'Game')
+    Player = apps.get_model('game', 'Player')
+    counts = Player.objects.filter(game=OuterRef('pk')).order_by().values('game').annotate(total=Count('id')).values('total')
+    Game.objects.update(player_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0014_game_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='player_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_players, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:38
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_round_state(apps, schema_editor):
+    Game = apps.get_model('game', 'Game')
+    Player = apps.get_model('game', 'Player')
+    Hint = apps.get_model('game', 'Hint')
+    Vote = apps.get_model('game', 'Vote')
+
+    def total(queryset):
+        return Coalesce(Subquery(queryset.order_by().values('game').annotate(total=Count('id')).values('total')), 0)
+
+    alive = Player.objects.filter(game=OuterRef('pk'), is_eliminated=False)
+    Game.objects.update(
+        alive_count=total(alive),
+        alive_impostors=total(alive.filter(role='impostor')),
+        round_hints=total(Hint.objects.filter(game=OuterRef('pk'), round_number=OuterRef('current_round'))),
+        round_votes=total(Vote.objects.filter(
+            game=OuterRef('pk'), round_number=OuterRef('current_round'),
+            is_palhaco_guess=False, voter__is_eliminated=False,
+        )),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0015_game_player_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='alive_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='alive_impostors',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='round_hints',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='round_votes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_round_state, migrations.RunPython.noop),
+    ]
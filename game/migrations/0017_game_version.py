@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0016_game_round_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
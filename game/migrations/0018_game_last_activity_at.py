@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_last_activity(apps, schema_editor):
+    Game = apps.get_model('game', 'Game')
+    # Sem histórico, o evento mais recente conhecido da sala
+    Game.objects.update(last_activity_at=Coalesce('finished_at', 'started_at', 'created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0017_game_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='last_activity_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_last_activity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['last_activity_at'], name='game_game_activity_idx'),
+        ),
+    ]
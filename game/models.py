@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import connection, models
+from django.db.models import F
+import copy
 import secrets
 import random
 import hashlib
 
+from . import rules
+
 
 class WordGroup(models.Model):
     """Grupo de palavras similares"""
@@ -15,6 +19,14 @@ class WordGroup(models.Model):
     class Meta:
         verbose_name = "Grupo de Palavras"
         verbose_name_plural = "Grupos de Palavras"
+        constraints = [
+            # Importação em massa usa bulk_create(ignore_conflicts=True) contra estas restrições
+            models.UniqueConstraint(fields=['name'], name='game_wordgroup_unique_name'),
+        ]
+        indexes = [
+            # date_hierarchy e ordenação por data no admin
+            models.Index(fields=['created_at'], name='game_wordgroup_created_idx'),
+        ]
 
 
 class Word(models.Model):
@@ -28,9 +40,68 @@ class Word(models.Model):
     class Meta:
         verbose_name = "Palavra"
         verbose_name_plural = "Palavras"
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'text'], name='game_word_unique_group_text'),
+        ]
+
+
+class VersionConflict(Exception):
+    """A sala mudou (ou foi apagada) depois de ser lida; a ação pode ser repetida."""
+
+
+class TracksChanges(models.Model):
+    """Lembra os valores lidos do banco para o save() gravar só o que mudou.
+
+    Sem `update_fields`, o save() de um objeto já gravado vira um UPDATE só
+    das colunas alteradas desde a leitura (ou o último save) e não vai ao
+    banco se nada mudou. Campos adiados (`only`/`defer`) que não foram
+    atribuídos continuam fora do UPDATE, como no save() do Django.
+    """
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._remember_values(None if fields is None else [self._meta.get_field(name).attname for name in fields])
+
+    def _remember_values(self, attnames=None):
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        for field in self._meta.concrete_fields:
+            attname = field.attname
+            if attname in self.__dict__ and (attnames is None or attname in attnames):
+                value = self.__dict__[attname]
+                # JSON pode ser alterado no lugar; a cópia guarda o valor lido
+                loaded[attname] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+    def changed_fields(self):
+        """Nomes dos campos que mudaram desde a leitura (todos os carregados se não há leitura)."""
+        loaded = self.__dict__.get('_loaded_values', {})
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in self.__dict__
+            and (field.attname not in loaded or loaded[field.attname] != self.__dict__[field.attname])
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if not self._state.adding and not kwargs.get('force_insert') and update_fields is None:
+            update_fields = kwargs['update_fields'] = self.changed_fields()
+            if not update_fields:
+                return
+        super().save(*args, **kwargs)
+        self._remember_values(
+            None if update_fields is None else [self._meta.get_field(name).attname for name in update_fields]
+        )
 
 
-class Game(models.Model):
+class Game(TracksChanges):
     """Sala de jogo"""
     STATUS_CHOICES = [
         ('waiting', 'Aguardando Jogadores'),
@@ -52,6 +123,8 @@ class Game(models.Model):
     actual_num_whitemen = models.IntegerField(default=0)
     actual_num_clowns = models.IntegerField(default=0)
     max_players = models.IntegerField(default=12)
+    # Jogadores na sala; reserva a vaga no mesmo UPDATE da entrada (game/lobby.py)
+    player_count = models.IntegerField(default=0)
     min_players = models.IntegerField(default=4)
     winning_team = models.CharField(max_length=20, blank=True, null=True)
     
@@ -65,10 +138,22 @@ class Game(models.Model):
     current_round = models.IntegerField(default=0)  # 0 = não iniciado, 1-3 = rodadas de dicas, 4+ = rodadas após votação
     current_player_index = models.IntegerField(default=0)
     hint_timeout_seconds = models.IntegerField(default=30)
+
+    # Contadores da partida, valem a partir de assign_roles. Mudam só por
+    # increment() (soma no próprio UPDATE) ou set_counters(); viradas de fase e
+    # checagem de vitória leem daqui em vez de contar jogadores, dicas e votos.
+    alive_count = models.IntegerField(default=0)
+    alive_impostors = models.IntegerField(default=0)
+    round_hints = models.IntegerField(default=0)  # dicas na rodada atual
+    round_votes = models.IntegerField(default=0)  # votos de eliminação de jogadores ativos na rodada atual
+    # Sobe a cada save(); o UPDATE só vale se a versão ainda é a que foi lida
+    version = models.IntegerField(default=0)
     
     created_at = models.DateTimeField(auto_now_add=True)
     started_at = models.DateTimeField(null=True, blank=True)
     finished_at = models.DateTimeField(null=True, blank=True)
+    # Último save() da sala ou entrada de jogador; `sweep_games` apaga as paradas há horas
+    last_activity_at = models.DateTimeField(auto_now=True)
 
     def generate_code(self):
         """Gera um código único de 6 caracteres"""
@@ -77,54 +162,103 @@ class Game(models.Model):
             if not Game.objects.filter(code=code).exists():
                 return code
 
+    COUNTER_FIELDS = ('player_count', 'alive_count', 'alive_impostors', 'round_hints', 'round_votes')
+
     def save(self, *args, **kwargs):
+        """Insere normalmente; numa sala existente grava com checagem de versão.
+
+        O UPDATE leva só as colunas alteradas (TracksChanges), `WHERE version =
+        <versão lida>` e soma 1 na versão. Se outro pedido gravou a sala antes
+        (ou a apagou), nada é gravado e sobe VersionConflict: quem chamou
+        desfaz a transação e responde 409. Sem mudanças, não há UPDATE.
+        """
         if not self.code:
             self.code = self.generate_code()
-        super().save(*args, **kwargs)
+        pending = self.__dict__.pop('_pending_counters', set())
+        if self._state.adding or kwargs.get('force_insert'):
+            super().save(*args, **kwargs)
+            return
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            # Um objeto carregado antes não pode sobrescrever a soma feita por
+            # outro pedido: contadores só vão no save() depois de set_counters()
+            update_fields = [name for name in self.changed_fields() if name not in self.COUNTER_FIELDS]
+            update_fields += [name for name in self.COUNTER_FIELDS if name in pending]
+        fields = [self._meta.get_field(name) for name in update_fields if name not in ('version', 'last_activity_at')]
+        if not fields:
+            return
+        fields.append(self._meta.get_field('last_activity_at'))
+        values = {field.attname: field.pre_save(self, False) for field in fields}
+        updated = Game.objects.filter(pk=self.pk, version=self.version).update(version=F('version') + 1, **values)
+        if not updated:
+            raise VersionConflict(f'Sala {self.code} mudou depois da versão {self.version}')
+        self.version += 1
+        self._remember_values([*values, 'version'])
+
+    def set_counters(self, **values):
+        """Define contadores (ex.: zerar os da rodada); gravados no próximo save()."""
+        for name, value in values.items():
+            setattr(self, name, value)
+        self.__dict__.setdefault('_pending_counters', set()).update(values)
+
+    def increment(self, **deltas):
+        """Soma `deltas` nos contadores com um UPDATE e traz os valores gravados."""
+        names = list(deltas)
+        if connection.vendor == 'postgresql':
+            quote = connection.ops.quote_name
+            sets = ', '.join(f'{quote(name)} = {quote(name)} + %s' for name in names)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {quote(self._meta.db_table)} SET {sets} WHERE id = %s '
+                    f'RETURNING {", ".join(quote(name) for name in names)}',
+                    [*deltas.values(), self.pk],
+                )
+                row = cursor.fetchone()
+            values = dict(zip(names, row)) if row else {}
+        else:
+            Game.objects.filter(pk=self.pk).update(**{name: F(name) + delta for name, delta in deltas.items()})
+            values = Game.objects.filter(pk=self.pk).values(*names).first() or {}
+        for name, value in values.items():
+            setattr(self, name, value)
+        self._remember_values(values)
 
     def assign_roles(self):
-        """Distribui os papéis (Impostor, WhiteMan, Cidadão)"""
-        players = list(self.players.filter(is_eliminated=False).order_by('?'))
+        """Distribui os papéis (Impostor, WhiteMan, Palhaço, Cidadão)"""
+        players = list(self.players.filter(is_eliminated=False).order_by('id'))
 
         if not players:
             return
 
-        max_impostors = max(1, min(self.num_impostors, len(players)))
-        effective_impostors = random.randint(1, max_impostors)
-        self.actual_num_impostors = effective_impostors
-
-        remaining_slots = len(players) - effective_impostors
-        max_whitemen_allowed = max(0, min(self.num_whitemen, 3, remaining_slots))
-        effective_whitemen = random.randint(0, max_whitemen_allowed) if max_whitemen_allowed > 0 else 0
-        remaining_slots -= effective_whitemen
-
-        effective_clowns = 0
-        if self.num_clowns > 0 and len(players) >= 6 and remaining_slots > 0:
-            effective_clowns = min(1, self.num_clowns, remaining_slots)
-            remaining_slots -= effective_clowns
-
-        self.actual_num_whitemen = effective_whitemen
-        self.actual_num_clowns = effective_clowns
+        counts = rules.draw_role_counts(len(players), self.num_impostors, self.num_whitemen, self.num_clowns)
+        dealt = rules.deal_roles(range(len(players)), counts)
+        self.actual_num_impostors = counts.impostors
+        self.actual_num_whitemen = counts.whitemen
+        self.actual_num_clowns = counts.clowns
         self.winning_team = None
-        self.save(update_fields=['actual_num_impostors', 'actual_num_whitemen', 'actual_num_clowns', 'winning_team'])
+        self.set_counters(alive_count=len(players), alive_impostors=counts.impostors, round_hints=0, round_votes=0)
+        self.save(update_fields=[
+            'actual_num_impostors', 'actual_num_whitemen', 'actual_num_clowns', 'winning_team',
+            'alive_count', 'alive_impostors', 'round_hints', 'round_votes',
+        ])
 
         def reset_clown_meta(p):
             p.palhaco_known_impostors = []
             p.palhaco_goal_state = ''
             p.palhaco_goal_ready_round = 0
 
+        by_role = {role: [] for role in rules.ROLE_ORDER}
+        for index, role in dealt.items():
+            by_role[role].append(players[index])
+
         # Atribuir impostores
-        impostors = players[:effective_impostors]
-        for player in impostors:
+        for player in by_role['impostor']:
             player.role = 'impostor'
             player.word = self.impostor_word
             reset_clown_meta(player)
             player.save()
         
         # Atribuir whitemen
-        remaining = players[effective_impostors:]
-        whitemen = remaining[:effective_whitemen]
-        for player in whitemen:
+        for player in by_role['whiteman']:
             player.role = 'whiteman'
             if self.whiteman_word_group:
                 whiteman_words = list(self.whiteman_word_group.words.all())
@@ -133,11 +267,8 @@ class Game(models.Model):
             reset_clown_meta(player)
             player.save()
         
-        remaining = remaining[effective_whitemen:]
-
         # Palhaço
-        clowns = remaining[:effective_clowns]
-        for player in clowns:
+        for player in by_role['clown']:
             player.role = 'clown'
             player.word = self.impostor_word
             player.palhaco_known_impostors = []
@@ -145,11 +276,8 @@ class Game(models.Model):
             player.palhaco_goal_ready_round = 0
             player.save()
 
-        remaining = remaining[effective_clowns:]
-
         # Resto são cidadãos
-        citizens = remaining
-        for player in citizens:
+        for player in by_role['citizen']:
             player.role = 'citizen'
             player.word = self.citizen_word
             reset_clown_meta(player)
@@ -190,7 +318,7 @@ class Game(models.Model):
     def validate_can_start(self):
         """Retorna (bool, mensagem) indicando se o jogo pode ser iniciado."""
         if self.status == 'waiting':
-            total_players = self.players.count()
+            total_players = self.player_count
         else:
             total_players = self.players.filter(is_eliminated=False).count()
 
@@ -219,27 +347,15 @@ class Game(models.Model):
 
     def next_player(self):
         """Avança para o próximo jogador"""
-        active_players = list(self.get_active_players())
-        self.current_player_index = (self.current_player_index + 1) % len(active_players)
+        self.current_player_index = rules.next_player_index(self.current_player_index, self.alive_count)
         self.save()
 
     def check_win_conditions(self):
         """Verifica condições de vitória"""
-        active_players = list(self.get_active_players())
-        impostors = [p for p in active_players if p.role == 'impostor']
-        non_impostors = [p for p in active_players if p.role != 'impostor']
-        
-        if len(impostors) == 0:
-            self.winning_team = 'citizens'
-            return 'citizens'
-        
-        # Se sobram apenas 2 jogadores
-        if len(active_players) == 2:
-            if len(impostors) >= 1:
-                self.winning_team = 'impostors'
-                return 'impostors'
-        
-        return None
+        winner = rules.winner_from_counts(self.alive_count, self.alive_impostors)
+        if winner:
+            self.winning_team = winner
+        return winner
 
     def __str__(self):
         return f"Game {self.code} - {self.get_status_display()}"
@@ -247,9 +363,15 @@ class Game(models.Model):
     class Meta:
         verbose_name = "Jogo"
         verbose_name_plural = "Jogos"
+        indexes = [
+            # date_hierarchy e ordenação por data no admin
+            models.Index(fields=['created_at'], name='game_game_created_idx'),
+            # salas abandonadas em sweep_games
+            models.Index(fields=['last_activity_at'], name='game_game_activity_idx'),
+        ]
 
 
-class Player(models.Model):
+class Player(TracksChanges):
     """Jogador em uma sala"""
     ROLE_CHOICES = [
         ('citizen', 'Cidadão'),
@@ -290,6 +412,15 @@ class Player(models.Model):
         verbose_name = "Jogador"
         verbose_name_plural = "Jogadores"
         unique_together = [['game', 'name']]
+        indexes = [
+            # Jogadores ativos em ordem de turno (get_active_players)
+            models.Index(
+                fields=['game', 'id'],
+                condition=models.Q(is_eliminated=False),
+                name='game_player_active_idx',
+            ),
+            models.Index(fields=['joined_at'], name='game_player_joined_idx'),
+        ]
 
 
 class Hint(models.Model):
@@ -307,6 +438,11 @@ class Hint(models.Model):
         verbose_name = "Dica"
         verbose_name_plural = "Dicas"
         unique_together = [['game', 'player', 'round_number']]
+        indexes = [
+            # Contagem de dicas da rodada atual
+            models.Index(fields=['game', 'round_number'], name='game_hint_game_round_idx'),
+            models.Index(fields=['created_at'], name='game_hint_created_idx'),
+        ]
 
 
 class Vote(models.Model):
@@ -329,6 +465,13 @@ class Vote(models.Model):
         # Palhaço pode fazer N palpites (um por impostor) na mesma rodada
         # Mas cada combinação de voter+target+round+tipo deve ser única
         unique_together = [['game', 'voter', 'target', 'round_number', 'is_palhaco_guess']]
+        indexes = [
+            # Votos/palpites da rodada atual
+            models.Index(fields=['game', 'round_number', 'is_palhaco_guess'], name='game_vote_round_kind_idx'),
+            # "Você já votou nesta rodada?" e palpites do Palhaço
+            models.Index(fields=['game', 'voter', 'round_number'], name='game_vote_voter_round_idx'),
+            models.Index(fields=['created_at'], name='game_vote_created_idx'),
+        ]
 
 
 class Nudge(models.Model):
@@ -346,6 +489,95 @@ class Nudge(models.Model):
     class Meta:
         verbose_name = "Nudge"
         verbose_name_plural = "Nudges"
+        indexes = [
+            # Nudges pendentes do jogador (a grande maioria já foi vista)
+            models.Index(
+                fields=['game', 'to_player', 'round_number'],
+                condition=models.Q(acknowledged=False),
+                name='game_nudge_pending_idx',
+            ),
+            # Anti-spam: último nudge entre o mesmo par de jogadores
+            models.Index(fields=['game', 'from_player', 'to_player', 'created_at'], name='game_nudge_pair_recent_idx'),
+        ]
+
+
+class GameArchive(models.Model):
+    """Registro compacto de uma partida finalizada (ver game/archive.py)"""
+    game_id = models.BigIntegerField()  # id original da sala; o Game é apagado depois
+    code = models.CharField(max_length=6)
+    winning_team = models.CharField(max_length=20, blank=True, null=True)
+    num_players = models.IntegerField()
+    rounds = models.IntegerField()
+    created_at = models.DateTimeField()
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    # Jogadores, palavras, dicas, votos e nudges com índices de jogador no lugar de ids
+    data = models.JSONField()
+
+    def __str__(self):
+        return f"Arquivo {self.code} ({self.winning_team or 'sem vencedor'})"
+
+    class Meta:
+        verbose_name = "Partida Arquivada"
+        verbose_name_plural = "Partidas Arquivadas"
+        constraints = [
+            # Uma sala reiniciada gera várias partidas; arquivar a mesma duas vezes não duplica
+            models.UniqueConstraint(fields=['game_id', 'started_at'], name='game_archive_unique_match'),
+        ]
+        indexes = [
+            models.Index(fields=['finished_at'], name='game_archive_finished_idx'),
+        ]
+
+
+class PlayerStats(models.Model):
+    """Totais por nome de jogador, somados a cada partida finalizada (ver game/stats.py)"""
+    name = models.CharField(max_length=100, unique=True)
+    games_played = models.IntegerField(default=0)
+    games_won = models.IntegerField(default=0)
+    times_eliminated = models.IntegerField(default=0)
+    citizen_games = models.IntegerField(default=0)
+    citizen_wins = models.IntegerField(default=0)
+    impostor_games = models.IntegerField(default=0)
+    impostor_wins = models.IntegerField(default=0)
+    whiteman_games = models.IntegerField(default=0)
+    whiteman_wins = models.IntegerField(default=0)
+    clown_games = models.IntegerField(default=0)
+    clown_wins = models.IntegerField(default=0)
+    last_played_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.games_won}/{self.games_played}"
+
+    class Meta:
+        verbose_name = "Estatística de Jogador"
+        verbose_name_plural = "Estatísticas de Jogadores"
+        indexes = [
+            # Placar: mais vitórias primeiro
+            models.Index(fields=['-games_won', 'games_played'], name='game_playerstats_rank_idx'),
+        ]
+
+
+class WordGroupStats(models.Model):
+    """Totais por grupo de palavras, somados a cada partida finalizada (ver game/stats.py)"""
+    word_group = models.OneToOneField(WordGroup, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    games_played = models.IntegerField(default=0)
+    citizens_wins = models.IntegerField(default=0)
+    impostors_wins = models.IntegerField(default=0)
+    clown_wins = models.IntegerField(default=0)
+    rounds_total = models.IntegerField(default=0)
+    players_total = models.IntegerField(default=0)
+    last_played_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.word_group}: {self.games_played} partidas"
+
+    class Meta:
+        verbose_name = "Estatística de Grupo"
+        verbose_name_plural = "Estatísticas de Grupos"
+        indexes = [
+            models.Index(fields=['-games_played'], name='game_groupstats_played_idx'),
+        ]
 
 
 
@@ -0,0 +1,57 @@
+"""Avisos de mudança de estado das salas para os sockets conectados.
+
+As views chamam estas funções depois de alterar uma sala. Com o
+PostgresChannelLayer o aviso vira um NOTIFY na conexão do próprio Django, que o
+Postgres só entrega quando a transação é confirmada; com outro channel layer a
+mensagem vai direto por `group_send`. Com WEBSOCKETS_ENABLED=False (o padrão)
+ou sem o Channels instalado nada acontece.
+"""
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+try:
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+except ImportError:  # Channels é opcional: sem ele o jogo funciona só por polling
+    get_channel_layer = None
+
+
+def room_group_name(game_code):
+    return f'game_{game_code}'
+
+
+def _publish(game_code, message):
+    if get_channel_layer is None or not settings.WEBSOCKETS_ENABLED:
+        return
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    group = room_group_name(game_code)
+    try:
+        from .pg_layer import PostgresChannelLayer, encode_payload
+
+        if isinstance(layer, PostgresChannelLayer):
+            payload = encode_payload('views', [[group, None, message]])
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_notify(%s, %s)', [layer.notify_channel, payload])
+            return
+        async_to_sync(layer.group_send)(group, message)
+    except Exception:
+        # Avisar os sockets nunca deve derrubar a ação do jogador
+        logger.exception('Falha ao notificar a sala %s', game_code)
+
+
+def notify_room_changed(game_code):
+    """Avisa os sockets da sala de que o estado mudou e deve ser recarregado."""
+    _publish(game_code, {'type': 'room_state_changed'})
+
+
+def notify_room_closed(game_code, message):
+    _publish(game_code, {
+        'type': 'game_state_message',
+        'state': {'type': 'room_closed', 'message': message, 'redirect': '/'},
+    })
@@ -0,0 +1,267 @@
+"""Channel layer do Channels sobre LISTEN/NOTIFY do Postgres.
+
+Cada processo mantém seus canais e grupos em memória (como o
+InMemoryChannelLayer) e publica as mensagens de grupo num canal NOTIFY que
+todos os workers escutam. Assim um `group_send` feito em qualquer worker, ou
+um NOTIFY emitido pelas views dentro de uma transação, chega a todos os
+sockets da sala sem precisar de Redis.
+
+- Mensagens enviadas dentro de `batch_window` segundos são agrupadas num único
+  NOTIFY (o payload é comprimido quando passa de 1 KB).
+- Cada grupo tem um buffer de saída limitado a `group_buffer` mensagens; se o
+  banco ficar lento as mais antigas são descartadas em vez de acumular memória.
+"""
+import asyncio
+import base64
+import json
+import logging
+import random
+import string
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'vatimposter_layer'
+# O Postgres limita o payload do NOTIFY a 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+COMPRESS_ABOVE_BYTES = 1024
+
+
+def encode_payload(origin, entries):
+    """Serializa [(grupo, canal, mensagem), ...] no formato enviado pelo NOTIFY."""
+    raw = json.dumps({'o': origin, 'm': entries}, separators=(',', ':'))
+    if len(raw) > COMPRESS_ABOVE_BYTES:
+        return 'z:' + base64.b64encode(zlib.compress(raw.encode('utf-8'))).decode('ascii')
+    return raw
+
+
+def decode_payload(payload):
+    if payload.startswith('z:'):
+        payload = zlib.decompress(base64.b64decode(payload[2:])).decode('utf-8')
+    data = json.loads(payload)
+    return data.get('o'), data.get('m', [])
+
+
+def connection_params(alias='default'):
+    db = settings.DATABASES[alias]
+    params = {
+        'dbname': db['NAME'],
+        'user': db['USER'],
+        'password': db['PASSWORD'],
+        'host': db['HOST'],
+        'port': db['PORT'],
+    }
+    params.update(db.get('OPTIONS', {}))
+    return params
+
+
+class PostgresChannelLayer(InMemoryChannelLayer):
+    extensions = ['groups', 'flush']
+
+    def __init__(self, database='default', channel=NOTIFY_CHANNEL, batch_window=0.005,
+                 group_buffer=100, reconnect_delay=1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.database = database
+        self.notify_channel = channel
+        self.batch_window = batch_window
+        self.group_buffer = group_buffer
+        self.reconnect_delay = reconnect_delay
+        self.origin = ''.join(random.choice(string.ascii_lowercase) for _ in range(10))
+        self.dropped_messages = 0
+
+        self._outgoing = {}
+        self._flush_handle = None
+        self._flush_loop = None
+        self._sender = None
+        # Uma única thread para o NOTIFY: a conexão de envio nunca é compartilhada
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pg-layer-notify')
+        self._listener = None
+        self._listener_loop = None
+        self._listener_lock = None
+
+    # Envio
+
+    async def new_channel(self, prefix='specific.'):
+        suffix = ''.join(random.choice(string.ascii_letters) for _ in range(12))
+        return f'{prefix}.{self.origin}!{suffix}'
+
+    def _is_local_channel(self, channel):
+        return '!' not in channel or f'.{self.origin}!' in channel
+
+    async def send(self, channel, message):
+        if self._is_local_channel(channel):
+            await super().send(channel, message)
+        else:
+            self._enqueue(channel, [None, channel, message])
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'Message is not a dict'
+        self.require_valid_group_name(group)
+        await self._ensure_listener()
+        await self._deliver_local(group, message)
+        self._enqueue(group, [group, None, message])
+
+    def _enqueue(self, key, entry):
+        buffer = self._outgoing.get(key)
+        if buffer is None:
+            buffer = self._outgoing[key] = deque(maxlen=self.group_buffer)
+        if len(buffer) == buffer.maxlen:
+            self.dropped_messages += 1
+        buffer.append(entry)
+        loop = asyncio.get_running_loop()
+        if self._flush_handle is None or self._flush_loop is not loop:
+            self._flush_loop = loop
+            self._flush_handle = loop.call_later(self.batch_window, self._start_flush)
+
+    def _start_flush(self):
+        self._flush_handle = None
+        entries = [entry for buffer in self._outgoing.values() for entry in buffer]
+        self._outgoing = {}
+        if entries:
+            asyncio.ensure_future(self._publish(entries))
+
+    async def _publish(self, entries):
+        loop = asyncio.get_running_loop()
+        for payload in self._chunk_payloads(entries):
+            try:
+                await loop.run_in_executor(self._executor, self._notify_sync, payload)
+            except Exception:
+                logger.exception('Falha ao publicar mensagens do channel layer no Postgres')
+
+    def _chunk_payloads(self, entries):
+        batch = []
+        for entry in entries:
+            candidate = batch + [entry]
+            if batch and len(encode_payload(self.origin, candidate)) > MAX_PAYLOAD_BYTES:
+                yield encode_payload(self.origin, batch)
+                batch = [entry]
+            else:
+                batch = candidate
+        if batch:
+            payload = encode_payload(self.origin, batch)
+            if len(payload) > MAX_PAYLOAD_BYTES:
+                self.dropped_messages += len(batch)
+                logger.error('Mensagem do channel layer grande demais para NOTIFY (%d bytes)', len(payload))
+                return
+            yield payload
+
+    def _notify_sync(self, payload):
+        for attempt in range(2):
+            try:
+                if self._sender is None or self._sender.closed:
+                    self._sender = psycopg2.connect(**connection_params(self.database))
+                    self._sender.autocommit = True
+                with self._sender.cursor() as cursor:
+                    cursor.execute('SELECT pg_notify(%s, %s)', [self.notify_channel, payload])
+                return
+            except psycopg2.OperationalError:
+                self._sender = None
+                if attempt:
+                    raise
+
+    # Recebimento
+
+    async def group_add(self, group, channel):
+        await super().group_add(group, channel)
+        await self._ensure_listener()
+
+    async def receive(self, channel):
+        await self._ensure_listener()
+        return await super().receive(channel)
+
+    async def _deliver_local(self, group, message):
+        for channel in list(self.groups.get(group, {})):
+            try:
+                await super().send(channel, message)
+            except ChannelFull:
+                self.dropped_messages += 1
+
+    async def _ensure_listener(self):
+        loop = asyncio.get_running_loop()
+        if self._listener is not None and self._listener_loop is loop:
+            return
+        if self._listener_lock is None or self._listener_loop is not loop:
+            self._stop_listener()
+            self._listener_loop = loop
+            self._listener_lock = asyncio.Lock()
+        async with self._listener_lock:
+            if self._listener is not None:
+                return
+            conn = await loop.run_in_executor(
+                self._executor, lambda: psycopg2.connect(**connection_params(self.database))
+            )
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.notify_channel}"')
+            self._listener = conn
+            loop.add_reader(conn.fileno(), self._on_notify)
+
+    def _stop_listener(self):
+        conn, self._listener = self._listener, None
+        if conn is None:
+            return
+        try:
+            if self._listener_loop and not self._listener_loop.is_closed():
+                self._listener_loop.remove_reader(conn.fileno())
+            conn.close()
+        except Exception:
+            pass
+
+    def _on_notify(self):
+        conn = self._listener
+        try:
+            conn.poll()
+        except psycopg2.Error:
+            logger.warning('Conexão LISTEN do channel layer caiu; reconectando')
+            self._stop_listener()
+            self._listener_loop.call_later(self.reconnect_delay, self._reconnect)
+            return
+        while conn.notifies:
+            notify = conn.notifies.pop(0)
+            try:
+                origin, entries = decode_payload(notify.payload)
+            except (ValueError, zlib.error):
+                logger.warning('Payload inválido no canal %s', notify.channel)
+                continue
+            if origin == self.origin:
+                continue
+            for group, channel, message in entries:
+                if group is not None:
+                    asyncio.ensure_future(self._deliver_local(group, message))
+                elif channel is not None and self._is_local_channel(channel):
+                    asyncio.ensure_future(self._deliver_channel(channel, message))
+
+    async def _deliver_channel(self, channel, message):
+        try:
+            await InMemoryChannelLayer.send(self, channel, message)
+        except ChannelFull:
+            self.dropped_messages += 1
+
+    def _reconnect(self):
+        asyncio.ensure_future(self._reconnect_listener())
+
+    async def _reconnect_listener(self):
+        try:
+            await self._ensure_listener()
+        except psycopg2.Error:
+            logger.warning('Não foi possível reconectar o LISTEN; nova tentativa em %ss', self.reconnect_delay)
+            asyncio.get_running_loop().call_later(self.reconnect_delay, self._reconnect)
+
+    # Flush extension
+
+    async def flush(self):
+        await super().flush()
+        self._outgoing = {}
+
+    async def close(self):
+        self._stop_listener()
+        if self._sender is not None:
+            self._sender.close()
+            self._sender = None
@@ -0,0 +1,113 @@
+"""Quem está com a sala aberta agora, em memória.
+
+Cada poll do estado é um heartbeat (`heartbeat`) e cada WebSocket conta como
+presença enquanto estiver aberto (`connect`/`disconnect`). Nada vai para o
+banco: atualizar é mexer num dicionário sob um lock. Um jogador sem socket
+aberto fica online por `PRESENCE_TIMEOUT_SECONDS` depois do último poll.
+
+O registro é do processo. Com afinidade de sala (`runaffinity`) todo o
+tráfego de uma sala chega ao mesmo worker e a presença da sala é completa;
+sem ela, cada worker enxerga só os clientes que atendeu.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+PRUNE_EVERY_SECONDS = 60
+
+
+@dataclass
+class RoomPresence:
+    players: set = field(default_factory=set)  # nomes dos jogadores online
+    spectators: int = 0
+
+
+def spectator_key(identifier):
+    """Chave de um espectador (sessão ou canal).
+
+    Uma tupla, não um prefixo no texto: jogadores são chaveados pelo nome
+    (str), então nenhum nome de jogador, seja qual for, conta como espectador.
+    """
+    return ('spectator', identifier)
+
+
+def is_spectator(key):
+    return isinstance(key, tuple)
+
+
+class PresenceRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms = {}  # código -> {chave: [último sinal, sockets abertos]}
+        self._last_prune = time.monotonic()
+
+    @property
+    def timeout(self):
+        return settings.PRESENCE_TIMEOUT_SECONDS
+
+    def _touch(self, code, key, sockets_delta=0):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._rooms.setdefault(code, {}).setdefault(key, [now, 0])
+            entry[0] = now
+            entry[1] = max(0, entry[1] + sockets_delta)
+            if now - self._last_prune >= PRUNE_EVERY_SECONDS:
+                self._prune(now)
+
+    def heartbeat(self, code, key):
+        if key:
+            self._touch(code, key)
+
+    def connect(self, code, key):
+        self._touch(code, key, 1)
+
+    def disconnect(self, code, key):
+        self._touch(code, key, -1)
+
+    def forget_room(self, code):
+        with self._lock:
+            self._rooms.pop(code, None)
+
+    def _is_online(self, entry, now):
+        return entry[1] > 0 or now - entry[0] <= self.timeout
+
+    def _prune(self, now):
+        for code in list(self._rooms):
+            room = self._rooms[code]
+            for key in [key for key, entry in room.items() if not self._is_online(entry, now)]:
+                del room[key]
+            if not room:
+                del self._rooms[code]
+        self._last_prune = now
+
+    def room(self, code):
+        """Jogadores e espectadores online na sala."""
+        now = time.monotonic()
+        presence = RoomPresence()
+        with self._lock:
+            for key, entry in self._rooms.get(code, {}).items():
+                if not self._is_online(entry, now):
+                    continue
+                if is_spectator(key):
+                    presence.spectators += 1
+                else:
+                    presence.players.add(key)
+        return presence
+
+    def totals(self):
+        """(salas com alguém online, jogadores online, espectadores online) para as métricas."""
+        now = time.monotonic()
+        rooms = players = spectators = 0
+        with self._lock:
+            for room in self._rooms.values():
+                online = [key for key, entry in room.items() if self._is_online(entry, now)]
+                rooms += bool(online)
+                watching = sum(1 for key in online if is_spectator(key))
+                spectators += watching
+                players += len(online) - watching
+        return rooms, players, spectators
+
+
+registry = PresenceRegistry()
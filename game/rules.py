@@ -0,0 +1,293 @@
+"""Regras do jogo sem banco de dados.
+
+Funções puras sobre ids e papéis: sorteio de papéis, avanço de turno e de
+rodada, apuração de votos, vitória e palpites do Palhaço. Models, views e o
+consumer chamam estas funções e cuidam apenas de ler e gravar as linhas.
+
+O sorteio usa o `rng` recebido (por padrão o módulo `random`); com uma
+`random.Random(seed)` a sequência é reproduzível. `simulate_game` joga uma
+partida inteira em memória com as mesmas regras, para medir distribuição de
+papéis e taxas de vitória (`manage.py simulate_games`).
+"""
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+HINT_ROUNDS = 3  # rodadas só de dicas antes da primeira votação
+MAX_WHITEMEN = 3
+MIN_PLAYERS_FOR_CLOWN = 6
+MAX_SIMULATED_ROUNDS = 200
+
+ROLE_ORDER = ('impostor', 'whiteman', 'clown', 'citizen')
+# Papéis que vencem junto com cada valor de Game.winning_team
+TEAM_ROLES = {
+    'citizens': ('citizen', 'whiteman'),
+    'impostors': ('impostor',),
+    'clown': ('clown',),
+}
+
+
+@dataclass(slots=True)
+class RoleCounts:
+    """Quantidade de cada papel sorteada para a partida."""
+    impostors: int
+    whitemen: int
+    clowns: int
+
+
+@dataclass(slots=True)
+class Turn:
+    """Status, rodada e vez depois de uma transição."""
+    status: str
+    current_round: int
+    current_player_index: int
+
+
+def draw_role_counts(num_players, num_impostors, num_whitemen, num_clowns, rng=random):
+    """Sorteia quantos impostores, whitemen e palhaços a partida terá.
+
+    O criador escolhe o máximo; a partida usa de 1 até `num_impostors`
+    impostores e de 0 até `num_whitemen` (no máximo 3) whitemen. O Palhaço
+    só entra com 6 ou mais jogadores e se sobrar vaga.
+    """
+    if num_players <= 0:
+        return RoleCounts(0, 0, 0)
+
+    max_impostors = max(1, min(num_impostors, num_players))
+    impostors = rng.randint(1, max_impostors)
+    remaining = num_players - impostors
+
+    max_whitemen = max(0, min(num_whitemen, MAX_WHITEMEN, remaining))
+    whitemen = rng.randint(0, max_whitemen) if max_whitemen > 0 else 0
+    remaining -= whitemen
+
+    clowns = 0
+    if num_clowns > 0 and num_players >= MIN_PLAYERS_FOR_CLOWN and remaining > 0:
+        clowns = min(1, num_clowns, remaining)
+    return RoleCounts(impostors, whitemen, clowns)
+
+
+def deal_roles(player_ids, counts, rng=random):
+    """Embaralha os jogadores e devolve {id: papel}; quem sobra é cidadão."""
+    order = list(player_ids)
+    rng.shuffle(order)
+    roles = {}
+    start = 0
+    for role, amount in (('impostor', counts.impostors), ('whiteman', counts.whitemen), ('clown', counts.clowns)):
+        for player_id in order[start:start + amount]:
+            roles[player_id] = role
+        start += amount
+    for player_id in order[start:]:
+        roles[player_id] = 'citizen'
+    return roles
+
+
+def first_player_index(active_count, rng=random):
+    """Quem começa a rodada de dicas (sorteado entre os ativos)."""
+    return rng.randint(0, active_count - 1) if active_count else 0
+
+
+def next_player_index(current_index, active_count):
+    return (current_index + 1) % active_count if active_count else 0
+
+
+def after_hint(current_round, next_index, hints_this_round, active_count, rng=random):
+    """Transição depois de uma dica.
+
+    `next_index` já é a vez do próximo jogador. Quando todos os ativos deram
+    dica a rodada avança; depois da terceira rodada vem a votação.
+    """
+    if active_count == 0 or hints_this_round < active_count:
+        return Turn('hints', current_round, next_index)
+    if current_round < HINT_ROUNDS:
+        return Turn('hints', current_round + 1, first_player_index(active_count, rng))
+    return Turn('voting', current_round + 1, 0)
+
+
+def all_votes_in(votes_from_active, active_count):
+    return active_count > 0 and votes_from_active >= active_count
+
+
+def tally_votes(target_ids):
+    """Conta os votos e devolve ({alvo: votos}, eliminado ou None em empate)."""
+    counts = {}
+    for target_id in target_ids:
+        counts[target_id] = counts.get(target_id, 0) + 1
+    if not counts:
+        return counts, None
+    top = max(counts.values())
+    leaders = [target_id for target_id, total in counts.items() if total == top]
+    return counts, leaders[0] if len(leaders) == 1 else None
+
+
+def impostors_to_guess(actual_num_impostors, num_impostors):
+    return actual_num_impostors or num_impostors
+
+
+def clown_guessed_all(guessed_ids, impostor_ids):
+    """O Palhaço acerta só se apostou exatamente nos impostores (inclusive eliminados)."""
+    return set(guessed_ids) == set(impostor_ids)
+
+
+def clown_wins_on_elimination(role, goal_state, known_impostor_ids, total_impostors):
+    """O Palhaço vence sozinho se for eliminado depois de descobrir todos os impostores."""
+    return (
+        role == 'clown'
+        and goal_state == 'eliminate'
+        and len(set(known_impostor_ids or [])) >= total_impostors
+    )
+
+
+def winner(active_roles):
+    """Time vencedor entre os jogadores ativos, ou None se o jogo continua."""
+    active = 0
+    impostors = 0
+    for role in active_roles:
+        active += 1
+        if role == 'impostor':
+            impostors += 1
+    return winner_from_counts(active, impostors)
+
+
+def winner_from_counts(active, impostors):
+    """Como `winner`, a partir das contagens de ativos e de impostores ativos."""
+    if impostors == 0:
+        return 'citizens'
+    if active == 2:
+        return 'impostors'
+    return None
+
+
+def role_won(role, winning_team):
+    """Se um jogador com este papel venceu a partida."""
+    return role in TEAM_ROLES.get(winning_team, ())
+
+
+def after_voting(current_round, current_player_index, active_count, winning_team, rng=random):
+    """Transição depois da apuração: fim de jogo ou nova rodada de dicas."""
+    if winning_team or active_count == 0:
+        return Turn('finished', current_round, current_player_index)
+    return Turn('hints', current_round + 1, first_player_index(active_count, rng))
+
+
+# Simulação ---------------------------------------------------------------
+
+@dataclass(slots=True)
+class SimulatedGame:
+    """Resultado de uma partida simulada."""
+    winner: str  # citizens, impostors, clown ou timeout
+    rounds: int
+    counts: RoleCounts
+    roles: dict  # {assento: papel}
+    eliminated: int
+
+
+def _random_other(candidates, voter, rng):
+    choices = [player_id for player_id in candidates if player_id != voter]
+    return rng.choice(choices) if choices else voter
+
+
+def simulate_game(num_players, num_impostors=1, num_whitemen=0, num_clowns=0,
+                  accuracy=0.3, clown_accuracy=0.2, rng=random):
+    """Joga uma partida inteira em memória.
+
+    Os assentos são 0..num_players-1. Dicas não mudam nada além do turno; na
+    votação cada cidadão/whiteman/palhaço acerta um impostor com
+    probabilidade `accuracy` e vota ao acaso no resto; impostores votam em
+    quem não é impostor. O Palhaço acerta todos os impostores num palpite com
+    probabilidade `clown_accuracy`. WhiteMen eliminados continuam votando.
+    """
+    counts = draw_role_counts(num_players, num_impostors, num_whitemen, num_clowns, rng)
+    roles = deal_roles(range(num_players), counts, rng)
+    alive = list(range(num_players))
+    impostor_ids = [seat for seat, role in roles.items() if role == 'impostor']
+    total_impostors = impostors_to_guess(counts.impostors, num_impostors)
+    ghosts = []
+    clown_state = {seat: 'finding' for seat, role in roles.items() if role == 'clown'}
+
+    turn = Turn('hints', 1, first_player_index(num_players, rng))
+    while turn.current_round <= MAX_SIMULATED_ROUNDS:
+        if turn.status == 'hints':
+            hints = 0
+            round_number = turn.current_round
+            while turn.status == 'hints' and turn.current_round == round_number:
+                hints += 1
+                next_index = next_player_index(turn.current_player_index, len(alive))
+                turn = after_hint(round_number, next_index, hints, len(alive), rng)
+            continue
+
+        for seat, state in clown_state.items():
+            if state == 'finding' and seat in alive and rng.random() < clown_accuracy:
+                clown_state[seat] = 'eliminate'
+
+        alive_impostors = [seat for seat in alive if roles[seat] == 'impostor']
+        alive_others = [seat for seat in alive if roles[seat] != 'impostor']
+        targets = []
+        for voter in alive + ghosts:
+            if roles[voter] == 'impostor':
+                targets.append(_random_other(alive_others, voter, rng))
+            elif alive_impostors and rng.random() < accuracy:
+                targets.append(rng.choice(alive_impostors))
+            else:
+                targets.append(_random_other(alive, voter, rng))
+
+        _, eliminated = tally_votes(targets)
+        if eliminated is not None:
+            alive.remove(eliminated)
+            if roles[eliminated] == 'whiteman':
+                ghosts.append(eliminated)
+            known = impostor_ids if clown_state.get(eliminated) == 'eliminate' else []
+            if clown_wins_on_elimination(roles[eliminated], clown_state.get(eliminated, ''), known, total_impostors):
+                return SimulatedGame('clown', turn.current_round, counts, roles, num_players - len(alive))
+
+        team = winner(roles[seat] for seat in alive)
+        turn = after_voting(turn.current_round, turn.current_player_index, len(alive), team, rng)
+        if turn.status == 'finished':
+            return SimulatedGame(team or 'citizens', turn.current_round, counts, roles, num_players - len(alive))
+
+    return SimulatedGame('timeout', turn.current_round, counts, roles, num_players - len(alive))
+
+
+def simulate_many(games, num_players, seed=None, **config):
+    """Simula `games` partidas e agrega vitórias, papéis e justiça por assento."""
+    rng = random.Random(seed)
+    wins = Counter()
+    role_counts = Counter()
+    seat_roles = [Counter() for _ in range(num_players)]
+    rounds = 0
+    started = time.perf_counter()
+    for _ in range(games):
+        result = simulate_game(num_players, rng=rng, **config)
+        wins[result.winner] += 1
+        role_counts[(result.counts.impostors, result.counts.whitemen, result.counts.clowns)] += 1
+        for seat, role in result.roles.items():
+            seat_roles[seat][role] += 1
+        rounds += result.rounds
+    elapsed = time.perf_counter() - started
+
+    # Justiça: cada assento deveria receber cada papel na mesma proporção
+    fairness = {}
+    for role in ROLE_ORDER:
+        shares = [seat[role] / games for seat in seat_roles] if games else []
+        expected = sum(shares) / len(shares) if shares else 0.0
+        fairness[role] = {
+            'expected': expected,
+            'max_deviation': max((abs(share - expected) for share in shares), default=0.0),
+        }
+
+    return {
+        'games': games,
+        'players': num_players,
+        'config': config,
+        'seed': seed,
+        'elapsed_seconds': elapsed,
+        'games_per_second': games / elapsed if elapsed else 0.0,
+        'average_rounds': rounds / games if games else 0.0,
+        'wins': {team: wins[team] / games for team in sorted(wins)} if games else {},
+        'role_counts': {
+            f'{impostors}i/{whitemen}w/{clowns}p': total / games
+            for (impostors, whitemen, clowns), total in sorted(role_counts.items())
+        },
+        'seat_fairness': fairness,
+    }
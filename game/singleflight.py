@@ -0,0 +1,95 @@
+"""Single-flight: pedidos simultâneos pela mesma chave esperam um único cálculo.
+
+Na virada de rodada os polls de todos os jogadores de uma sala chegam quase
+juntos e cada um carregaria as mesmas linhas. Com `Group.do(chave, fn)` o
+primeiro pedido executa `fn` e os que chegam enquanto ele roda esperam o
+resultado dele. Nada fica guardado depois: terminado o cálculo, o próximo
+pedido calcula de novo.
+
+`not_before` protege contra resultado velho: um pedido só aproveita um cálculo
+que começou depois dele (o instante em que o pedido chegou, em
+`time.monotonic()`). Se o cálculo em andamento é anterior, o pedido calcula
+sozinho e passa a ser o cálculo que os próximos aproveitam.
+
+`Group` serve a workers WSGI com threads; `AsyncGroup`, a views assíncronas
+num event loop.
+"""
+import asyncio
+import threading
+import time
+
+
+class _Call:
+    __slots__ = ('started', 'done', 'result', 'error')
+
+    def __init__(self, done):
+        self.started = time.monotonic()
+        self.done = done
+        self.result = None
+        self.error = None
+
+
+def _can_join(call, not_before):
+    return call is not None and (not_before is None or call.started >= not_before)
+
+
+class Group:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, not_before=None):
+        """Devolve (resultado, compartilhado)."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = not _can_join(call, not_before)
+            if leader:
+                call = _Call(threading.Event())
+                self._calls[key] = call
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class AsyncGroup:
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn, not_before=None):
+        """Como `Group.do`, com `fn` uma corrotina; devolve (resultado, compartilhado)."""
+        call = self._calls.get(key)
+        if _can_join(call, not_before):
+            # shield: um pedido cancelado não cancela o cálculo dos outros
+            return await asyncio.shield(call.done), True
+
+        call = _Call(asyncio.get_running_loop().create_future())
+        self._calls[key] = call
+        try:
+            call.result = await fn()
+        except Exception as exc:
+            call.done.set_exception(exc)
+            call.done.exception()  # marcado como lido: ninguém esperando não gera aviso
+            raise
+        except BaseException:
+            call.done.cancel()  # pedido cancelado: quem esperava recebe CancelledError
+            raise
+        else:
+            call.done.set_result(call.result)
+        finally:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        return call.result, False
@@ -0,0 +1,350 @@
+"""Montagem do estado da sala enviado aos clientes.
+
+O estado é montado em duas etapas: primeiro carregamos as linhas da sala que
+são iguais para todos que a observam (`RoomSnapshot`), depois aplicamos a
+visão de cada jogador (papéis ocultos, nudges pendentes, dados do Palhaço).
+A primeira etapa tem versões síncrona e assíncrona; a montagem em si é pura.
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.db import connection, transaction
+
+from . import metrics
+from .models import Player, Hint, Vote, Nudge, sort_players_for_display
+from .singleflight import AsyncGroup, Group
+
+
+@dataclass
+class RoomSnapshot:
+    """Linhas da sala compartilhadas por todos os observadores."""
+    game: object
+    players: list  # ordenados por id (ordem de turno)
+    hints: list  # ordenadas por rodada e criação
+    votes: list  # votos de eliminação ordenados por rodada e criação
+    players_by_id: dict = field(init=False)
+
+    def __post_init__(self):
+        self.players_by_id = {player.id: player for player in self.players}
+
+    @property
+    def active_players(self):
+        return [player for player in self.players if not player.is_eliminated]
+
+    def player_named(self, name):
+        for player in self.players:
+            if player.name == name:
+                return player
+        return None
+
+
+@dataclass
+class ViewerExtras:
+    """Dados que dependem de quem está olhando a sala."""
+    nudges: list = field(default_factory=list)
+    palhaco_guesses: int = 0
+
+
+def _players_qs(game):
+    return Player.objects.filter(game=game).select_related('word').order_by('id')
+
+
+def _hints_qs(game):
+    return Hint.objects.filter(game=game).order_by('round_number', 'created_at')
+
+
+def _votes_qs(game):
+    return Vote.objects.filter(game=game, is_palhaco_guess=False).order_by('round_number', 'created_at')
+
+
+def _pending_nudges_qs(game, viewer):
+    return Nudge.objects.filter(
+        game=game,
+        to_player=viewer,
+        acknowledged=False,
+        round_number=game.current_round,
+    ).order_by('created_at')
+
+
+def _palhaco_guesses_qs(game, viewer):
+    return Vote.objects.filter(
+        game=game,
+        voter=viewer,
+        round_number=game.current_round,
+        is_palhaco_guess=True,
+    )
+
+
+@contextmanager
+def read_snapshot():
+    """Transação só de leitura em que todas as consultas veem o mesmo instante.
+
+    No Postgres é REPEATABLE READ READ ONLY. Dentro de uma transação já aberta
+    (testes, ATOMIC_REQUESTS) vale o isolamento dela.
+    """
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        if outermost and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+        yield
+
+
+def load_room_snapshot(game):
+    return RoomSnapshot(
+        game=game,
+        players=list(_players_qs(game)),
+        hints=list(_hints_qs(game)),
+        votes=list(_votes_qs(game)),
+    )
+
+
+async def aload_room_snapshot(game):
+    return RoomSnapshot(
+        game=game,
+        players=[player async for player in _players_qs(game)],
+        hints=[hint async for hint in _hints_qs(game)],
+        votes=[vote async for vote in _votes_qs(game)],
+    )
+
+
+# Polls da mesma sala que chegam juntos dividem um único carregamento (por processo)
+_snapshot_flights = Group()
+_async_snapshot_flights = AsyncGroup()
+
+
+def _for_game(snapshot, game, shared):
+    metrics.STATE_SNAPSHOTS.inc(result='shared' if shared else 'loaded')
+    if snapshot.game is game:
+        return snapshot
+    # Linhas do carregamento compartilhado, com a sala lida por este pedido
+    return RoomSnapshot(game=game, players=snapshot.players, hints=snapshot.hints, votes=snapshot.votes)
+
+
+def load_shared_snapshot(game, requested_at):
+    """Como `load_room_snapshot`, aproveitando um carregamento simultâneo da sala.
+
+    `requested_at` (`time.monotonic()` da chegada do pedido, antes de ler a
+    sala) garante que só vale um carregamento que começou depois disso.
+    """
+    snapshot, shared = _snapshot_flights.do(game.code, lambda: load_room_snapshot(game), requested_at)
+    return _for_game(snapshot, game, shared)
+
+
+async def aload_shared_snapshot(game, requested_at, load=None):
+    """Versão assíncrona; `load` (corrotina) troca o carregamento padrão.
+
+    O GameConsumer passa `load_consistent_snapshot` embrulhado em
+    `database_sync_to_async`: os sockets de uma sala avisados da mesma mudança
+    dividem um carregamento, e cada um monta a própria visão.
+    """
+    snapshot, shared = await _async_snapshot_flights.do(
+        game.code, load or (lambda: aload_room_snapshot(game)), requested_at,
+    )
+    return _for_game(snapshot, game, shared)
+
+
+def load_consistent_snapshot(game):
+    """`load_room_snapshot` dentro de `read_snapshot()`: um retrato só da sala."""
+    with read_snapshot():
+        return load_room_snapshot(game)
+
+
+def load_viewer_extras(snapshot, viewer):
+    """Carrega os nudges pendentes do jogador (marcando-os como vistos) e seus palpites."""
+    extras = ViewerExtras()
+    if viewer is None:
+        return extras
+    game = snapshot.game
+    extras.nudges = list(_pending_nudges_qs(game, viewer))
+    if extras.nudges:
+        # Marcar só os nudges lidos: um nudge que chegue agora fica para o próximo poll
+        Nudge.objects.filter(id__in=[nudge.id for nudge in extras.nudges]).update(acknowledged=True)
+    if viewer.role == 'clown':
+        extras.palhaco_guesses = _palhaco_guesses_qs(game, viewer).count()
+    return extras
+
+
+async def aload_viewer_extras(snapshot, viewer):
+    extras = ViewerExtras()
+    if viewer is None:
+        return extras
+    game = snapshot.game
+    extras.nudges = [nudge async for nudge in _pending_nudges_qs(game, viewer)]
+    if extras.nudges:
+        await Nudge.objects.filter(id__in=[nudge.id for nudge in extras.nudges]).aupdate(acknowledged=True)
+    if viewer.role == 'clown':
+        extras.palhaco_guesses = await _palhaco_guesses_qs(game, viewer).acount()
+    return extras
+
+
+def build_game_state(snapshot, is_spectator, viewer=None, extras=None, presence=None):
+    """Monta o payload de estado para um observador a partir do snapshot.
+
+    `presence` (`game.presence.RoomPresence`) marca quem está online.
+    """
+    game = snapshot.game
+    if is_spectator:
+        viewer = None
+    extras = extras or ViewerExtras()
+    online = presence.players if presence is not None else set()
+    names = {player.id: player.name for player in snapshot.players}
+
+    players_data = []
+    for player in sort_players_for_display(game.code, snapshot.players):
+        word_text = None
+        role_value = None
+        is_clown_revealed = False  # Para mostrar ao impostor quem é o Palhaço
+        is_viewer = viewer is not None and player.id == viewer.id
+        reveal_role = is_viewer or player.is_eliminated or game.status == 'finished'
+
+        if not is_spectator:
+            actual_role = player.role
+            if actual_role in ['whiteman', 'clown'] and not reveal_role:
+                role_value = 'citizen'
+            else:
+                role_value = actual_role
+
+            # Revelar Palhaço ao impostor se o poder de caos foi usado
+            if (viewer and viewer.role == 'impostor' and
+                    viewer.impostor_knows_clown and player.role == 'clown'):
+                is_clown_revealed = True
+
+            if player.word:
+                if is_viewer:
+                    word_text = player.word.text
+                elif reveal_role and actual_role != 'impostor':
+                    word_text = player.word.text
+        players_data.append({
+            'id': player.id,
+            'name': player.name,
+            'is_eliminated': player.is_eliminated,
+            'is_creator': player.is_creator,
+            'role': role_value,
+            'actual_role': player.role if reveal_role else None,
+            'word': word_text,
+            'nudge_meter': player.nudge_meter,
+            'nudge_meter_round': player.nudge_meter_round,
+            'is_clown_revealed': is_clown_revealed,
+            'online': player.name in online,
+        })
+
+    hints_data = [
+        {
+            'player_name': names.get(hint.player_id),
+            'round_number': hint.round_number,
+            'word': hint.word,
+            'created_at': hint.created_at.isoformat(),
+        }
+        for hint in snapshot.hints
+    ]
+
+    votes_data = []
+    vote_history = {}
+    vote_tallies = {}
+    for vote in snapshot.votes:
+        voter_name = names.get(vote.voter_id)
+        target_name = names.get(vote.target_id)
+        entry = {'voter_name': voter_name, 'target_name': target_name}
+        if vote.round_number == game.current_round:
+            votes_data.append(entry)
+        vote_history.setdefault(vote.round_number, []).append(dict(entry))
+        tally = vote_tallies.setdefault(vote.round_number, {})
+        tally[target_name] = tally.get(target_name, 0) + 1
+
+    nudges_data = [
+        {
+            'id': nudge.id,
+            'from_player': names.get(nudge.from_player_id),
+            'created_at': nudge.created_at.isoformat(),
+        }
+        for nudge in extras.nudges
+    ]
+
+    active_players = snapshot.active_players
+    current_player_name = None
+    if active_players and 0 <= game.current_player_index < len(active_players):
+        current_player_name = active_players[game.current_player_index].name
+
+    game_data = {
+        'code': game.code,
+        'status': game.status,
+        'version': game.version,
+        'current_round': game.current_round,
+        'current_player': current_player_name,
+        'num_impostors': game.num_impostors,
+        'num_whitemen': game.num_whitemen,
+        'num_clowns': game.num_clowns,
+        'max_players': game.max_players,
+        'citizen_word': None,
+        'impostor_word': None,
+        'nudge_meter_max': 100,
+        'winning_team': game.winning_team,
+        'spectators_online': presence.spectators if presence is not None else 0,
+    }
+
+    if not is_spectator:
+        game_data['citizen_word'] = game.citizen_word.text if game.citizen_word else None
+        game_data['impostor_word'] = game.impostor_word.text if game.impostor_word else None
+        if game.status == 'finished':
+            game_data['actual_num_impostors'] = game.actual_num_impostors
+            game_data['actual_num_whitemen'] = game.actual_num_whitemen
+            game_data['actual_num_clowns'] = game.actual_num_clowns
+
+    palhaco_payload = None
+    if viewer and viewer.role == 'clown':
+        known_ids = viewer.palhaco_known_impostors or []
+        known_players = [snapshot.players_by_id[pid] for pid in known_ids if pid in snapshot.players_by_id]
+        total_impostors = game.actual_num_impostors or game.num_impostors
+        guesses_count = extras.palhaco_guesses
+
+        # Pode fazer palpite se ainda não completou todos os palpites necessários
+        can_guess = (
+            game.status == 'voting' and
+            not viewer.is_eliminated and
+            viewer.palhaco_goal_state in ['', 'finding', 'pending'] and
+            guesses_count < total_impostors
+        )
+
+        can_use_chaos_power = (
+            viewer.palhaco_goal_state == 'eliminate' and
+            not viewer.palhaco_used_chaos_power and
+            not viewer.is_eliminated and
+            game.status in ['hints', 'voting']
+        )
+
+        palhaco_payload = {
+            'goal_state': viewer.palhaco_goal_state or 'finding',
+            'known_impostors': [p.name for p in known_players],
+            'known_count': len(known_players),
+            'total_impostors': total_impostors,
+            'remaining_impostors': max(0, total_impostors - len(known_ids)),
+            'can_guess': can_guess,
+            'already_guessed_this_round': guesses_count >= total_impostors,
+            'guesses_made': guesses_count,
+            'guesses_remaining': max(0, total_impostors - guesses_count),
+            'goal_ready_round': viewer.palhaco_goal_ready_round,
+            'needs_elimination': viewer.palhaco_goal_state == 'eliminate',
+            'can_use_chaos_power': can_use_chaos_power,
+            'chaos_power_used': viewer.palhaco_used_chaos_power,
+        }
+
+    return {
+        'game': game_data,
+        'players': players_data,
+        'hints': hints_data,
+        'votes': votes_data,
+        'vote_history': vote_history,
+        'vote_tallies': vote_tallies,
+        'nudges': nudges_data,
+        'palhaco': palhaco_payload,
+    }
+
+
+def serialize_game_state(game, is_spectator, player_name=None):
+    """Atalho síncrono: carrega o snapshot e monta o estado para `player_name`."""
+    snapshot = load_room_snapshot(game)
+    viewer = None
+    if player_name and not is_spectator:
+        viewer = snapshot.player_named(player_name)
+    return build_game_state(snapshot, is_spectator, viewer, load_viewer_extras(snapshot, viewer))
@@ -0,0 +1,131 @@
+"""Estatísticas de jogadores e grupos de palavras.
+
+Nada aqui varre o histórico: quando uma partida termina, `record_finished_game`
+soma os resultados dela em `PlayerStats` (uma linha por nome de jogador) e
+`WordGroupStats` (uma linha por grupo) com um upsert por tabela. No Postgres
+é um `INSERT ... ON CONFLICT DO UPDATE SET coluna = coluna + EXCLUDED.coluna`,
+que cria a linha na primeira partida e incrementa nas seguintes sem corrida
+entre partidas que terminam ao mesmo tempo. Ler o placar custa uma consulta
+indexada por tabela, não importa quantas partidas já foram jogadas.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import rules
+from .models import Player, PlayerStats, WordGroupStats
+
+DEFAULT_LEADERBOARD_SIZE = 20
+MAX_LEADERBOARD_SIZE = 100
+
+
+def _upsert_increments(model, key, rows, now):
+    """Soma `rows` ({chave: {coluna: incremento}}) nas linhas de `model`.
+
+    `last_played_at` recebe `now`. A chave é o campo único (`name`) ou a
+    chave primária (`word_group`). As linhas vão em ordem de chave: o upsert
+    trava cada uma na ordem em que aparece, e duas partidas terminando ao
+    mesmo tempo com nomes em comum (em outra ordem) se travariam mutuamente.
+    """
+    if not rows:
+        return
+    rows = sorted(rows.items())
+    key_column = model._meta.get_field(key).column
+    # Todos os contadores entram no INSERT: os defaults do model não existem no banco
+    columns = [field.column for field in model._meta.concrete_fields if field.get_internal_type() == 'IntegerField']
+    if connection.vendor == 'postgresql':
+        quote = connection.ops.quote_name
+        table = quote(model._meta.db_table)
+        insert_columns = [key_column, *columns, 'last_played_at']
+        placeholders = '(' + ', '.join(['%s'] * len(insert_columns)) + ')'
+        params = []
+        for key_value, increments in rows:
+            params += [key_value, *(increments.get(column, 0) for column in columns), now]
+        updates = ', '.join(f'{quote(column)} = {table}.{quote(column)} + EXCLUDED.{quote(column)}' for column in columns)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(quote(column) for column in insert_columns)}) '
+                f'VALUES {", ".join([placeholders] * len(rows))} '
+                f'ON CONFLICT ({quote(key_column)}) DO UPDATE SET {updates}, '
+                f'{quote("last_played_at")} = EXCLUDED.{quote("last_played_at")}',
+                params,
+            )
+        return
+
+    # Outros bancos: UPDATE com F() e, se a linha ainda não existe, INSERT
+    for key_value, increments in rows:
+        lookup = {key_column: key_value}
+        changes = {column: F(column) + amount for column, amount in increments.items()}
+        if model.objects.filter(**lookup).update(last_played_at=now, **changes):
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.create(last_played_at=now, **lookup, **increments)
+        except IntegrityError:
+            model.objects.filter(**lookup).update(last_played_at=now, **changes)
+
+
+def player_increments(players, winning_team):
+    """{nome: incrementos} a partir de (nome, papel, eliminado) dos jogadores."""
+    rows = defaultdict(lambda: defaultdict(int))
+    for name, role, eliminated in players:
+        if not role:
+            continue  # entrou depois do sorteio
+        won = rules.role_won(role, winning_team)
+        increments = rows[name]
+        increments['games_played'] += 1
+        increments['games_won'] += int(won)
+        increments['times_eliminated'] += int(eliminated)
+        increments[f'{role}_games'] += 1
+        increments[f'{role}_wins'] += int(won)
+    return rows
+
+
+def record_finished_game(game):
+    """Soma a partida recém-finalizada nas estatísticas (3 consultas)."""
+    if game.status != 'finished' or not game.winning_team:
+        return
+    now = game.finished_at or timezone.now()
+    players = list(Player.objects.filter(game=game).values_list('name', 'role', 'is_eliminated'))
+    with transaction.atomic():
+        _upsert_increments(PlayerStats, 'name', player_increments(players, game.winning_team), now)
+        if game.word_group_id:
+            _upsert_increments(WordGroupStats, 'word_group', {game.word_group_id: {
+                'games_played': 1,
+                f'{game.winning_team}_wins': 1,
+                'rounds_total': game.current_round,
+                'players_total': sum(1 for _, role, _ in players if role),
+            }}, now)
+
+
+def _rate(part, total):
+    return round(part / total, 3) if total else None
+
+
+def leaderboard(limit=DEFAULT_LEADERBOARD_SIZE):
+    """Melhores jogadores e grupos mais jogados, prontos para JSON (2 consultas)."""
+    players = PlayerStats.objects.order_by('-games_won', 'games_played')[:limit]
+    groups = WordGroupStats.objects.select_related('word_group').order_by('-games_played')[:limit]
+    return {
+        'players': [{
+            'name': stats.name,
+            'games_played': stats.games_played,
+            'games_won': stats.games_won,
+            'win_rate': _rate(stats.games_won, stats.games_played),
+            'elimination_rate': _rate(stats.times_eliminated, stats.games_played),
+            'wins_by_role': {
+                role: {'games': getattr(stats, f'{role}_games'), 'wins': getattr(stats, f'{role}_wins')}
+                for role in rules.ROLE_ORDER
+            },
+            'clown_success_rate': _rate(stats.clown_wins, stats.clown_games),
+        } for stats in players],
+        'word_groups': [{
+            'name': str(stats.word_group),
+            'games_played': stats.games_played,
+            'wins': {team: getattr(stats, f'{team}_wins') for team in rules.TEAM_ROLES},
+            'average_rounds': _rate(stats.rounds_total, stats.games_played),
+            'average_players': _rate(stats.players_total, stats.games_played),
+        } for stats in groups],
+    }
@@ -0,0 +1,217 @@
+"""Geração de salas sintéticas para verificações de desempenho.
+
+Usado pelos comandos de manutenção que medem planos de consulta, orçamentos
+de queries e benchmarks. Nunca rode contra o banco de produção.
+"""
+import random
+import secrets
+
+from django.utils import timezone
+
+from .models import Game, Player, Hint, Vote, Nudge
+
+CODE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+
+
+def _random_code(used):
+    while True:
+        code = ''.join(secrets.choice(CODE_ALPHABET) for _ in range(6))
+        if code not in used:
+            used.add(code)
+            return code
+
+
+def build_rooms(num_rooms, players_per_room=10, rounds=6, status='finished',
+                num_impostors=2, num_whitemen=1, num_clowns=1, seed=None,
+                batch_size=2000):
+    """Cria `num_rooms` salas completas com jogadores, dicas, votos e nudges.
+
+    As linhas são inseridas com bulk_create para que milhares de salas caibam
+    em poucos segundos. Retorna a lista de jogos criados.
+    """
+    rng = random.Random(seed)
+    used_codes = set(Game.objects.values_list('code', flat=True))
+    now = timezone.now()
+
+    games = [
+        Game(
+            code=_random_code(used_codes),
+            status=status,
+            creator='p0',
+            num_impostors=num_impostors,
+            num_whitemen=num_whitemen,
+            num_clowns=num_clowns,
+            actual_num_impostors=num_impostors,
+            actual_num_whitemen=num_whitemen,
+            actual_num_clowns=num_clowns,
+            current_round=rounds,
+            player_count=players_per_room,
+            started_at=now,
+            finished_at=now if status == 'finished' else None,
+            winning_team='citizens' if status == 'finished' else None,
+        )
+        for _ in range(num_rooms)
+    ]
+    Game.objects.bulk_create(games, batch_size=batch_size)
+
+    roles = (
+        ['impostor'] * num_impostors
+        + ['whiteman'] * num_whitemen
+        + ['clown'] * num_clowns
+    )
+    players = []
+    for game in games:
+        room_roles = roles + ['citizen'] * max(0, players_per_room - len(roles))
+        rng.shuffle(room_roles)
+        for index, role in enumerate(room_roles[:players_per_room]):
+            players.append(Player(
+                game=game,
+                name=f'p{index}',
+                role=role,
+                is_creator=index == 0,
+                # Em salas longas parte dos jogadores já foi eliminada
+                is_eliminated=index < rounds // 3,
+                nudge_meter_round=rounds,
+                palhaco_goal_state='finding' if role == 'clown' else '',
+            ))
+    Player.objects.bulk_create(players, batch_size=batch_size)
+
+    by_game = {}
+    for player in players:
+        by_game.setdefault(player.game_id, []).append(player)
+    for game in games:
+        alive = [player for player in by_game[game.id] if not player.is_eliminated]
+        game.alive_count = len(alive)
+        game.alive_impostors = sum(1 for player in alive if player.role == 'impostor')
+    Game.objects.bulk_update(games, ['alive_count', 'alive_impostors'], batch_size=batch_size)
+
+    hints, votes, nudges = [], [], []
+    for game in games:
+        room = by_game[game.id]
+        for round_number in range(1, rounds + 1):
+            for player in room:
+                hints.append(Hint(game=game, player=player, round_number=round_number, word=f'dica{round_number}'))
+            if round_number > 3:
+                for voter in room:
+                    target = rng.choice([p for p in room if p.id != voter.id])
+                    votes.append(Vote(game=game, voter=voter, target=target, round_number=round_number))
+            for _ in range(len(room)):
+                sender, receiver = rng.sample(room, 2)
+                nudges.append(Nudge(
+                    game=game,
+                    from_player=sender,
+                    to_player=receiver,
+                    round_number=round_number,
+                    acknowledged=round_number < rounds or rng.random() < 0.9,
+                ))
+        if len(hints) >= batch_size * 5:
+            _flush(hints, votes, nudges, batch_size)
+    _flush(hints, votes, nudges, batch_size)
+    return games
+
+
+def _flush(hints, votes, nudges, batch_size):
+    Hint.objects.bulk_create(hints, batch_size=batch_size)
+    Vote.objects.bulk_create(votes, batch_size=batch_size)
+    Nudge.objects.bulk_create(nudges, batch_size=batch_size)
+    hints.clear()
+    votes.clear()
+    nudges.clear()
+
+
+def _round_kind(round_number):
+    # Rodadas 1-3 são só de dicas; depois alternam votação (par) e dicas (ímpar)
+    if round_number <= 3 or round_number % 2:
+        return 'hints'
+    return 'voting'
+
+
+def build_playing_room(num_players=12, rounds=6, status='hints', num_impostors=2,
+                       num_whitemen=2, num_clowns=1, seed=0):
+    """Cria uma sala realista no meio (ou no fim) de uma partida.
+
+    Papéis e palavras são sorteados pelas regras de verdade (assign_words e
+    assign_roles, com o `random` global semeado) e o histórico tem `rounds`
+    rodadas de dicas e votos, com um cidadão eliminado a cada votação. Exige
+    grupos de palavras no banco. `status` pode ser waiting, hints, voting ou
+    finished.
+    """
+    random.seed(seed)
+    now = timezone.now()
+    game = Game.objects.create(
+        creator='p0',
+        num_impostors=num_impostors,
+        num_whitemen=num_whitemen,
+        num_clowns=num_clowns,
+        status='waiting',
+        player_count=num_players,
+    )
+    Player.objects.bulk_create([
+        Player(game=game, name=f'p{index}', is_creator=index == 0)
+        for index in range(num_players)
+    ])
+    if status == 'waiting':
+        return game
+
+    if not game.assign_words():
+        raise ValueError('Não há grupos de palavras no banco')
+    game.assign_roles()
+    players = list(game.players.order_by('id'))
+    # Redistribuímos os papéis sorteados com um rng próprio para que a sala
+    # gerada por uma semente não dependa da ordem do sorteio em assign_roles
+    dealt = sorted(
+        (player.role, player.word_id, player.palhaco_goal_state) for player in players
+    )
+    random.Random(seed).shuffle(dealt)
+    for player, (role, word_id, goal_state) in zip(players, dealt):
+        player.role, player.word_id, player.palhaco_goal_state = role, word_id, goal_state
+    Player.objects.bulk_update(players, ['role', 'word', 'palhaco_goal_state'])
+
+    current_round = rounds + 1
+    wanted_kind = 'voting' if status == 'voting' else 'hints'
+    while current_round <= 3 or _round_kind(current_round) != wanted_kind:
+        current_round += 1
+
+    doomed = [player for player in players if player.role == 'citizen' and not player.is_creator]
+    alive = list(players)
+    hints, votes, nudges = [], [], []
+    for round_number in range(1, current_round):
+        if _round_kind(round_number) == 'hints':
+            for player in alive:
+                hints.append(Hint(game=game, player=player, round_number=round_number, word=f'dica{round_number}'))
+            sender, receiver = random.sample(alive, 2)
+            nudges.append(Nudge(game=game, from_player=sender, to_player=receiver,
+                                round_number=round_number, acknowledged=True))
+            continue
+        target = doomed.pop(0) if doomed else None
+        for voter in alive:
+            voted = target if target and voter is not target else random.choice([p for p in alive if p is not voter])
+            votes.append(Vote(game=game, voter=voter, target=voted, round_number=round_number))
+        if target:
+            target.is_eliminated = True
+            alive.remove(target)
+
+    # Nudges ainda não vistos pelo criador na rodada atual
+    for sender in alive[1:3]:
+        nudges.append(Nudge(game=game, from_player=sender, to_player=players[0], round_number=current_round))
+    _flush(hints, votes, nudges, 2000)
+
+    for player in players:
+        player.nudge_meter_round = current_round
+    Player.objects.bulk_update(players, ['is_eliminated', 'nudge_meter_round'])
+
+    game.status = status
+    game.current_round = current_round
+    game.current_player_index = 0
+    game.set_counters(
+        alive_count=len(alive),
+        alive_impostors=sum(1 for player in alive if player.role == 'impostor'),
+        round_hints=0,
+        round_votes=0,
+    )
+    game.started_at = now
+    if status == 'finished':
+        game.finished_at = now
+        game.winning_team = 'citizens'
+    game.save()
+    return game
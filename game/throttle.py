@@ -0,0 +1,152 @@
+"""Limite de requisições e controle de admissão.
+
+`RateLimitMiddleware` (game/middleware.py) tira uma ficha de dois baldes
+(token bucket) guardados no cache do Django: o do cliente (sessão ou, sem
+sessão, IP) e o da sala da URL. Leituras (GET/HEAD) e escritas têm orçamentos
+separados, então um cliente em loop no poll do estado não impede as próprias
+jogadas. Criar sala tira ainda uma ficha do balde do IP
+(`RATE_LIMIT_ROOM_CREATION`), que trocar de sessão não renova. Sem ficha a
+resposta é 429 com `Retry-After`.
+
+Os baldes por IP só existem com `RATE_LIMIT_TRUST_FORWARDED_FOR`: atrás de um
+proxy o REMOTE_ADDR é o do proxy, e um balde por esse endereço seria um só
+para o site inteiro. Sem a opção, pedidos sem sessão ficam só com o balde da
+sala, e criar sala não tem limite por IP.
+
+Quando a latência recente das consultas passa de `LOAD_SHED_DB_LATENCY_MS`,
+uma fração das leituras e das entradas novas (criar sala, entrar em sala)
+recebe 503 com `Retry-After`, proporcional ao excesso: os polls voltam depois
+e as jogadas das partidas em andamento continuam passando.
+
+Ler e gravar o balde no cache não é atômico; entre pedidos simultâneos do
+mesmo cliente o limite é aproximado, o que basta para conter um cliente em
+loop. Com o cache local (o padrão) os baldes são de cada processo.
+"""
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+
+from . import metrics
+from .dbpool import recent_query_ms
+from .models import Game
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Coleta de métricas e health check precisam responder justamente na sobrecarga
+EXEMPT_URL_NAMES = {'metrics', 'db_health_api'}
+# Entradas novas, recusadas junto com as leituras quando o banco está lento
+ADMISSION_URL_NAMES = {'create_game', 'join_game'}
+MAX_SHED_FRACTION = 0.9  # sempre passa alguma coisa, para medir o banco de novo
+SHED_RETRY_AFTER_SECONDS = 5
+
+
+def parse_rate(value):
+    """'5/20' -> (5 fichas por segundo, rajada de 20). Vazio ou '0' desliga."""
+    if not value or value == '0':
+        return None
+    rate, _, burst = value.partition('/')
+    rate = float(rate)
+    return rate, float(burst) if burst else max(1.0, rate)
+
+
+def take(key, rate, burst, now=None):
+    """Tira uma ficha do balde; devolve 0 ou os segundos até haver ficha."""
+    now = time.time() if now is None else now
+    state = cache.get(key)
+    if state is None:
+        tokens = burst
+    else:
+        tokens, updated = state
+        tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens < 1:
+        return (1 - tokens) / rate
+    cache.set(key, (tokens - 1, now), math.ceil(burst / rate) + 1)
+    return 0
+
+
+def client_ip(request):
+    """IP do cliente, ou None sem RATE_LIMIT_TRUST_FORWARDED_FOR.
+
+    É o último item do X-Forwarded-For, o que o proxy acrescentou; os
+    anteriores vêm do cliente. Sem X-Forwarded-For, o IP da conexão.
+    """
+    if not settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        return None
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    if forwarded:
+        return forwarded.split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_id(request):
+    """Sessão quando existe; senão o IP, se ele é confiável; senão None."""
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key:
+        return f's:{session.session_key}'
+    ip = client_ip(request)
+    return f'ip:{ip}' if ip else None
+
+
+def _refuse(status, message, retry_after, reason):
+    metrics.THROTTLED.inc(reason=reason)
+    retry_after = max(1, math.ceil(retry_after))
+    response = JsonResponse({'error': message, 'retry_after': retry_after}, status=status)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def shed_fraction():
+    """Fração dos pedidos recusados agora pela latência do banco (0 a MAX_SHED_FRACTION)."""
+    threshold = settings.LOAD_SHED_DB_LATENCY_MS
+    if threshold <= 0:
+        return 0.0
+    latency = recent_query_ms()
+    if latency <= threshold:
+        return 0.0
+    return min(MAX_SHED_FRACTION, (latency - threshold) / threshold)
+
+
+def check(request):
+    """Resposta de recusa (429/503) ou None se o pedido pode seguir."""
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    if match.url_name in EXEMPT_URL_NAMES or match.namespace == 'admin':
+        return None
+    is_read = request.method in READ_METHODS
+
+    if (is_read or match.url_name in ADMISSION_URL_NAMES) and random.random() < shed_fraction():
+        return _refuse(503, 'Servidor sobrecarregado. Tente de novo em instantes.',
+                       SHED_RETRY_AFTER_SECONDS, 'load_shed')
+
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    kind = 'read' if is_read else 'write'
+    buckets = [('client', client_id(request), getattr(settings, f'RATE_LIMIT_CLIENT_{kind.upper()}S'))]
+    code = match.kwargs.get('code')
+    if code:
+        buckets.append(('room', code, getattr(settings, f'RATE_LIMIT_ROOM_{kind.upper()}S')))
+    if match.url_name == 'create_game' and not is_read:
+        buckets.append(('create', client_ip(request), settings.RATE_LIMIT_ROOM_CREATION))
+    for scope, identifier, budget in buckets:
+        rate = parse_rate(budget)
+        if rate is None or identifier is None:
+            continue
+        wait = take(f'throttle:{scope}:{kind}:{identifier}', *rate)
+        if wait:
+            return _refuse(429, 'Muitas requisições. Aguarde um pouco.', wait, f'{scope}_{kind}')
+    return None
+
+
+def room_cap_response():
+    """503 se já há MAX_ACTIVE_ROOMS salas não finalizadas; senão None."""
+    cap = settings.MAX_ACTIVE_ROOMS
+    if cap <= 0 or Game.objects.exclude(status='finished').count() < cap:
+        return None
+    return _refuse(503, 'Limite de salas abertas atingido. Tente de novo em alguns minutos.',
+                   60, 'room_cap')
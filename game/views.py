@@ -3,16 +3,26 @@ from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.db import transaction
 from datetime import timedelta
+from functools import wraps
+import hmac
 import json
 import traceback
 import os
 import logging
 import random
-from .models import Game, Player, Hint, Vote, Nudge, WordGroup, Word, sort_players_for_display
+import time
+from .models import Game, Player, Hint, Vote, Nudge, WordGroup, Word, VersionConflict, sort_players_for_display
+from .archive import archive_and_delete, archive_games
+from .dbpool import pool_stats, ping
+from . import lobby, metrics, presence, rules, stats, throttle
+from .state import load_shared_snapshot, load_viewer_extras, build_game_state
+from .notifications import notify_room_changed, notify_room_closed
 
 User = get_user_model()
 
@@ -46,13 +56,19 @@ def create_game(request):
             if num_clowns < 0 or num_clowns > 1:
                 return JsonResponse({'error': 'Número de palhaços deve ser 0 ou 1'}, status=400)
             
+            # Controle de admissão: limite global de salas abertas
+            refused = throttle.room_cap_response()
+            if refused:
+                return refused
+            
             # Criar jogo
             game = Game.objects.create(
                 creator=creator_name,
                 num_impostors=num_impostors,
                 num_whitemen=num_whitemen,
                 num_clowns=num_clowns,
-                status='waiting'
+                status='waiting',
+                player_count=1,
             )
             
             # Criar jogador criador
@@ -110,39 +126,23 @@ def join_game(request):
         if not player_name:
             return JsonResponse({'error': 'Código e nome são obrigatórios'}, status=400)
         
-        try:
-            game = Game.objects.get(code=code)
-        except Game.DoesNotExist:
-            return JsonResponse({'error': 'Código inválido'}, status=404)
-        
-        # Verificar se o jogo já começou
-        if game.status != 'waiting' and game.status != 'configuring':
-            return JsonResponse({'error': 'O jogo já começou'}, status=400)
-        
-        # Verificar se já existe jogador com esse nome
-        if Player.objects.filter(game=game, name=player_name).exists():
-            return JsonResponse({'error': 'Nome já está em uso nesta sala'}, status=400)
-        
-        # Verificar limite de jogadores
-        current_players = game.players.count()
-        if current_players >= game.max_players:
-            return JsonResponse({'error': 'Sala cheia'}, status=400)
-        
-        # Criar jogador
-        Player.objects.create(
-            game=game,
-            name=player_name
-        )
+        # Reserva a vaga e cria o jogador numa transação só (sala existe, não
+        # começou, não está cheia e o nome está livre)
+        refused = lobby.join_room(code, player_name)
+        if refused:
+            message, status = refused
+            return JsonResponse({'error': message}, status=status)
+        notify_room_changed(code)
         
         # Armazenar autenticação na sessão
         # A chave inclui o código da sala, permitindo que o mesmo nome de jogador
         # exista em salas diferentes sem conflito (ex: player_ABC123 e player_XYZ789)
-        request.session[f'player_{game.code}'] = player_name
+        request.session[f'player_{code}'] = player_name
         request.session.modified = True
         
         return JsonResponse({
-            'code': game.code,
-            'redirect': f'/game/{game.code}/'
+            'code': code,
+            'redirect': f'/game/{code}/'
         })
     
     return render(request, 'game/join.html')
@@ -298,18 +298,56 @@ def _json_error(message, status=400, extra=None):
     return JsonResponse(payload, status=status)
 
 
+CONFLICT_MESSAGE = 'A sala mudou enquanto sua ação era enviada. Confira o jogo e tente de novo.'
+
+
+def _conflict():
+    return _json_error(CONFLICT_MESSAGE, status=409, extra={'conflict': True})
+
+
+def _stale_client_version(game, payload):
+    """409 se o cliente informou a versão da sala em que agiu e ela já mudou."""
+    version = payload.get('version')
+    if version is None:
+        return None
+    try:
+        version = int(version)
+    except (TypeError, ValueError):
+        return _json_error('Versão inválida')
+    return _conflict() if version != game.version else None
+
+
+def _answer_conflict(view):
+    """Responde 409 quando a sala mudou no meio da ação (VersionConflict)."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except VersionConflict:
+            return _conflict()
+    return wrapper
+
+
+def _session_player_name(request, code):
+    return request.session.get(f'player_{code}')
+
+
+def _forget_session_player(request, code):
+    session_key = f'player_{code}'
+    if session_key in request.session:
+        del request.session[session_key]
+        request.session.modified = True
+
+
 def _get_session_player(request, game):
-    session_key = f'player_{game.code}'
-    player_name = request.session.get(session_key)
+    player_name = _session_player_name(request, game.code)
     if not player_name:
         return None, None
     try:
         player = Player.objects.get(game=game, name=player_name)
         return player, player_name
     except Player.DoesNotExist:
-        if session_key in request.session:
-            del request.session[session_key]
-            request.session.modified = True
+        _forget_session_player(request, game.code)
         return None, None
 
 
@@ -337,13 +375,7 @@ def _reset_nudges_for_round(game, round_number):
     game.players.update(nudge_meter=100, nudge_meter_round=round_number)
 
 
-def _ensure_player_nudge_round(player, round_number):
-    if player.nudge_meter_round != round_number:
-        player.nudge_meter = 100
-        player.nudge_meter_round = round_number
-        player.save(update_fields=['nudge_meter', 'nudge_meter_round'])
-
-
+@transaction.atomic
 def _record_hint_and_progress(game, player, hint_word):
     hint, created = Hint.objects.get_or_create(
         game=game,
@@ -351,278 +383,110 @@ def _record_hint_and_progress(game, player, hint_word):
         round_number=game.current_round,
         defaults={'word': hint_word}
     )
-    if not created:
+    if created:
+        game.increment(round_hints=1)
+    else:
         hint.word = hint_word
         hint.save()
 
-    game.next_player()
-
-    active_players = list(game.get_active_players())
-    active_count = len(active_players) if active_players else 0
-    hints_this_round = Hint.objects.filter(game=game, round_number=game.current_round).count()
-
-    if active_count == 0:
-        return
-
-    if hints_this_round >= active_count:
-        if game.current_round < 3:
-            game.current_round += 1
-            active_players = list(game.get_active_players())
-            if active_players:
-                game.current_player_index = random.randint(0, len(active_players) - 1)
-            _reset_nudges_for_round(game, game.current_round)
-        else:
-            game.status = 'voting'
-            game.current_round += 1
-            game.current_player_index = 0
-            _reset_nudges_for_round(game, game.current_round)
+    active_count = game.alive_count
+    next_index = rules.next_player_index(game.current_player_index, active_count)
+    turn = rules.after_hint(game.current_round, next_index, game.round_hints, active_count)
+    new_round = turn.current_round != game.current_round
+    game.status, game.current_round, game.current_player_index = turn.status, turn.current_round, turn.current_player_index
+    if new_round:
+        game.set_counters(round_hints=0, round_votes=0)
+        _reset_nudges_for_round(game, game.current_round)
     game.save()
 
 
-def _serialize_game_state(game, is_spectator, player_name=None):
-    viewer_player = None
-    if player_name and not is_spectator:
-        viewer_player = Player.objects.filter(game=game, name=player_name).first()
-
-    players_qs = game.players.select_related('word').all()
-    players_list = sort_players_for_display(game.code, players_qs)
-    players_data = []
-    for player in players_list:
-        word_text = None
-        role_value = None
-        is_clown_revealed = False  # Para mostrar ao impostor quem é o Palhaço
-        
-        if not is_spectator:
-            reveal_role = (
-                viewer_player and player.id == viewer_player.id
-            ) or player.is_eliminated or game.status == 'finished'
-
-            actual_role = player.role
-            if actual_role in ['whiteman', 'clown'] and not reveal_role:
-                role_value = 'citizen'
-            else:
-                role_value = actual_role
-            
-            # Revelar Palhaço ao impostor se o poder de caos foi usado
-            if (viewer_player and viewer_player.role == 'impostor' and 
-                viewer_player.impostor_knows_clown and player.role == 'clown'):
-                is_clown_revealed = True
-
-            if player.word:
-                if viewer_player and player.id == viewer_player.id:
-                    word_text = player.word.text
-                elif reveal_role and actual_role != 'impostor':
-                    word_text = player.word.text
-        players_data.append({
-            'id': player.id,
-            'name': player.name,
-            'is_eliminated': player.is_eliminated,
-            'is_creator': player.is_creator,
-            'role': role_value,
-            'actual_role': player.role if (viewer_player and player.id == viewer_player.id) or player.is_eliminated or game.status == 'finished' else None,
-            'word': word_text,
-            'nudge_meter': player.nudge_meter,
-            'nudge_meter_round': player.nudge_meter_round,
-            'is_clown_revealed': is_clown_revealed,
-        })
-
-    hints_data = [
-        {
-            'player_name': hint.player.name,
-            'round_number': hint.round_number,
-            'word': hint.word,
-            'created_at': hint.created_at.isoformat(),
-        }
-        for hint in Hint.objects.filter(game=game)
-        .select_related('player')
-        .order_by('round_number', 'created_at')
-    ]
-
-    current_round_votes = Vote.objects.filter(game=game, round_number=game.current_round, is_palhaco_guess=False)
-    votes_data = [
-        {
-            'voter_name': vote.voter.name,
-            'target_name': vote.target.name,
+@transaction.atomic
+def _record_vote_and_progress(game, player, target):
+    """Grava o voto e, se era o último da rodada, apura; devolve o resultado ou None."""
+    Vote.objects.create(game=game, voter=player, target=target, round_number=game.current_round, is_palhaco_guess=False)
+    # Voto do WhiteMan fantasma não conta para fechar a votação
+    if not player.is_eliminated:
+        game.increment(round_votes=1)
+    if not rules.all_votes_in(game.round_votes, game.alive_count):
+        return None
+    eliminated_id, vote_count = _process_voting(game)
+    return {
+        'eliminated_player_id': eliminated_id,
+        'vote_counts': {
+            name: vote_count[pid]
+            for pid, name in Player.objects.filter(id__in=list(vote_count)).values_list('id', 'name')
         }
-        for vote in current_round_votes.select_related('voter', 'target')
-    ]
-
-    vote_history = {}
-    vote_tallies = {}
-    elimination_votes = Vote.objects.filter(game=game, is_palhaco_guess=False).select_related('voter', 'target').order_by('round_number', 'created_at')
-    for vote in elimination_votes:
-        vote_history.setdefault(vote.round_number, []).append({
-            'voter_name': vote.voter.name,
-            'target_name': vote.target.name,
-        })
-        vote_tallies.setdefault(vote.round_number, {})
-        vote_tallies[vote.round_number][vote.target.name] = vote_tallies[vote.round_number].get(vote.target.name, 0) + 1
-
-    # Get pending nudges for this player
-    nudges_data = []
-    if player_name and not is_spectator:
-        try:
-            current_player = Player.objects.get(game=game, name=player_name)
-            pending_nudges = Nudge.objects.filter(
-                game=game,
-                to_player=current_player,
-                acknowledged=False,
-                round_number=game.current_round
-            ).select_related('from_player')
-            
-            nudges_data = [
-                {
-                    'id': nudge.id,
-                    'from_player': nudge.from_player.name,
-                    'created_at': nudge.created_at.isoformat(),
-                }
-                for nudge in pending_nudges
-            ]
-            
-            # Mark nudges as acknowledged
-            if nudges_data:
-                pending_nudges.update(acknowledged=True)
-        except Player.DoesNotExist:
-            pass
-
-    active_players = list(game.get_active_players())
-    current_player_name = None
-    if active_players and 0 <= game.current_player_index < len(active_players):
-        current_player_name = active_players[game.current_player_index].name
-
-    game_data = {
-        'code': game.code,
-        'status': game.status,
-        'current_round': game.current_round,
-        'current_player': current_player_name,
-        'num_impostors': game.num_impostors,
-        'num_whitemen': game.num_whitemen,
-        'num_clowns': game.num_clowns,
-        'max_players': game.max_players,
-        'citizen_word': None,
-        'impostor_word': None,
-        'nudge_meter_max': 100,
-        'winning_team': game.winning_team,
     }
 
-    if not is_spectator:
-        game_data['citizen_word'] = game.citizen_word.text if game.citizen_word else None
-        game_data['impostor_word'] = game.impostor_word.text if game.impostor_word else None
-        if game.status == 'finished':
-            game_data['actual_num_impostors'] = game.actual_num_impostors
-            game_data['actual_num_whitemen'] = game.actual_num_whitemen
-            game_data['actual_num_clowns'] = game.actual_num_clowns
-
-    palhaco_payload = None
-    if viewer_player and viewer_player.role == 'clown':
-        known_ids = viewer_player.palhaco_known_impostors or []
-        known_players = list(Player.objects.filter(id__in=known_ids)) if known_ids else []
-        total_impostors = game.actual_num_impostors or game.num_impostors
-        
-        # Contar quantos palpites já foram feitos nesta rodada
-        guesses_count = Vote.objects.filter(
-            game=game,
-            voter=viewer_player,
-            round_number=game.current_round,
-            is_palhaco_guess=True
-        ).count()
-        
-        # Pode fazer palpite se ainda não completou todos os palpites necessários
-        can_guess = (
-            game.status == 'voting' and
-            not viewer_player.is_eliminated and
-            viewer_player.palhaco_goal_state in ['', 'finding', 'pending'] and
-            guesses_count < total_impostors
-        )
-        
-        already_completed_guesses = guesses_count >= total_impostors
-        
-        can_use_chaos_power = (
-            viewer_player.palhaco_goal_state == 'eliminate' and
-            not viewer_player.palhaco_used_chaos_power and
-            not viewer_player.is_eliminated and
-            game.status in ['hints', 'voting']
-        )
-        
-        palhaco_payload = {
-            'goal_state': viewer_player.palhaco_goal_state or 'finding',
-            'known_impostors': [p.name for p in known_players],
-            'known_count': len(known_players),
-            'total_impostors': total_impostors,
-            'remaining_impostors': max(0, total_impostors - len(known_ids)),
-            'can_guess': can_guess,
-            'already_guessed_this_round': already_completed_guesses,
-            'guesses_made': guesses_count,
-            'guesses_remaining': max(0, total_impostors - guesses_count),
-            'goal_ready_round': viewer_player.palhaco_goal_ready_round,
-            'needs_elimination': viewer_player.palhaco_goal_state == 'eliminate',
-            'can_use_chaos_power': can_use_chaos_power,
-            'chaos_power_used': viewer_player.palhaco_used_chaos_power,
-        }
 
-    return {
-        'game': game_data,
-        'players': players_data,
-        'hints': hints_data,
-        'votes': votes_data,
-        'vote_history': vote_history,
-        'vote_tallies': vote_tallies,
-        'nudges': nudges_data,
-        'palhaco': palhaco_payload,
-    }
+@transaction.atomic
+def _record_nudge_and_progress(game, player, target):
+    """Grava o nudge e tira 1 de HP do alvo; HP zerado na vez dele passa a vez (devolve True).
+
+    Tudo na mesma transação: um conflito de versão ao passar a vez desfaz
+    também o nudge e o HP.
+    """
+    Nudge.objects.create(game=game, from_player=player, to_player=target, round_number=game.current_round)
+    if target.nudge_meter_round != game.current_round:
+        target.nudge_meter = 100
+        target.nudge_meter_round = game.current_round
+    target.nudge_meter = max(0, target.nudge_meter - 1)
+    target.save(update_fields=['nudge_meter', 'nudge_meter_round'])
+    if target.nudge_meter > 0 or game.get_current_player() != target:
+        return False
+    _record_hint_and_progress(game, target, 'Zerei o HP... perdi minha vez!')
+    return True
 
 
 def _process_voting(game):
-    vote_count = {}
-    votes = list(
-        Vote.objects.filter(game=game, round_number=game.current_round, is_palhaco_guess=False)
-        .select_related('target')
-    )
-    for vote in votes:
-        target_id = vote.target.id
-        vote_count[target_id] = vote_count.get(target_id, 0) + 1
+    target_ids = Vote.objects.filter(
+        game=game, round_number=game.current_round, is_palhaco_guess=False,
+    ).values_list('target_id', flat=True)
+    vote_count, most_voted_id = rules.tally_votes(target_ids)
 
     eliminated_player_id = None
-    eliminated_player = None
-    if vote_count:
-        max_votes = max(vote_count.values())
-        most_voted_ids = [pid for pid, count in vote_count.items() if count == max_votes]
-        if len(most_voted_ids) == 1:
-            eliminated_player = Player.objects.get(id=most_voted_ids[0])
-            if not eliminated_player.is_eliminated:
-                eliminated_player.is_eliminated = True
-                eliminated_player.save()
-                eliminated_player_id = eliminated_player.id
-                
-                # Verificar vitória do Palhaço: ele deve ser eliminado APÓS ter descoberto todos os impostores
-                if eliminated_player.role == 'clown' and eliminated_player.palhaco_goal_state == 'eliminate':
-                    known_ids = eliminated_player.palhaco_known_impostors or []
-                    total_required = game.actual_num_impostors or game.num_impostors
-                    if len(set(known_ids)) >= total_required:
-                        game.status = 'finished'
-                        game.finished_at = timezone.now()
-                        game.winning_team = 'clown'
-                        game.save()
-                        return eliminated_player_id, vote_count
-
-    game.refresh_from_db()
+    if most_voted_id is not None:
+        eliminated_player = Player.objects.get(id=most_voted_id)
+        if not eliminated_player.is_eliminated:
+            eliminated_player.is_eliminated = True
+            eliminated_player.save()
+            eliminated_player_id = eliminated_player.id
+            game.increment(alive_count=-1, alive_impostors=-int(eliminated_player.role == 'impostor'))
+
+            # Verificar vitória do Palhaço: ele deve ser eliminado APÓS ter descoberto todos os impostores
+            if rules.clown_wins_on_elimination(
+                eliminated_player.role,
+                eliminated_player.palhaco_goal_state,
+                eliminated_player.palhaco_known_impostors,
+                rules.impostors_to_guess(game.actual_num_impostors, game.num_impostors),
+            ):
+                game.status = 'finished'
+                game.finished_at = timezone.now()
+                game.winning_team = 'clown'
+                game.save()
+                stats.record_finished_game(game)
+                return eliminated_player_id, vote_count
+
+    # Sem refresh_from_db: os contadores lidos aqui vieram do increment() e a
+    # versão precisa ser a lida no começo, senão o save() não detecta um restart
     winner = game.check_win_conditions()
-    if winner:
-        game.status = 'finished'
+    turn = rules.after_voting(game.current_round, game.current_player_index, game.alive_count, winner)
+    game.status, game.current_round, game.current_player_index = turn.status, turn.current_round, turn.current_player_index
+    if game.status == 'finished':
         game.finished_at = timezone.now()
     else:
-        game.status = 'hints'
-        game.current_round += 1
-        active_players = list(game.get_active_players())
-        if active_players:
-            game.current_player_index = random.randint(0, len(active_players) - 1)
-        else:
-            game.status = 'finished'
-            game.finished_at = timezone.now()
+        game.set_counters(round_hints=0, round_votes=0)
     game.save()
+    stats.record_finished_game(game)
     return eliminated_player_id, vote_count
 
 
+def _spectator_presence_key(request):
+    # Sem sessão não há como distinguir um espectador do outro
+    session_key = request.session.session_key
+    return presence.spectator_key(session_key) if session_key else None
+
+
 def _remaining_auto_delete_seconds(game):
     if game.status != 'finished' or not game.finished_at:
         return None
@@ -636,28 +500,41 @@ def game_state_api(request, code):
     if request.method != 'GET':
         return _json_error('Método não permitido', status=405)
 
+    requested_at = time.monotonic()
     game = Game.objects.select_related('citizen_word', 'impostor_word', 'word_group').filter(code=code).first()
     if not game:
         return JsonResponse({'room_closed': True, 'message': 'A sala não existe mais.', 'redirect': '/'}, status=404)
 
-    spectator_flag = request.GET.get('spectator') == '1'
-    player, _ = _get_session_player(request, game)
-    is_spectator = spectator_flag or player is None
-    player_name = player.name if player else None
-
-    data = _serialize_game_state(game, is_spectator, player_name)
     remaining = _remaining_auto_delete_seconds(game)
-    data['auto_delete_seconds'] = remaining
-
     if remaining is not None and remaining <= 0:
-        game.delete()
-        return JsonResponse({'room_closed': True, 'message': 'A sala foi fechada automaticamente após 1 minuto.', 'redirect': '/'})
+        if archive_and_delete(game, if_unchanged=True):
+            notify_room_closed(code, 'A sala foi fechada automaticamente após 1 minuto.')
+            return JsonResponse({'room_closed': True, 'message': 'A sala foi fechada automaticamente após 1 minuto.', 'redirect': '/'})
+        # Reiniciada (ou fechada) depois da leitura: responde com o estado atual
+        game = Game.objects.select_related('citizen_word', 'impostor_word', 'word_group').filter(code=code).first()
+        if not game:
+            return JsonResponse({'room_closed': True, 'message': 'A sala não existe mais.', 'redirect': '/'}, status=404)
 
+    spectator_flag = request.GET.get('spectator') == '1'
+    session_name = _session_player_name(request, game.code)
+    snapshot = load_shared_snapshot(game, requested_at)
+    viewer = snapshot.player_named(session_name) if session_name else None
+    if session_name and viewer is None:
+        _forget_session_player(request, game.code)
+    is_spectator = spectator_flag or viewer is None
+
+    presence.registry.heartbeat(game.code, viewer.name if viewer else _spectator_presence_key(request))
+    data = build_game_state(
+        snapshot, is_spectator, viewer, load_viewer_extras(snapshot, None if is_spectator else viewer),
+        presence.registry.room(game.code),
+    )
+    data['auto_delete_seconds'] = remaining
     return JsonResponse(data)
 
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@_answer_conflict
 def start_game_api(request, code):
     game = get_object_or_404(Game, code=code)
     try:
@@ -670,26 +547,30 @@ def start_game_api(request, code):
         return _json_error('Não autorizado', status=403)
     if not player.is_creator:
         return _json_error('Apenas o criador pode iniciar o jogo', status=403)
+    stale = _stale_client_version(game, payload)
+    if stale:
+        return stale
     can_start, reason = game.validate_can_start()
     if not can_start:
         return _json_error(reason or 'Número mínimo de jogadores não atingido')
-    if not game.assign_words():
-        return _json_error('Não há grupos de palavras suficientes para iniciar o jogo')
-
-    game.assign_roles()
-    game.status = 'hints'
-    game.current_round = 1
-    game.started_at = timezone.now()
-    active_players = list(game.get_active_players())
-    if active_players:
-        game.current_player_index = random.randint(0, len(active_players) - 1)
-    game.save()
-    _reset_nudges_for_round(game, game.current_round)
+
+    with transaction.atomic():
+        if not game.assign_words():
+            return _json_error('Não há grupos de palavras suficientes para iniciar o jogo')
+        game.assign_roles()
+        game.status = 'hints'
+        game.current_round = 1
+        game.started_at = timezone.now()
+        game.current_player_index = rules.first_player_index(game.alive_count)
+        game.save()
+        _reset_nudges_for_round(game, game.current_round)
+    notify_room_changed(game.code)
     return JsonResponse({'success': True})
 
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@_answer_conflict
 def submit_hint_api(request, code):
     game = get_object_or_404(Game, code=code)
     if game.status != 'hints':
@@ -704,6 +585,9 @@ def submit_hint_api(request, code):
         return _json_error('Não autorizado', status=403)
     if player.is_eliminated:
         return _json_error('Jogador eliminado não pode dar dicas')
+    stale = _stale_client_version(game, payload)
+    if stale:
+        return stale
 
     hint_word = (payload.get('word') or '').strip()
     if not hint_word:
@@ -714,11 +598,13 @@ def submit_hint_api(request, code):
         return _json_error('Não é sua vez', status=403)
 
     _record_hint_and_progress(game, player, hint_word)
+    notify_room_changed(game.code)
     return JsonResponse({'success': True})
 
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@_answer_conflict
 def submit_vote_api(request, code):
     game = get_object_or_404(Game, code=code)
     if game.status != 'voting':
@@ -734,6 +620,9 @@ def submit_vote_api(request, code):
     ghost_whiteman = player.role == 'whiteman' and player.is_eliminated
     if player.is_eliminated and not ghost_whiteman:
         return _json_error('Jogador eliminado não vota')
+    stale = _stale_client_version(game, payload)
+    if stale:
+        return stale
 
     target_name = payload.get('target_name')
     if not target_name:
@@ -747,27 +636,10 @@ def submit_vote_api(request, code):
     if Vote.objects.filter(game=game, voter=player, round_number=game.current_round, is_palhaco_guess=False).exists():
         return _json_error('Você já votou nesta rodada')
 
-    Vote.objects.create(game=game, voter=player, target=target, round_number=game.current_round, is_palhaco_guess=False)
-
-    active_players = list(game.get_active_players())
-    votes_count = Vote.objects.filter(
-        game=game,
-        round_number=game.current_round,
-        is_palhaco_guess=False,
-        voter__is_eliminated=False,
-    ).count()
-    
-    vote_result = None
-    if len(active_players) > 0 and votes_count >= len(active_players):
-        eliminated_id, vote_count = _process_voting(game)
-        vote_result = {
-            'eliminated_player_id': eliminated_id,
-            'vote_counts': {
-                Player.objects.get(id=pid).name: count 
-                for pid, count in vote_count.items()
-            }
-        }
+    vote_result = _record_vote_and_progress(game, player, target)
+    metrics.VOTES.inc(kind='elimination')
 
+    notify_room_changed(game.code)
     return JsonResponse({'success': True, 'vote_result': vote_result})
 
 
@@ -806,7 +678,7 @@ def submit_palhaco_guess_api(request, code):
         return _json_error('Você não pode se acusar')
 
     # Verificar se já completou todos os palpites desta rodada
-    total_impostors = game.actual_num_impostors or game.num_impostors
+    total_impostors = rules.impostors_to_guess(game.actual_num_impostors, game.num_impostors)
     existing_guesses = Vote.objects.filter(
         game=game,
         voter=player,
@@ -835,12 +707,11 @@ def submit_palhaco_guess_api(request, code):
     if not created:
         # Voto já existia (duplo clique ou race condition)
         return _json_error(f'Você já apostou em {target.name} nesta rodada')
+    metrics.VOTES.inc(kind='palhaco_guess')
 
     # Contar quantos palpites já foram feitos nesta rodada (incluindo este)
     total_guesses = current_guesses + 1
     
-    total_impostors = game.actual_num_impostors or game.num_impostors
-    
     # Se ainda não fez todos os palpites necessários
     if total_guesses < total_impostors:
         remaining = total_impostors - total_guesses
@@ -852,15 +723,13 @@ def submit_palhaco_guess_api(request, code):
         })
     
     # Se completou todos os palpites, verificar se acertou TODOS
-    guesses_this_round = Vote.objects.filter(
+    # IDs dos jogadores que o Palhaço apostou
+    guessed_ids = set(Vote.objects.filter(
         game=game,
         voter=player,
         round_number=game.current_round,
         is_palhaco_guess=True,
-    ).select_related('target')
-    
-    # IDs dos jogadores que o Palhaço apostou
-    guessed_ids = set(vote.target.id for vote in guesses_this_round)
+    ).values_list('target_id', flat=True))
     
     # IDs dos impostores reais (incluindo eliminados - Palhaço deve adivinhar todos)
     real_impostor_ids = set(
@@ -869,7 +738,7 @@ def submit_palhaco_guess_api(request, code):
     )
     
     # Verificar se acertou TODOS os impostores (e não chutou ninguém errado)
-    if guessed_ids == real_impostor_ids:
+    if rules.clown_guessed_all(guessed_ids, real_impostor_ids):
         # ACERTOU TODOS!
         player.palhaco_known_impostors = list(real_impostor_ids)
         player.palhaco_goal_state = 'eliminate'
@@ -894,6 +763,7 @@ def submit_palhaco_guess_api(request, code):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@_answer_conflict
 def use_chaos_power_api(request, code):
     """Palhaço usa o poder de embaralhar palavras (só pode usar quando encontrou todos os impostores)"""
     game = get_object_or_404(Game, code=code)
@@ -922,11 +792,13 @@ def use_chaos_power_api(request, code):
     except AttributeError:
         # Campo não existe no banco (migração não aplicada)
         return _json_error('Poder de caos não disponível. Aguarde atualização do servidor.', status=503)
+    stale = _stale_client_version(game, payload)
+    if stale:
+        return stale
 
     try:
+        # Sem trava na sala: o save() da sala confere a versão e desfaz tudo se ela mudou
         with transaction.atomic():
-            locked_game = Game.objects.select_for_update().get(id=game.id)
-            
             # Obter todos os grupos de palavras disponíveis
             all_groups = list(WordGroup.objects.prefetch_related('words').filter(words__isnull=False).distinct())
             if len(all_groups) < 1:
@@ -937,7 +809,7 @@ def use_chaos_power_api(request, code):
                 new_citizen_group = all_groups[0]
             else:
                 # Escolher novo grupo para cidadãos/impostores (diferente do atual se possível)
-                available_groups = [g for g in all_groups if g.id != locked_game.word_group_id]
+                available_groups = [g for g in all_groups if g.id != game.word_group_id]
                 new_citizen_group = random.choice(available_groups if available_groups else all_groups)
             
             citizen_words = list(new_citizen_group.words.all())
@@ -957,14 +829,14 @@ def use_chaos_power_api(request, code):
                 new_whiteman_group = all_groups[0]
             
             # Atualizar o jogo
-            locked_game.word_group = new_citizen_group
-            locked_game.citizen_word = new_citizen_word
-            locked_game.impostor_word = new_impostor_word
-            locked_game.whiteman_word_group = new_whiteman_group
-            locked_game.save()
+            game.word_group = new_citizen_group
+            game.citizen_word = new_citizen_word
+            game.impostor_word = new_impostor_word
+            game.whiteman_word_group = new_whiteman_group
+            game.save()
             
             # Atualizar palavras de todos os jogadores ativos
-            active_players = locked_game.players.filter(is_eliminated=False)
+            active_players = game.players.filter(is_eliminated=False)
             for p in active_players:
                 if p.role == 'citizen':
                     p.word = new_citizen_word
@@ -989,10 +861,13 @@ def use_chaos_power_api(request, code):
                     except Exception:
                         p.save(update_fields=['word'])
             
+        notify_room_changed(game.code)
         return JsonResponse({
             'success': True,
             'message': '🎭 CAOS! Todas as palavras foram embaralhadas! Os impostores agora sabem quem você é.',
         })
+    except VersionConflict:
+        raise
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
@@ -1002,6 +877,7 @@ def use_chaos_power_api(request, code):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@_answer_conflict
 def restart_game_api(request, code):
     game = get_object_or_404(Game, code=code)
     try:
@@ -1014,10 +890,15 @@ def restart_game_api(request, code):
         return _json_error('Não autorizado', status=403)
     if not player.is_creator:
         return _json_error('Apenas o criador pode reiniciar o jogo', status=403)
+    stale = _stale_client_version(game, payload)
+    if stale:
+        return stale
 
+    # Sem trava na sala: o save() confere a versão lida e, se outro pedido
+    # mudou a sala antes, desfaz o arquivo e a limpeza (409)
     with transaction.atomic():
-        locked_game = Game.objects.select_for_update().get(id=game.id)
-        for participant in locked_game.players.all():
+        archive_games([game])
+        for participant in game.players.all():
             participant.is_eliminated = False
             participant.role = None
             participant.word_id = None
@@ -1029,25 +910,26 @@ def restart_game_api(request, code):
             participant.palhaco_used_chaos_power = False
             participant.impostor_knows_clown = False
             participant.save()
-        Hint.objects.filter(game=locked_game).delete()
-        Vote.objects.filter(game=locked_game).delete()
-        Nudge.objects.filter(game=locked_game).delete()
-        locked_game.status = 'waiting'
-        locked_game.current_round = 0
-        locked_game.current_player_index = 0
-        locked_game.word_group_id = None
-        locked_game.whiteman_word_group_id = None
-        locked_game.citizen_word_id = None
-        locked_game.impostor_word_id = None
-        locked_game.started_at = None
-        locked_game.finished_at = None
-        locked_game.actual_num_impostors = 0
-        locked_game.actual_num_whitemen = 0
-        locked_game.actual_num_clowns = 0
-        locked_game.winning_team = None
-        locked_game.save()
+        Hint.objects.filter(game=game).delete()
+        Vote.objects.filter(game=game).delete()
+        Nudge.objects.filter(game=game).delete()
+        game.status = 'waiting'
+        game.current_round = 0
+        game.current_player_index = 0
+        game.word_group_id = None
+        game.whiteman_word_group_id = None
+        game.citizen_word_id = None
+        game.impostor_word_id = None
+        game.started_at = None
+        game.finished_at = None
+        game.actual_num_impostors = 0
+        game.actual_num_whitemen = 0
+        game.actual_num_clowns = 0
+        game.winning_team = None
+        game.save()
 
     _reset_nudges_for_round(game, 0)
+    notify_room_changed(game.code)
 
     return JsonResponse({'success': True})
 
@@ -1067,7 +949,8 @@ def close_room_api(request, code):
     if not player.is_creator:
         return _json_error('Apenas o criador pode fechar a sala', status=403)
 
-    game.delete()
+    archive_and_delete(game)
+    notify_room_closed(code, 'A sala foi fechada pelo criador.')
     return JsonResponse({'room_closed': True, 'redirect': '/'})
 
 
@@ -1094,19 +977,22 @@ def kick_player_api(request, code):
     if target_name == player.name:
         return _json_error('Você não pode se remover')
 
-    with transaction.atomic():
-        locked_game = Game.objects.select_for_update().get(id=game.id)
-        try:
-            target = Player.objects.get(game=locked_game, name=target_name)
-            target.delete()
-        except Player.DoesNotExist:
-            return _json_error('Jogador não encontrado', status=404)
+    try:
+        target = Player.objects.get(game=game, name=target_name)
+    except Player.DoesNotExist:
+        return _json_error('Jogador não encontrado', status=404)
+    refused = lobby.remove_player(target)
+    if refused:
+        message, status = refused
+        return _json_error(message, status=status)
 
+    notify_room_changed(game.code)
     return JsonResponse({'success': True})
 
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@_answer_conflict
 def nudge_player_api(request, code):
     game = get_object_or_404(Game, code=code)
     try:
@@ -1142,23 +1028,10 @@ def nudge_player_api(request, code):
     if recent_nudge:
         return _json_error('Espere 1 segundo para enviar outro nudge para este jogador', status=429)
 
-    _ensure_player_nudge_round(target, game.current_round)
-
-    Nudge.objects.create(
-        game=game,
-        from_player=player,
-        to_player=target,
-        round_number=game.current_round
-    )
-
-    target.nudge_meter = max(0, target.nudge_meter - 1)
-    target.save(update_fields=['nudge_meter'])
-
-    skip_triggered = False
-    if target.nudge_meter <= 0 and game.get_current_player() == target:
-        skip_triggered = True
-        _record_hint_and_progress(game, target, 'Zerei o HP... perdi minha vez!')
+    skip_triggered = _record_nudge_and_progress(game, player, target)
+    metrics.NUDGES.inc()
 
+    notify_room_changed(game.code)
     return JsonResponse({
         'success': True,
         'nudge_meter': target.nudge_meter,
@@ -1166,5 +1039,44 @@ def nudge_player_api(request, code):
     })
 
 
+@require_http_methods(["GET"])
+def db_health_api(request):
+    """Health check do banco com as estatísticas de conexão deste processo"""
+    try:
+        latency_ms = ping()
+    except Exception:
+        # A mensagem do driver traz host e usuário; fica só no log
+        logger = logging.getLogger(__name__)
+        logger.exception('Health check do banco falhou')
+        return JsonResponse({'ok': False, 'error': 'Banco de dados indisponível', 'pool': pool_stats()}, status=503)
+    return JsonResponse({'ok': True, 'latency_ms': round(latency_ms, 2), 'pool': pool_stats()})
 
 
+@require_http_methods(["GET"])
+def leaderboard_api(request):
+    """Placar de jogadores e grupos, guardado no cache por LEADERBOARD_CACHE_SECONDS"""
+    try:
+        limit = min(max(int(request.GET.get('limit', stats.DEFAULT_LEADERBOARD_SIZE)), 1), stats.MAX_LEADERBOARD_SIZE)
+    except ValueError:
+        return _json_error('Limite inválido')
+    key = f'leaderboard:{limit}'
+    data = cache.get(key)
+    if data is None:
+        data = stats.leaderboard(limit)
+        cache.set(key, data, settings.LEADERBOARD_CACHE_SECONDS)
+    response = JsonResponse(data)
+    patch_cache_control(response, public=True, max_age=settings.LEADERBOARD_CACHE_SECONDS)
+    return response
+
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """Métricas do processo no formato texto do Prometheus"""
+    if not settings.METRICS_ENABLED:
+        return HttpResponse(status=404)
+    if settings.METRICS_TOKEN:
+        provided = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        # Em bytes: compare_digest recusa str com caracteres fora do ASCII
+        if not hmac.compare_digest(provided.encode(), settings.METRICS_TOKEN.encode()):
+            return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,197 @@
+"""Importação em massa de grupos de palavras.
+
+O CSV é lido linha a linha (cada linha é um grupo; a primeira palavra dá o
+nome ao grupo) e gravado em lotes: um SELECT dos grupos e palavras que já
+existem, e um INSERT ... ON CONFLICT DO NOTHING do que falta. As restrições
+únicas de `WordGroup.name` e de `(Word.group, Word.text)` garantem que
+importações repetidas ou concorrentes não dupliquem nada; as estatísticas
+contam só as linhas que o INSERT de fato gravou. Usado pelo admin
+(`WordGroupAdmin.import_csv`), pelo `manage.py import_words_csv` e pelos
+pacotes JSONL de `game/wordpacks.py`.
+"""
+import codecs
+import csv
+from dataclasses import dataclass, field
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Word, WordGroup
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 50
+MAX_WORD_LENGTH = Word._meta.get_field('text').max_length
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    groups_created: int = 0
+    words_created: int = 0
+    words_deleted: int = 0
+    skipped_rows: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, message):
+        self.skipped_rows += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+
+def iter_text_lines(binary_chunks, encoding='utf-8-sig'):
+    """Decodifica pedaços de bytes sem juntar o arquivo inteiro na memória."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    for chunk in binary_chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines(keepends=True)
+        # A última linha pode estar cortada no meio (ou num \r\n); espera o próximo pedaço
+        pending = lines.pop() if lines and not lines[-1].endswith('\n') else ''
+        yield from lines
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def iter_csv_groups(lines, stats):
+    """Gera (nome do grupo, palavras) para cada linha válida do CSV."""
+    for row_num, row in enumerate(csv.reader(lines), start=1):
+        words = [cell.strip() for cell in row if cell.strip()]
+        if not words:
+            continue
+        stats.rows += 1
+        if len(words) < 2:
+            stats.add_error(f'Linha {row_num}: Precisa de pelo menos 2 palavras (encontradas: {len(words)})')
+            continue
+        too_long = [word for word in words if len(word) > MAX_WORD_LENGTH]
+        if too_long:
+            stats.add_error(f'Linha {row_num}: "{too_long[0][:20]}..." passa de {MAX_WORD_LENGTH} caracteres')
+            continue
+        yield words[0], words, False
+
+
+def _insert_groups(names):
+    """Insere os grupos pelo nome ignorando os que já existem; devolve quantos gravou.
+
+    Uma importação concorrente pode criar o mesmo grupo entre o SELECT e o
+    INSERT, então a contagem vem do próprio INSERT e não de `len(names)`.
+    """
+    if connection.vendor != 'postgresql':
+        before = WordGroup.objects.filter(name__in=names).count()
+        WordGroup.objects.bulk_create([WordGroup(name=name) for name in names], ignore_conflicts=True)
+        return WordGroup.objects.filter(name__in=names).count() - before
+    quote = connection.ops.quote_name
+    name_column = WordGroup._meta.get_field('name').column
+    created_column = WordGroup._meta.get_field('created_at').column
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(WordGroup._meta.db_table)} ({quote(name_column)}, {quote(created_column)}) '
+            f'SELECT name, %s FROM unnest(%s::text[]) AS name ON CONFLICT DO NOTHING',
+            [timezone.now(), names],
+        )
+        return cursor.rowcount
+
+
+def _insert_words(pairs):
+    """Insere (group_id, texto) ignorando os que já existem; devolve quantas gravou.
+
+    No Postgres vai um INSERT só com dois arrays (unnest), sem instanciar um
+    model por palavra, e o rowcount do ON CONFLICT DO NOTHING conta só as
+    inseridas; nos outros bancos, bulk_create e uma contagem antes e depois.
+    """
+    if connection.vendor != 'postgresql':
+        group_ids = {group_id for group_id, _ in pairs}
+        before = Word.objects.filter(group_id__in=group_ids).count()
+        Word.objects.bulk_create([Word(group_id=group_id, text=text) for group_id, text in pairs], ignore_conflicts=True)
+        return Word.objects.filter(group_id__in=group_ids).count() - before
+    quote = connection.ops.quote_name
+    group_column = Word._meta.get_field('group').column
+    text_column = Word._meta.get_field('text').column
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(Word._meta.db_table)} ({quote(group_column)}, {quote(text_column)}) '
+            f'SELECT * FROM unnest(%s::bigint[], %s::text[]) ON CONFLICT DO NOTHING',
+            [[group_id for group_id, _ in pairs], [text for _, text in pairs]],
+        )
+        return cursor.rowcount
+
+
+def _flush(batch, stats):
+    """Grava um lote {nome do grupo: (palavras, substituir)} com poucas consultas.
+
+    Nos grupos marcados para substituir, as palavras que não vieram no lote
+    são apagadas.
+    """
+    names = list(batch)
+    with transaction.atomic():
+        group_ids = dict(WordGroup.objects.filter(name__in=names).values_list('name', 'id'))
+        missing = [name for name in names if name not in group_ids]
+        if missing:
+            stats.groups_created += _insert_groups(missing)
+            group_ids.update(WordGroup.objects.filter(name__in=missing).values_list('name', 'id'))
+
+        existing = {
+            (group_id, text): word_id
+            for word_id, group_id, text in Word.objects.filter(group_id__in=group_ids.values())
+            .values_list('id', 'group_id', 'text')
+        }
+        replaced = {group_ids[name] for name, (_, replace) in batch.items() if replace}
+        wanted = set()
+        new_words = []
+        for name, (words, _) in batch.items():
+            group_id = group_ids[name]
+            for text in words:
+                key = (group_id, text)
+                wanted.add(key)
+                if key not in existing:
+                    existing[key] = None
+                    new_words.append(key)
+        if new_words:
+            stats.words_created += _insert_words(new_words)
+        if replaced:
+            stale = [
+                word_id for (group_id, text), word_id in existing.items()
+                if word_id and group_id in replaced and (group_id, text) not in wanted
+            ]
+            if stale:
+                stats.words_deleted += Word.objects.filter(id__in=stale).delete()[1].get(Word._meta.label, 0)
+
+
+def import_groups(groups, batch_size=DEFAULT_BATCH_SIZE, stats=None, progress=None):
+    """Grava um iterável de (nome, palavras, substituir) em lotes.
+
+    Linhas repetidas do mesmo grupo dentro de um lote são somadas em memória
+    antes de gravar; no modo substituir cada grupo deve aparecer uma vez só.
+    `progress(stats)` é chamado depois de cada lote. Devolve as estatísticas.
+    """
+    stats = stats or ImportStats()
+    batch = {}
+    for name, words, replace in groups:
+        bucket, replace_before = batch.get(name, ({}, False))
+        for text in words:
+            bucket.setdefault(text, None)  # dict mantém a ordem e deduplica
+        batch[name] = (bucket, replace or replace_before)
+        if len(batch) >= batch_size:
+            _flush(batch, stats)
+            batch = {}
+            if progress:
+                progress(stats)
+    if batch:
+        _flush(batch, stats)
+        if progress:
+            progress(stats)
+    return stats
+
+
+def import_csv(lines, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Importa as linhas de um CSV (iterável de str)."""
+    stats = ImportStats()
+    return import_groups(iter_csv_groups(lines, stats), batch_size, stats, progress)
+
+
+def import_csv_file(uploaded_file, batch_size=DEFAULT_BATCH_SIZE, encoding='utf-8-sig', progress=None):
+    """Importa um arquivo enviado (ou aberto em modo binário) em pedaços."""
+    chunks = uploaded_file.chunks() if hasattr(uploaded_file, 'chunks') else iter(
+        lambda: uploaded_file.read(64 * 1024), b''
+    )
+    return import_csv(iter_text_lines(chunks, encoding), batch_size, progress)
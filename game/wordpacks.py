@@ -0,0 +1,129 @@
+"""Pacotes de palavras em JSONL (opcionalmente gzip).
+
+Cada linha é um grupo: `{"name": "Frutas", "words": ["Manga", "Banana"]}`.
+Uma linha pode trazer `"mode": "replace"` para que, na importação, o grupo
+fique exatamente com as palavras listadas; o padrão (`upsert`) só acrescenta.
+
+A exportação percorre grupos e palavras com cursores do lado do servidor
+(`.iterator(chunk_size=...)`), ambos ordenados por grupo, e junta os dois
+fluxos sem carregar a tabela na memória. A importação lê linha a linha e
+grava em lotes com `game.wordimport.import_groups`.
+"""
+import gzip
+import io
+import json
+import sys
+from contextlib import contextmanager
+
+from .models import Word, WordGroup
+from .wordimport import DEFAULT_BATCH_SIZE, MAX_WORD_LENGTH, ImportStats, import_groups
+
+MODES = ('upsert', 'replace')
+DEFAULT_CHUNK_SIZE = 2000
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+@contextmanager
+def open_pack(path, mode):
+    """Abre um pacote para leitura ('r') ou escrita ('w') em texto UTF-8.
+
+    `-` é stdin/stdout. Na escrita o gzip vem da extensão `.gz`; na leitura,
+    dos primeiros bytes do arquivo.
+    """
+    if path == '-':
+        stream = sys.stdin.buffer if mode == 'r' else sys.stdout.buffer
+        raw, owned = stream, False
+    else:
+        raw, owned = open(path, mode + 'b'), True
+    try:
+        if mode == 'r':
+            buffered = io.BufferedReader(raw) if not hasattr(raw, 'peek') else raw
+            if buffered.peek(2)[:2] == GZIP_MAGIC:
+                buffered = gzip.GzipFile(fileobj=buffered, mode='rb')
+            text = io.TextIOWrapper(buffered, encoding='utf-8-sig')
+        else:
+            target = gzip.GzipFile(fileobj=raw, mode='wb') if path.endswith('.gz') else raw
+            text = io.TextIOWrapper(target, encoding='utf-8', newline='\n')
+        try:
+            yield text
+        finally:
+            # detach() descarrega o texto sem fechar o arquivo; o gzip precisa
+            # ser fechado para gravar o rodapé
+            buffer = text.detach()
+            if isinstance(buffer, gzip.GzipFile):
+                buffer.close()
+    finally:
+        if owned:
+            raw.close()
+
+
+def iter_groups_with_words(chunk_size=DEFAULT_CHUNK_SIZE, queryset=None):
+    """Gera (grupo, [palavras]) em ordem de id, com memória constante."""
+    groups = (WordGroup.objects.all() if queryset is None else queryset).order_by('id').values_list('id', 'name')
+    words = Word.objects.order_by('group_id', 'id').values_list('group_id', 'text')
+    if queryset is not None:
+        words = words.filter(group__in=queryset)
+    word_rows = words.iterator(chunk_size=chunk_size)
+    pending = next(word_rows, None)
+    for group_id, name in groups.iterator(chunk_size=chunk_size):
+        texts = []
+        # Palavras órfãs de grupos fora do queryset não existem (FK), então
+        # basta avançar enquanto o group_id for menor ou igual ao atual
+        while pending is not None and pending[0] <= group_id:
+            if pending[0] == group_id:
+                texts.append(pending[1])
+            pending = next(word_rows, None)
+        yield name, texts
+
+
+def export_pack(stream, chunk_size=DEFAULT_CHUNK_SIZE, queryset=None, mode=None, progress=None, every=1000):
+    """Escreve os grupos em JSONL e devolve (grupos, palavras) exportados."""
+    groups = words = 0
+    for name, texts in iter_groups_with_words(chunk_size, queryset):
+        line = {'name': name, 'words': texts}
+        if mode:
+            line['mode'] = mode
+        stream.write(json.dumps(line, ensure_ascii=False) + '\n')
+        groups += 1
+        words += len(texts)
+        if progress and groups % every == 0:
+            progress(groups, words)
+    if progress:
+        progress(groups, words)
+    return groups, words
+
+
+def iter_pack_groups(lines, stats, default_mode='upsert'):
+    """Gera (nome, palavras, substituir) para cada linha válida do pacote."""
+    for line_num, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        stats.rows += 1
+        try:
+            item = json.loads(line)
+        except ValueError as exc:
+            stats.add_error(f'Linha {line_num}: JSON inválido ({exc})')
+            continue
+        if not isinstance(item, dict) or not isinstance(item.get('words'), list):
+            stats.add_error(f'Linha {line_num}: esperado um objeto com a lista "words"')
+            continue
+        words = [str(word).strip() for word in item['words'] if str(word).strip()]
+        name = (item.get('name') or '').strip() or (words[0] if words else '')
+        mode = item.get('mode') or default_mode
+        if mode not in MODES:
+            stats.add_error(f'Linha {line_num}: modo desconhecido "{mode}"')
+            continue
+        if not name:
+            stats.add_error(f'Linha {line_num}: grupo sem nome e sem palavras')
+            continue
+        too_long = [word for word in [name] + words if len(word) > MAX_WORD_LENGTH]
+        if too_long:
+            stats.add_error(f'Linha {line_num}: "{too_long[0][:20]}..." passa de {MAX_WORD_LENGTH} caracteres')
+            continue
+        yield name, words, mode == 'replace'
+
+
+def import_pack(lines, default_mode='upsert', batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    stats = ImportStats()
+    return import_groups(iter_pack_groups(lines, stats, default_mode), batch_size, stats, progress)
@@ -2,12 +2,24 @@
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vatimposter.settings')
 
-application = get_asgi_application()
+django_asgi_app = get_asgi_application()
 
+if settings.WEBSOCKETS_ENABLED:
+    # Com WEBSOCKETS_ENABLED=True o Channels é obrigatório (requirements.txt)
+    from channels.routing import ProtocolTypeRouter, URLRouter
+    from channels.sessions import SessionMiddlewareStack
 
+    from game.routing import websocket_urlpatterns
 
+    application = ProtocolTypeRouter({
+        'http': django_asgi_app,
+        'websocket': SessionMiddlewareStack(URLRouter(websocket_urlpatterns)),
+    })
+else:  # Só HTTP: a página da sala acompanha o jogo por polling
+    application = django_asgi_app
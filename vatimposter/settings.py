@@ -75,8 +75,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Para servir arquivos estáticos em produção
+    'game.middleware.AsyncWhiteNoiseMiddleware',  # WhiteNoise (estáticos em produção) compatível com ASGI
+    'game.middleware.InstrumentationMiddleware',  # /metrics e X-DB-Queries
+    'game.middleware.RoomAffinityMiddleware',  # 421 para salas de outro worker (runaffinity)
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'game.middleware.RateLimitMiddleware',  # 429 por cliente/sala e 503 com o banco lento
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -104,6 +107,66 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'vatimposter.wsgi.application'
 
+# Endpoints quentes (estado, dica, voto, nudge) como views assíncronas.
+# Só vale a pena sob um servidor ASGI (daphne/uvicorn); sob gunicorn/WSGI
+# mantenha desligado.
+ASYNC_API_VIEWS = os.environ.get('ASYNC_API_VIEWS', 'False') == 'True'
+
+# Afinidade de sala (`manage.py runaffinity`): cada worker recebe o total de
+# workers e o próprio índice; com afinidade ligada todo o tráfego de uma sala
+# chega sempre ao mesmo processo e o estado em memória da sala é confiável.
+ROOM_AFFINITY_WORKERS = int(os.environ.get('ROOM_AFFINITY_WORKERS', '0'))
+ROOM_AFFINITY_WORKER = int(os.environ.get('ROOM_AFFINITY_WORKER', '0'))
+
+# Cabeçalhos X-DB-Queries/X-DB-Time-Ms em cada resposta, lidos pelo
+# `manage.py loadtest`. Deixe desligado em produção.
+QUERY_COUNT_HEADERS = os.environ.get('QUERY_COUNT_HEADERS', 'False') == 'True'
+
+# Métricas no formato do Prometheus em /metrics. Com METRICS_TOKEN definido a
+# coleta exige `Authorization: Bearer <token>`. Sem token a rota fica
+# desligada, a não ser que METRICS_ENABLED=True (só numa rede privada: /metrics
+# não passa pelo limite de requisições e consulta o banco a cada coleta).
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True' if METRICS_TOKEN else 'False') == 'True'
+
+# Janela, em ms, em que avisos de mudança de uma sala no GameConsumer são
+# juntados num único envio de estado (game/coalesce.py). 0 desliga a espera.
+STATE_BROADCAST_COALESCE_MS = int(os.environ.get('STATE_BROADCAST_COALESCE_MS', '50'))
+
+# Segundos que um jogador sem WebSocket aberto continua "online" depois do
+# último poll do estado (game/presence.py). Fica só em memória, por processo.
+PRESENCE_TIMEOUT_SECONDS = int(os.environ.get('PRESENCE_TIMEOUT_SECONDS', '30'))
+
+# Limite de requisições (game/throttle.py): "fichas por segundo/rajada" para
+# cada cliente (sessão ou IP) e cada sala, separado entre leituras e escritas.
+# "0" desliga um balde. Os baldes por IP só valem com
+# RATE_LIMIT_TRUST_FORWARDED_FOR; sem ele o IP não é conhecido.
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True') == 'True'
+RATE_LIMIT_CLIENT_READS = os.environ.get('RATE_LIMIT_CLIENT_READS', '5/20')
+RATE_LIMIT_CLIENT_WRITES = os.environ.get('RATE_LIMIT_CLIENT_WRITES', '3/15')
+RATE_LIMIT_ROOM_READS = os.environ.get('RATE_LIMIT_ROOM_READS', '40/120')
+RATE_LIMIT_ROOM_WRITES = os.environ.get('RATE_LIMIT_ROOM_WRITES', '15/45')
+# Salas novas por IP (não pela sessão, que o cliente descarta à vontade)
+RATE_LIMIT_ROOM_CREATION = os.environ.get('RATE_LIMIT_ROOM_CREATION', '0.05/5')
+# Só ligue atrás de um proxy que acrescenta o IP do cliente ao X-Forwarded-For
+# (o do Railway, o runaffinity); sem ele o cabeçalho vem do próprio cliente.
+# Desligado, não há balde por IP (atrás de um proxy todos teriam o mesmo)
+RATE_LIMIT_TRUST_FORWARDED_FOR = os.environ.get('RATE_LIMIT_TRUST_FORWARDED_FOR', 'False') == 'True'
+
+# Controle de admissão: máximo de salas não finalizadas (0 = sem limite) e
+# latência média das consultas, em ms, a partir da qual parte das leituras e
+# das entradas novas recebe 503 (0 desliga o corte de carga)
+MAX_ACTIVE_ROOMS = int(os.environ.get('MAX_ACTIVE_ROOMS', '0'))
+LOAD_SHED_DB_LATENCY_MS = int(os.environ.get('LOAD_SHED_DB_LATENCY_MS', '250'))
+
+# Partidas finalizadas viram uma linha de GameArchive (JSON compacto) antes de
+# a sala ser apagada; veja game/archive.py e `manage.py sweep_games`.
+ARCHIVE_FINISHED_GAMES = os.environ.get('ARCHIVE_FINISHED_GAMES', 'True') == 'True'
+
+# Por quantos segundos /api/leaderboard/ fica no cache (do processo, ou o
+# configurado em CACHES) e no Cache-Control da resposta
+LEADERBOARD_CACHE_SECONDS = int(os.environ.get('LEADERBOARD_CACHE_SECONDS', '60'))
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -128,6 +191,22 @@ if not db_user:
 if not db_password:
     db_password = 'postgres'
 
+# Reaproveitamento de conexões (DB_POOL_MODE)
+# - off (padrão): abre e fecha uma conexão por requisição. É o modo seguro sob
+#   ASGI (daphne, o start do .nixpacks.toml): o código síncrono roda em threads
+#   do executor que mudam, cada thread guarda a própria conexão e conexões
+#   persistentes vazam até esgotar o Postgres.
+# - persistent: cada worker/thread mantém a conexão aberta por até
+#   DB_CONN_MAX_AGE segundos, com health check antes de reutilizá-la. Seguro
+#   com gunicorn em workers síncronos (WSGI, o Procfile), em que cada worker
+#   tem uma thread só.
+# - pgbouncer: conexões persistentes com o PgBouncer em modo transaction (sem
+#   cursores do lado do servidor); o PgBouncer limita as conexões reais, então
+#   serve também sob ASGI.
+DB_POOL_MODE = os.environ.get('DB_POOL_MODE', 'off').strip().lower()
+if DB_POOL_MODE not in ('persistent', 'pgbouncer', 'off'):
+    DB_POOL_MODE = 'off'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -136,6 +215,12 @@ DATABASES = {
         'PASSWORD': db_password,
         'HOST': db_host,
         'PORT': db_port,
+        'CONN_MAX_AGE': 0 if DB_POOL_MODE == 'off' else int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': DB_POOL_MODE != 'off',
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOL_MODE == 'pgbouncer',
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', '5')),
+        },
     }
 }
 
@@ -189,5 +274,29 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-# Channels configuration - Usando InMemoryChannelLayer para servidor único
+# Channels configuration
+# - memory (padrão): InMemoryChannelLayer, só funciona com um único processo
+# - postgres: mensagens de grupo via LISTEN/NOTIFY no próprio Postgres, para
+#   rodar vários workers sem Redis
+ASGI_APPLICATION = 'vatimposter.asgi.application'
+# Rota /ws/game/<código>/ (GameConsumer). Desligada por padrão: a página da sala
+# usa polling do estado; com False os avisos de mudança também não são publicados
+WEBSOCKETS_ENABLED = os.environ.get('WEBSOCKETS_ENABLED', 'False') == 'True'
+CHANNEL_LAYER = os.environ.get('CHANNEL_LAYER', 'memory').strip().lower()
+if CHANNEL_LAYER == 'postgres':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'game.pg_layer.PostgresChannelLayer',
+            'CONFIG': {
+                'batch_window': int(os.environ.get('CHANNEL_BATCH_MS', '5')) / 1000,
+                'group_buffer': int(os.environ.get('CHANNEL_GROUP_BUFFER', '100')),
+            },
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
 